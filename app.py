@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import plotly.graph_objects as go
 from datetime import datetime
-from math import factorial, exp
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'src'))
 
 st.set_page_config(
     page_title="KICKIQ · EPL Predictor",
@@ -438,6 +440,10 @@ div[data-testid="stButton"] > button {
 import warnings
 import sklearn
 import xgboost
+from artifacts import load_artifacts
+from ensemble import EnsemblePredictor, blend_from_manifest
+
+MODEL_DIR = 'models/tuned'  # the models behind every prediction and signal badge
 
 def _get_env_versions() -> dict:
     """Return a dict of the currently installed library versions."""
@@ -469,6 +475,9 @@ def load_models():
       only scenario where the internal object format genuinely breaks.
     * For XGBoost, warn but continue: XGBoost's own booster handles cross-
       version pkl gracefully unless the major version changes.
+    * Prefer the native artifacts (booster .ubj + forest .npz) described by
+      models/tuned/manifest.json; they load without pickle and carry the
+      train-time library versions. Older pkl-only directories still load.
     """
     env = _get_env_versions()
 
@@ -485,19 +494,21 @@ def load_models():
                 category=sklearn.exceptions.InconsistentVersionWarning,
             )
 
-            xgb_model = joblib.load('models/tuned/xgboost_tuned.pkl')
-            rf_model  = joblib.load('models/tuned/random_forest_tuned.pkl')
-            fc        = joblib.load('models/tuned/feature_columns.pkl')
+            xgb_model, rf_model, fc, manifest = load_artifacts(
+                MODEL_DIR, legacy_names=('xgboost_tuned', 'random_forest_tuned'),
+                flat_forest=True)
+        train_libs = (manifest or {}).get('libraries', {})
 
         # ── Version delta check: sklearn ──────────────────────────────────
         # sklearn embeds __getstate__ metadata on every estimator.
         # A safe way to read the train-time version without re-serialising:
-        train_sklearn = None
-        try:
-            # RandomForest is a sklearn object — check its embedded version tag
-            train_sklearn = getattr(rf_model, "_sklearn_version", None)
-        except Exception:
-            pass
+        train_sklearn = train_libs.get("scikit-learn")
+        if train_sklearn is None:
+            try:
+                # RandomForest is a sklearn object — check its embedded version tag
+                train_sklearn = getattr(rf_model, "_sklearn_version", None)
+            except Exception:
+                pass
 
         if train_sklearn:
             env_major  = _parse_version(env["sklearn"])[0]
@@ -515,7 +526,7 @@ def load_models():
                     f"Re-train models with the current version or pin "
                     f"`scikit-learn=={env['sklearn']}` in requirements.txt."
                 )
-                return None, None, None, False
+                return None, None, False
         else:
             print(
                 f"[KickIQ] sklearn  — train-time version unknown  "
@@ -523,29 +534,32 @@ def load_models():
             )
 
         # ── Version delta check: xgboost ──────────────────────────────────
-        print(
-            f"[KickIQ] xgboost  — running:{env['xgboost']} "
-            f"(train-time version not embedded in pkl)"
-        )
+        if "xgboost" in train_libs:
+            print(
+                f"[KickIQ] xgboost  — trained:{train_libs['xgboost']}  "
+                f"running:{env['xgboost']}"
+            )
+        else:
+            print(
+                f"[KickIQ] xgboost  — running:{env['xgboost']} "
+                f"(train-time version not embedded in pkl)"
+            )
 
         # ── Quick smoke-test: can the models actually predict? ─────────────
         try:
-            n_features = len(fc)
-            dummy = pd.DataFrame(
-                [[0] * n_features], columns=fc
-            )
-            xgb_model.predict_proba(dummy)
-            rf_model.predict_proba(dummy)
+            predictor = EnsemblePredictor.from_models(
+                xgb_model, rf_model, fc, **blend_from_manifest(manifest))
+            predictor.predict_proba(np.zeros((1, len(fc)), dtype=np.float32))
         except Exception as smoke_err:
             st.error(
                 f"⛔ Model smoke-test failed: {smoke_err}. "
                 f"The models are likely incompatible with the current library "
                 f"versions. Re-train and re-save the models."
             )
-            return None, None, None, False
+            return None, None, False
 
         print(f"[KickIQ] Models loaded and smoke-tested ✓  env={env}")
-        return xgb_model, rf_model, fc, True
+        return predictor, fc, True
 
     except FileNotFoundError as e:
         st.error(
@@ -553,10 +567,10 @@ def load_models():
             f"Run `python src/train_models.py` to generate model files, "
             f"then commit them to the repo."
         )
-        return None, None, None, False
+        return None, None, False
     except Exception as e:
         st.error(f"Unexpected model load error: {e}")
-        return None, None, None, False
+        return None, None, False
 
 @st.cache_data
 def load_data():
@@ -568,128 +582,41 @@ def load_data():
     except:
         return None, None, False
 
+@st.cache_data
+def load_signal_curve():
+    """Held-out confidence curve of the ensemble the app predicts with, behind the signal badges."""
+    try:
+        return load_curves(curves_path(MODEL_DIR)).get('Ensemble')
+    except (OSError, KeyError):
+        return None
+
 
 # ── HELPER FUNCTIONS ──────────────────────────────────────────────────────────
-def get_team_form(df, team, n=5):
-    home = df[df['HomeTeam']==team][['Date','FTR']].copy()
-    home['result'] = home['FTR'].map({'H':'W','D':'D','A':'L'})
-    away = df[df['AwayTeam']==team][['Date','FTR']].copy()
-    away['result'] = away['FTR'].map({'H':'L','D':'D','A':'W'})
-    combined = pd.concat([home[['Date','result']], away[['Date','result']]])
-    return combined.sort_values('Date', ascending=False).head(n)['result'].tolist()
-
-def get_streak(df, team):
-    form = get_team_form(df, team, 20)
-    if not form: return ('N', 0)
-    cur = form[0]; cnt = 0
-    for r in form:
-        if r == cur: cnt += 1
-        else: break
-    return (cur, cnt)
-
-def get_team_stats(df, team):
-    home = df[df['HomeTeam']==team].copy()
-    away = df[df['AwayTeam']==team].copy()
-    all_m = pd.concat([
-        home[['Date','FTHG','FTAG','FTR']].assign(venue='home'),
-        away[['Date','FTHG','FTAG','FTR']].assign(venue='away')
-    ]).sort_values('Date', ascending=False).head(38)
-    if len(all_m)==0:
-        return {'played':0,'wins':0,'draws':0,'losses':0,'goals_for':0,'goals_against':0,
-                'gd':0,'win_rate':0,'clean_sheets':0,'btts':0,'ppg':0,
-                'home_wins':0,'home_played':0,'away_wins':0,'away_played':0,
-                'home_gf':0,'home_ga':0,'away_gf':0,'away_ga':0}
-    wins   = (((all_m['venue']=='home')&(all_m['FTR']=='H'))|((all_m['venue']=='away')&(all_m['FTR']=='A'))).sum()
-    draws  = (all_m['FTR']=='D').sum()
-    losses = len(all_m)-wins-draws
-    gf = int(np.where(all_m['venue']=='home', all_m['FTHG'], all_m['FTAG']).sum())
-    ga = int(np.where(all_m['venue']=='home', all_m['FTAG'], all_m['FTHG']).sum())
-    clean_sheets = int((np.where(all_m['venue']=='home', all_m['FTAG'], all_m['FTHG'])==0).sum())
-    btts = int(((all_m['FTHG']>0)&(all_m['FTAG']>0)).sum())
-    pts  = int(wins*3 + draws)
-    ppg  = round(pts/len(all_m),2)
-    hm = all_m[all_m['venue']=='home']
-    aw = all_m[all_m['venue']=='away']
-    hw = int((hm['FTR']=='H').sum())
-    aaw= int((aw['FTR']=='A').sum())
-    hgf= int(hm['FTHG'].sum()); hga= int(hm['FTAG'].sum())
-    agf= int(aw['FTAG'].sum()); aga= int(aw['FTHG'].sum())
-    return {'played':len(all_m),'wins':int(wins),'draws':int(draws),'losses':int(losses),
-            'goals_for':gf,'goals_against':ga,'gd':gf-ga,'win_rate':round(wins/len(all_m)*100),
-            'clean_sheets':clean_sheets,'btts':btts,'ppg':ppg,
-            'home_wins':hw,'home_played':len(hm),'away_wins':aaw,'away_played':len(aw),
-            'home_gf':hgf,'home_ga':hga,'away_gf':agf,'away_ga':aga}
-
-def get_h2h(df, home, away, n=5):
-    h2h = df[((df['HomeTeam']==home)&(df['AwayTeam']==away))|
-             ((df['HomeTeam']==away)&(df['AwayTeam']==home))]
-    h2h = h2h.sort_values('Date', ascending=False).head(n)
-    results = []
-    for _, row in h2h.iterrows():
-        if row['HomeTeam']==home:
-            results.append({'H':'W','D':'D','A':'L'}[row['FTR']])
-        else:
-            results.append({'A':'W','D':'D','H':'L'}[row['FTR']])
-    return results
-
-def poisson_prob(lam, k):
-    return (exp(-lam) * lam**k) / factorial(k)
-
-def get_score_probs(exp_h, exp_a, max_g=5):
-    """Return matrix of scoreline probabilities and aggregated stats."""
-    matrix = {}
-    for i in range(max_g+1):
-        for j in range(max_g+1):
-            matrix[(i,j)] = poisson_prob(exp_h, i) * poisson_prob(exp_a, j)
-    total = sum(matrix.values())
-    # normalise to visible range only
-    matrix = {k: v/total for k, v in matrix.items()}
-
-    sorted_scores = sorted(matrix.items(), key=lambda x: -x[1])[:5]
-
-    btts = sum(v for (i,j),v in matrix.items() if i>0 and j>0)
-    over25 = sum(v for (i,j),v in matrix.items() if i+j>2)
-    over15 = sum(v for (i,j),v in matrix.items() if i+j>1)
-    under25 = 1 - over25
-    return {
-        'top_scores': sorted_scores,
-        'btts': round(btts*100),
-        'over25': round(over25*100),
-        'over15': round(over15*100),
-        'under25': round(under25*100),
-    }
+from app_helpers import (
+    get_team_form, get_streak, get_team_stats, get_h2h,
+    poisson_prob, get_score_probs, run_prediction,
+)
+from confidence_curve import curves_path, load_curves, signal_band
 
-def run_prediction(home, away, xgb, rf, df, fc):
-    hr = df[df['HomeTeam']==home].sort_values('Date', ascending=False)
-    ar = df[df['AwayTeam']==away].sort_values('Date', ascending=False)
-    if len(hr)==0 or len(ar)==0: return None
-    home_row, away_row = hr.iloc[0], ar.iloc[0]
-    feat_dict = {}
-    for col in fc:
-        if '_home' in col: feat_dict[col] = home_row.get(col, 0)
-        elif '_away' in col: feat_dict[col] = away_row.get(col, 0)
-        else: feat_dict[col] = 0
-    feats = pd.DataFrame([feat_dict])[fc].fillna(0)
-    xp = xgb.predict_proba(feats)[0]
-    rp = rf.predict_proba(feats)[0]
-    ens = 0.6*xp + 0.4*rp
-    return {'proba':ens,'outcome':['Home Win','Draw','Away Win'][np.argmax(ens)],
-            'confidence':ens.max(),'xgb':xp,'rf':rp}
+BAND_CLASSES = {'STRONG SIGNAL': 's-strong', 'MODERATE SIGNAL': 's-mod',
+                'WEAK SIGNAL': 's-weak', 'NO CLEAR EDGE': 's-none'}
 
 def form_html(form):
     return '<div class="form-row">'+''.join(
         f'<span class="fp fp-{r}">{r}</span>' for r in form)+'</div>'
 
-def signal_badge_html(conf):
-    if conf>=0.65: return '<div class="signal-badge s-strong">STRONG SIGNAL</div>'
-    elif conf>=0.55: return '<div class="signal-badge s-mod">MODERATE SIGNAL</div>'
-    elif conf>=0.45: return '<div class="signal-badge s-weak">WEAK SIGNAL</div>'
-    else: return '<div class="signal-badge s-none">NO CLEAR EDGE</div>'
+def signal_badge_html(conf, curve=None):
+    label, lower, upper = signal_band(conf)
+    record = ''
+    if curve is not None:
+        bets, correct = curve.band(lower, upper)
+        if bets: record = f' · {correct/bets:.0%} HIT RATE IN {bets} HELD-OUT MATCHES'
+    return f'<div class="signal-badge {BAND_CLASSES[label]}">{label}{record}</div>'
 
 def insider_notes(home, away, res, hs, as_, h2h):
     notes = []
     idx = np.argmax(res['proba'])
-    notes.append(f"Ensemble: XGBoost ({res['xgb'][idx]*100:.0f}%) + Random Forest ({res['rf'][idx]*100:.0f}%) weighted 60/40.")
+    notes.append(f"Ensemble: XGBoost ({res['xgb'][idx]*100:.0f}%) + Random Forest ({res['rf'][idx]*100:.0f}%) weighted {res['weights']['xgboost']*100:.0f}/{res['weights']['random_forest']*100:.0f}.")
     if res['confidence']>0.60:
         notes.append(f"High conviction — {res['outcome']} is the dominant call across both models.")
     else:
@@ -734,7 +661,7 @@ st.markdown("""
 <div class="bg-grid"></div>
 """, unsafe_allow_html=True)
 
-xgb_model, rf_model, feature_cols, models_ok = load_models()
+predictor, feature_cols, models_ok = load_models()
 df, teams, data_ok = load_data()
 
 
@@ -974,7 +901,7 @@ elif st.session_state.page == 'predict':
     if clicked:
         with st.spinner('Running ensemble analysis…'):
             st.session_state.result = run_prediction(
-                home_team, away_team, xgb_model, rf_model, df, feature_cols)
+                home_team, away_team, predictor, df)
 
     # ── RESULTS ───────────────────────────────────────────────────────────────
     if st.session_state.result:
@@ -1007,7 +934,7 @@ elif st.session_state.page == 'predict':
           <div class="result-eyebrow">{home_team.upper()} vs {away_team.upper()} · {datetime.now().strftime('%d %B %Y').upper()}</div>
           <div class="result-outcome-text">{res['outcome'].upper()}</div>
           <div class="result-matchup-text">MODEL PREDICTION · ENSEMBLE</div>
-          {signal_badge_html(res['confidence'])}
+          {signal_badge_html(res['confidence'], load_signal_curve())}
           <div class="disclaimer-txt">FOR ENTERTAINMENT ONLY · NOT FINANCIAL ADVICE · BET RESPONSIBLY</div>
         </div>""", unsafe_allow_html=True)
 
@@ -0,0 +1,106 @@
+"""
+anytime.py
+──────────
+Model fits that stop at a wall-clock deadline and keep the best model so far.
+
+Both ensemble members grow in steps, and after every step the model is
+usable, so the model in memory is always the latest checkpoint:
+  - XGBoost boosts round by round. DeadlineCallback stops it before the
+    round that would overrun the deadline, judging by the last round's
+    duration. With early stopping, the booster is then trimmed to its best
+    iteration as usual.
+  - The Random Forest grows with warm_start, `chunk` trees at a time after
+    a first chunk of RF_FIRST_CHUNK that measures the pace. The next chunk
+    only starts if that pace says it will finish in time. Trees grown this
+    way are identical to those of a single fit of the same size.
+The first round or chunk always runs, so there is always a model to save.
+That, and a round or chunk that runs slower than the last, is how a run
+can overrun its budget; callers record the time actually used.
+
+One Deadline is shared by everything in a run. Its used() time goes into
+the run record in the artifact manifest.
+"""
+
+import math
+import time
+
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+
+RF_CHUNK = 25
+RF_FIRST_CHUNK = 5
+
+
+class Deadline:
+    """A wall-clock budget that starts when it is created; budget=None never runs out."""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.start = time.perf_counter()
+
+    def remaining(self):
+        if self.budget is None:
+            return math.inf
+        return self.start + self.budget - time.perf_counter()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """Whether `seconds` more work would finish before the deadline."""
+        return self.remaining() >= seconds
+
+    def used(self):
+        return time.perf_counter() - self.start
+
+    def overrun(self):
+        """Seconds used past the budget so far (0 without one)."""
+        return 0.0 if self.budget is None else max(self.used() - self.budget, 0.0)
+
+
+class DeadlineCallback(xgb.callback.TrainingCallback):
+    """Stops boosting when the next round would likely overrun the deadline; the trees so far are kept."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+        self.stopped = False
+        self._last = None
+
+    def before_training(self, model):
+        self._last = time.perf_counter()
+        return model
+
+    def after_iteration(self, model, epoch, evals_log):
+        now = time.perf_counter()
+        last_round, self._last = now - self._last, now
+        if not self.deadline.allows(last_round):
+            self.stopped = True
+        return self.stopped
+
+
+def grow_forest(params, X, y, deadline, n_jobs=None, chunk=RF_CHUNK):
+    """RandomForestClassifier(**params) grown `chunk` trees at a time while the deadline allows.
+
+    Returns (model, stopped) where `stopped` says the deadline cut it short
+    of params['n_estimators'] trees.
+    """
+    target = params['n_estimators']
+    first = min(RF_FIRST_CHUNK, chunk, target)
+    model = RandomForestClassifier(**{**params, 'n_estimators': first}, warm_start=True, n_jobs=n_jobs)
+    stopped = False
+    while True:
+        start = time.perf_counter()
+        n_before = len(getattr(model, 'estimators_', []))
+        model.fit(X, y)
+        per_tree = (time.perf_counter() - start) / (len(model.estimators_) - n_before)
+        if len(model.estimators_) >= target:
+            break
+        step = min(chunk, target - len(model.estimators_))
+        if not deadline.allows(per_tree * step):
+            stopped = True
+            break
+        model.set_params(n_estimators=len(model.estimators_) + step)
+    # Growing is over; the saved parameters describe the forest as it is
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    return model, stopped
@@ -0,0 +1,106 @@
+import pandas as pd
+import numpy as np
+from math import factorial, exp
+
+# Pure data helpers behind the Streamlit app. Kept free of `streamlit` so they
+# can be imported by scripts and benchmarks without starting the UI.
+
+def get_team_form(df, team, n=5):
+    home = df[df['HomeTeam']==team][['Date','FTR']].copy()
+    home['result'] = home['FTR'].map({'H':'W','D':'D','A':'L'})
+    away = df[df['AwayTeam']==team][['Date','FTR']].copy()
+    away['result'] = away['FTR'].map({'H':'L','D':'D','A':'W'})
+    combined = pd.concat([home[['Date','result']], away[['Date','result']]])
+    return combined.sort_values('Date', ascending=False).head(n)['result'].tolist()
+
+def get_streak(df, team):
+    form = get_team_form(df, team, 20)
+    if not form: return ('N', 0)
+    cur = form[0]; cnt = 0
+    for r in form:
+        if r == cur: cnt += 1
+        else: break
+    return (cur, cnt)
+
+def get_team_stats(df, team):
+    home = df[df['HomeTeam']==team].copy()
+    away = df[df['AwayTeam']==team].copy()
+    all_m = pd.concat([
+        home[['Date','FTHG','FTAG','FTR']].assign(venue='home'),
+        away[['Date','FTHG','FTAG','FTR']].assign(venue='away')
+    ]).sort_values('Date', ascending=False).head(38)
+    if len(all_m)==0:
+        return {'played':0,'wins':0,'draws':0,'losses':0,'goals_for':0,'goals_against':0,
+                'gd':0,'win_rate':0,'clean_sheets':0,'btts':0,'ppg':0,
+                'home_wins':0,'home_played':0,'away_wins':0,'away_played':0,
+                'home_gf':0,'home_ga':0,'away_gf':0,'away_ga':0}
+    wins   = (((all_m['venue']=='home')&(all_m['FTR']=='H'))|((all_m['venue']=='away')&(all_m['FTR']=='A'))).sum()
+    draws  = (all_m['FTR']=='D').sum()
+    losses = len(all_m)-wins-draws
+    gf = int(np.where(all_m['venue']=='home', all_m['FTHG'], all_m['FTAG']).sum())
+    ga = int(np.where(all_m['venue']=='home', all_m['FTAG'], all_m['FTHG']).sum())
+    clean_sheets = int((np.where(all_m['venue']=='home', all_m['FTAG'], all_m['FTHG'])==0).sum())
+    btts = int(((all_m['FTHG']>0)&(all_m['FTAG']>0)).sum())
+    pts  = int(wins*3 + draws)
+    ppg  = round(pts/len(all_m),2)
+    hm = all_m[all_m['venue']=='home']
+    aw = all_m[all_m['venue']=='away']
+    hw = int((hm['FTR']=='H').sum())
+    aaw= int((aw['FTR']=='A').sum())
+    hgf= int(hm['FTHG'].sum()); hga= int(hm['FTAG'].sum())
+    agf= int(aw['FTAG'].sum()); aga= int(aw['FTHG'].sum())
+    return {'played':len(all_m),'wins':int(wins),'draws':int(draws),'losses':int(losses),
+            'goals_for':gf,'goals_against':ga,'gd':gf-ga,'win_rate':round(wins/len(all_m)*100),
+            'clean_sheets':clean_sheets,'btts':btts,'ppg':ppg,
+            'home_wins':hw,'home_played':len(hm),'away_wins':aaw,'away_played':len(aw),
+            'home_gf':hgf,'home_ga':hga,'away_gf':agf,'away_ga':aga}
+
+def get_h2h(df, home, away, n=5):
+    h2h = df[((df['HomeTeam']==home)&(df['AwayTeam']==away))|
+             ((df['HomeTeam']==away)&(df['AwayTeam']==home))]
+    h2h = h2h.sort_values('Date', ascending=False).head(n)
+    results = []
+    for _, row in h2h.iterrows():
+        if row['HomeTeam']==home:
+            results.append({'H':'W','D':'D','A':'L'}[row['FTR']])
+        else:
+            results.append({'A':'W','D':'D','H':'L'}[row['FTR']])
+    return results
+
+def poisson_prob(lam, k):
+    return (exp(-lam) * lam**k) / factorial(k)
+
+def get_score_probs(exp_h, exp_a, max_g=5):
+    """Return matrix of scoreline probabilities and aggregated stats."""
+    matrix = {}
+    for i in range(max_g+1):
+        for j in range(max_g+1):
+            matrix[(i,j)] = poisson_prob(exp_h, i) * poisson_prob(exp_a, j)
+    total = sum(matrix.values())
+    # normalise to visible range only
+    matrix = {k: v/total for k, v in matrix.items()}
+
+    sorted_scores = sorted(matrix.items(), key=lambda x: -x[1])[:5]
+
+    btts = sum(v for (i,j),v in matrix.items() if i>0 and j>0)
+    over25 = sum(v for (i,j),v in matrix.items() if i+j>2)
+    over15 = sum(v for (i,j),v in matrix.items() if i+j>1)
+    under25 = 1 - over25
+    return {
+        'top_scores': sorted_scores,
+        'btts': round(btts*100),
+        'over25': round(over25*100),
+        'over15': round(over15*100),
+        'under25': round(under25*100),
+    }
+
+def run_prediction(home, away, predictor, df):
+    """Ensemble prediction for home vs away from each side's latest match row."""
+    hr = df[df['HomeTeam']==home].sort_values('Date', ascending=False)
+    ar = df[df['AwayTeam']==away].sort_values('Date', ascending=False)
+    if len(hr)==0 or len(ar)==0: return None
+    feats = predictor.match_features(hr.iloc[0], ar.iloc[0])
+    proba = predictor.predict_proba(feats)
+    xp, rp, ens = proba['xgb'][0], proba['rf'][0], proba['ensemble'][0]
+    return {'proba':ens,'outcome':['Home Win','Draw','Away Win'][np.argmax(ens)],
+            'confidence':ens.max(),'xgb':xp,'rf':rp,'weights':predictor.weights}
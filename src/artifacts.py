@@ -0,0 +1,317 @@
+"""
+artifacts.py
+────────────
+Pickle-free model artifacts with a versioned manifest.
+
+  xgboost_*.ubj         XGBoost booster in its native UBJSON format
+  random_forest_*.npz   every tree of the forest as flat NumPy node arrays
+  manifest.json         content hashes, library versions, feature list,
+                        tree counts, ensemble blend and training data hash
+
+Neither model file depends on pickle, so artifacts survive library upgrades
+that break joblib files, and they load faster: the booster is parsed by
+XGBoost's C++ loader and the forest is a handful of contiguous arrays.
+
+load_artifacts() verifies the hashes against the manifest, and the
+installed libraries against the versions recorded in it:
+  - XGBoost reads boosters written by older versions, but not newer ones.
+  - Rebuilding RandomForestClassifier trees goes through sklearn's private
+    Tree state and node dtype, so it needs the scikit-learn minor version
+    and node layout the forest was saved with. The FlatForest path reads
+    the named node arrays directly and works across versions.
+A mismatch raises ArtifactError rather than loading a corrupt model.
+Directories written before this format existed (joblib .pkl files only)
+still load through the legacy fallback.
+"""
+
+import hashlib
+import json
+import math
+import os
+import platform
+import re
+from datetime import datetime
+
+import joblib
+import numpy as np
+import sklearn
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree._tree import NODE_DTYPE, Tree
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+DEFAULT_WEIGHTS = {'xgboost': 0.6, 'random_forest': 0.4}
+
+# Node fields stored per tree; they map one-to-one onto sklearn's Tree state
+NODE_FIELDS = NODE_DTYPE.names
+
+
+class ArtifactError(Exception):
+    """Raised when an artifact directory is missing files or fails verification."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ── Random Forest ⇄ flat arrays ────────────────────────────────────────────
+
+def forest_to_arrays(rf):
+    """All trees of a fitted RandomForestClassifier as concatenated node arrays.
+
+    Tree t owns nodes offsets[t]:offsets[t+1]; child indices stay local to
+    their tree (-1 marks a leaf), exactly as in sklearn.
+    """
+    states = [est.tree_.__getstate__() for est in rf.estimators_]
+    counts = [s['node_count'] for s in states]
+    nodes = np.concatenate([s['nodes'] for s in states])
+
+    arrays = {f'node_{name}': np.ascontiguousarray(nodes[name]) for name in NODE_FIELDS}
+    arrays['value'] = np.concatenate([s['values'][:, 0, :] for s in states])
+    arrays['offsets'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    arrays['max_depth'] = np.array([s['max_depth'] for s in states], dtype=np.int64)
+    arrays['classes'] = np.asarray(rf.classes_)
+    if hasattr(rf, 'feature_names_in_'):
+        arrays['feature_names'] = np.asarray(rf.feature_names_in_, dtype=str)
+    return arrays
+
+
+def forest_from_arrays(arrays, params=None):
+    """Rebuild an exact, prediction-ready RandomForestClassifier from node arrays."""
+    classes = arrays['classes']
+    n_classes = len(classes)
+    offsets = arrays['offsets']
+    n_features = int(arrays['n_features']) if 'n_features' in arrays else \
+        int(arrays['node_feature'].max()) + 1
+
+    rf = RandomForestClassifier(**(params or {}))
+    rf.classes_ = classes
+    rf.n_classes_ = n_classes
+    rf.n_outputs_ = 1
+    rf.n_features_in_ = n_features
+    if 'feature_names' in arrays:
+        rf.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object)
+    rf.estimator_ = DecisionTreeClassifier()
+
+    tree_params = {p: getattr(rf, p) for p in rf.estimator_params}
+    estimators = []
+    for t in range(len(offsets) - 1):
+        rows = slice(offsets[t], offsets[t + 1])
+        nodes = np.empty(offsets[t + 1] - offsets[t], dtype=NODE_DTYPE)
+        for name in NODE_FIELDS:
+            nodes[name] = arrays[f'node_{name}'][rows]
+
+        tree = Tree(n_features, np.array([n_classes], dtype=np.intp), 1)
+        tree.__setstate__({
+            'max_depth': int(arrays['max_depth'][t]),
+            'node_count': len(nodes),
+            'nodes': nodes,
+            'values': np.ascontiguousarray(arrays['value'][rows][:, None, :]),
+        })
+
+        est = DecisionTreeClassifier(**tree_params)
+        est.tree_ = tree
+        est.classes_ = classes
+        est.n_classes_ = n_classes
+        est.n_outputs_ = 1
+        est.n_features_in_ = n_features
+        est.max_features_ = tree_params.get('max_features')
+        estimators.append(est)
+
+    rf.estimators_ = estimators
+    rf.n_estimators = len(estimators)
+    return rf
+
+
+# ── Save / load ────────────────────────────────────────────────────────────
+
+def _library_versions():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scikit-learn': sklearn.__version__,
+        'xgboost': xgb.__version__,
+    }
+
+
+def _node_layout():
+    return [[name, NODE_DTYPE.fields[name][0].str] for name in NODE_FIELDS]
+
+
+def _minor_version(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version)[:2])
+
+
+def check_libraries(model_dir, manifest, sklearn_trees=True):
+    """Raise ArtifactError if the installed libraries cannot load `manifest`'s models as saved.
+
+    sklearn_trees=False skips the scikit-learn checks, for loads that never
+    rebuild sklearn Tree objects (FlatForest).
+    """
+    libraries = manifest.get('libraries', {})
+    saved_xgb = libraries.get('xgboost')
+    if saved_xgb and _minor_version(saved_xgb) > _minor_version(xgb.__version__):
+        raise ArtifactError(f"{model_dir} was saved with XGBoost {saved_xgb}, newer than the installed "
+                            f"{xgb.__version__}; upgrade xgboost or retrain")
+    if not sklearn_trees:
+        return
+    saved_sklearn = libraries.get('scikit-learn')
+    if saved_sklearn is None or _minor_version(saved_sklearn) != _minor_version(sklearn.__version__):
+        raise ArtifactError(f"{model_dir} was saved with scikit-learn {saved_sklearn or 'unknown'}, the installed "
+                            f"version is {sklearn.__version__}; its private tree format may differ. Load it with "
+                            f"flat_forest=True or retrain")
+    layout = manifest['models']['random_forest'].get('node_layout')
+    if layout is not None and layout != _node_layout():
+        raise ArtifactError(f"{model_dir} stores forest nodes as {layout}; this scikit-learn uses "
+                            f"{_node_layout()}. Load it with flat_forest=True or retrain")
+
+
+def _json_params(params):
+    """JSON-safe parameters; NaN / infinity (e.g. XGBoost's `missing`) become strings, as strict JSON has none."""
+    return {k: str(v) if isinstance(v, float) and not math.isfinite(v) else v
+            for k, v in params.items() if isinstance(v, (str, int, float, bool, type(None)))}
+
+
+def save_artifacts(model_dir, xgb_model, rf_model, feature_cols, data_hash=None,
+                   names=('xgboost_model', 'random_forest_model'), weights=None, extra=None):
+    """Write both models in native formats plus manifest.json; returns the manifest."""
+    os.makedirs(model_dir, exist_ok=True)
+    xgb_file = f'{names[0]}.ubj'
+    rf_file = f'{names[1]}.npz'
+
+    xgb_model.get_booster().save_model(os.path.join(model_dir, xgb_file))
+
+    rf_arrays = forest_to_arrays(rf_model)
+    rf_arrays['n_features'] = np.int64(rf_model.n_features_in_)
+    np.savez(os.path.join(model_dir, rf_file), **rf_arrays)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'libraries': _library_versions(),
+        'feature_cols': list(feature_cols),
+        'training_data_hash': data_hash,
+        'ensemble_weights': dict(weights or DEFAULT_WEIGHTS),
+        'models': {
+            'xgboost': {
+                'file': xgb_file,
+                'n_trees': xgb_model.get_booster().num_boosted_rounds(),
+                'params': _json_params(xgb_model.get_params()),
+            },
+            'random_forest': {
+                'file': rf_file,
+                'n_trees': len(rf_model.estimators_),
+                'n_nodes': int(rf_arrays['offsets'][-1]),
+                'node_layout': _node_layout(),
+                'params': _json_params(rf_model.get_params()),
+            },
+        },
+    }
+    for entry in manifest['models'].values():
+        path = os.path.join(model_dir, entry['file'])
+        entry['sha256'] = _sha256(path)
+        entry['bytes'] = os.path.getsize(path)
+    if extra:
+        manifest.update(extra)
+
+    write_manifest(model_dir, manifest)
+    return manifest
+
+
+def write_manifest(model_dir, manifest):
+    tmp_path = os.path.join(model_dir, f'{MANIFEST_NAME}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(model_dir, MANIFEST_NAME))
+
+
+def read_manifest(model_dir):
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def set_ensemble_blend(model_dir, weights, temperature=None, fit=None):
+    """Record fitted blend weights (and per-class temperatures) in an existing manifest.
+
+    Only manifest.json changes; the model files and their hashes stay as they are.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        raise ArtifactError(f"{model_dir} has no {MANIFEST_NAME}; save the models first")
+    manifest['ensemble_weights'] = dict(weights)
+    if temperature is None:
+        manifest.pop('ensemble_temperature', None)
+    else:
+        manifest['ensemble_temperature'] = [float(t) for t in temperature]
+    if fit is not None:
+        manifest['ensemble_fit'] = fit
+    write_manifest(model_dir, manifest)
+    return manifest
+
+
+def _verify(model_dir, entry):
+    path = os.path.join(model_dir, entry['file'])
+    if not os.path.exists(path):
+        raise ArtifactError(f"{path} listed in the manifest is missing")
+    if _sha256(path) != entry['sha256']:
+        raise ArtifactError(f"{path} does not match the hash recorded in the manifest")
+    return path
+
+
+def load_forest_arrays(model_dir, manifest=None, verify=True):
+    """The Random Forest's flat node arrays, without building sklearn objects."""
+    manifest = manifest or read_manifest(model_dir)
+    entry = manifest['models']['random_forest']
+    path = _verify(model_dir, entry) if verify else os.path.join(model_dir, entry['file'])
+    with np.load(path) as data:
+        return {key: data[key] for key in data.keys()}
+
+
+def load_artifacts(model_dir, legacy_names=('xgboost_model', 'random_forest_model'), verify=True,
+                   flat_forest=False):
+    """Load (xgb_model, rf_model, feature_cols, manifest) from a model directory.
+
+    With flat_forest=True the Random Forest comes back as a FlatForest, the
+    fast vectorized evaluator, instead of a RandomForestClassifier.
+
+    Falls back to the joblib files `<legacy_name>.pkl` and feature_columns.pkl
+    when the directory has no manifest; the returned manifest is then None.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        xgb_model = joblib.load(os.path.join(model_dir, f'{legacy_names[0]}.pkl'))
+        rf_model = joblib.load(os.path.join(model_dir, f'{legacy_names[1]}.pkl'))
+        feature_cols = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+        if flat_forest:
+            from flat_forest import FlatForest
+            rf_model = FlatForest.from_sklearn(rf_model)
+        return xgb_model, rf_model, feature_cols, None
+
+    if manifest.get('format_version', 0) > FORMAT_VERSION:
+        raise ArtifactError(f"{model_dir} uses artifact format {manifest['format_version']}; "
+                            f"this code reads up to {FORMAT_VERSION}")
+    check_libraries(model_dir, manifest, sklearn_trees=not flat_forest)
+
+    xgb_entry = manifest['models']['xgboost']
+    xgb_path = _verify(model_dir, xgb_entry) if verify else os.path.join(model_dir, xgb_entry['file'])
+    xgb_model = xgb.XGBClassifier()
+    xgb_model.load_model(xgb_path)
+    xgb_model.set_params(n_estimators=xgb_entry['n_trees'])
+
+    rf_arrays = load_forest_arrays(model_dir, manifest, verify)
+    if flat_forest:
+        from flat_forest import FlatForest
+        rf_model = FlatForest(rf_arrays)
+    else:
+        rf_model = forest_from_arrays(rf_arrays, params=manifest['models']['random_forest'].get('params'))
+
+    return xgb_model, rf_model, list(manifest['feature_cols']), manifest
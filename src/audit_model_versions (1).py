@@ -4,7 +4,8 @@ audit_model_versions.py
 Run this script immediately after training your models and BEFORE deploying.
 It prints a manifest of:
   1. The current Python / library environment
-  2. The version metadata embedded in each pkl file
+  2. The artifact manifest (native .ubj/.npz models), or the version
+     metadata embedded in each pkl file for older model directories
   3. Any version deltas between train-time and current environment
   4. A ready-to-paste requirements.txt block
 
@@ -72,8 +73,34 @@ MODEL_PATHS = {
     "Feature Columns": Path("models/tuned/feature_columns.pkl"),
 }
 
+MANIFEST_PATH = Path("models/tuned/manifest.json")
+
 loaded = {}
-for name, path in MODEL_PATHS.items():
+manifest = None
+if MANIFEST_PATH.exists():
+    # Native artifacts: versions come from the manifest, files are hash-checked
+    from artifacts import load_artifacts, ArtifactError
+    try:
+        xgb_obj, rf_obj, fc_obj, manifest = load_artifacts(str(MANIFEST_PATH.parent))
+        loaded = {"XGBoost": xgb_obj, "Random Forest": rf_obj, "Feature Columns": fc_obj}
+        train_libs = manifest["libraries"]
+        for lib, running in [("scikit-learn", sklearn.__version__), ("xgboost", xgboost.__version__)]:
+            trained = train_libs.get(lib, "?")
+            major_match = parse_version(trained)[0] == parse_version(running)[0]
+            check(f"{lib} version", major_match,
+                  f"trained_with={trained}  running={running}  "
+                  f"{'VERSION MATCH' if trained == running else 'DELTA (native format, no pickle)'}")
+        for name, entry in manifest["models"].items():
+            check(f"{name} ({entry['file']})", True,
+                  f"size={entry['bytes'] / 1024:.1f}KB  |  n_trees={entry['n_trees']}  "
+                  f"|  sha256 verified")
+        check("Feature Columns", True, f"n_features={len(fc_obj)}")
+        check("Training data hash", manifest.get("training_data_hash") is not None,
+              str(manifest.get("training_data_hash", "not recorded"))[:16])
+    except (ArtifactError, OSError) as e:
+        check("Manifest", False, f"LOAD FAILED: {e}")
+
+for name, path in (MODEL_PATHS.items() if manifest is None else []):
     if not path.exists():
         check(name, False, f"FILE NOT FOUND: {path}")
         loaded[name] = None
@@ -123,13 +150,12 @@ fc_obj  = loaded.get("Feature Columns")
 
 if xgb_obj and rf_obj and fc_obj:
     try:
-        dummy = pandas.DataFrame([[0] * len(fc_obj)], columns=fc_obj)
-        xp = xgb_obj.predict_proba(dummy)
-        rp = rf_obj.predict_proba(dummy)
-        ens = 0.6 * xp + 0.4 * rp
-        check("XGBoost predict_proba",  True, f"output shape={xp.shape}")
-        check("RF predict_proba",       True, f"output shape={rp.shape}")
-        check("Ensemble (60/40)",       True, f"output={ens.round(3)}")
+        from ensemble import EnsemblePredictor, blend_from_manifest
+        predictor = EnsemblePredictor.from_models(xgb_obj, rf_obj, fc_obj, **blend_from_manifest(manifest))
+        out = predictor.predict_proba(numpy.zeros((1, len(fc_obj)), dtype=numpy.float32))
+        check("XGBoost predict_proba",  True, f"output shape={out['xgb'].shape}")
+        check("RF predict_proba",       True, f"output shape={out['rf'].shape}")
+        check("Ensemble",               True, f"weights={predictor.weights}  temperature={predictor.temperature}  output={out['ensemble'].round(3)}")
     except Exception as e:
         check("Smoke test", False, f"FAILED: {e}")
 else:
@@ -147,30 +173,21 @@ print(f"  pandas=={pandas.__version__}")
 
 # ── 5. Recommended save format ─────────────────────────────────────────────────
 section("RECOMMENDED SAVE FORMAT (run after training)")
+if manifest is not None:
+    print("  ✓  models/tuned already uses native artifacts + manifest.json")
 print("""
-  # In your train_models.py, save models like this:
-
-  import joblib, sklearn, xgboost
-
-  # sklearn models — joblib is the canonical way
-  joblib.dump(rf_model,  'models/tuned/random_forest_tuned.pkl')
-  joblib.dump(fc,        'models/tuned/feature_columns.pkl')
-
-  # XGBoost — use native format for maximum version portability
-  # This avoids the "older version" pickle warning entirely
-  xgb_model.save_model('models/tuned/xgboost_tuned.json')
-  # Then load with:  xgb_model.load_model('models/tuned/xgboost_tuned.json')
-
-  # Embed your environment metadata so future audits can check it:
-  import json, sys, datetime
-  manifest = {
-      'trained_at':  datetime.datetime.now().isoformat(),
-      'sklearn':     sklearn.__version__,
-      'xgboost':     xgboost.__version__,
-      'python':      sys.version.split()[0],
-  }
-  with open('models/tuned/version_manifest.json', 'w') as f:
-      json.dump(manifest, f, indent=2)
+  # train_models.py and hyperparameter_tuning.py save through src/artifacts.py:
+
+  from artifacts import save_artifacts, load_artifacts
+
+  # XGBoost booster as native UBJSON, Random Forest as flat NumPy node arrays,
+  # plus manifest.json with hashes, library versions, features and tree counts
+  save_artifacts('models/tuned', xgb_model, rf_model, feature_cols,
+                 data_hash=dataset.data_hash,
+                 names=('xgboost_tuned', 'random_forest_tuned'))
+
+  # No pickle involved when loading; hashes are verified against the manifest
+  xgb_model, rf_model, feature_cols, manifest = load_artifacts('models/tuned')
 """)
 
 section("AUDIT COMPLETE")
@@ -0,0 +1,458 @@
+"""
+benchmarks.py
+─────────────
+Latency and peak-memory benchmarks for the pipeline's hot paths.
+
+Every benchmark runs against synthetic workspaces built with
+synthetic_data.py at one or more scales (1 = the size of the bundled data).
+Results are written as JSON; compared against a stored baseline, any
+benchmark whose best-of-N latency or peak memory grows past the tolerance
+fails the run with exit code 1.
+
+Usage:
+  python src/benchmarks.py --update-baseline           # record a baseline
+  python src/benchmarks.py                             # compare against it
+  python src/benchmarks.py --scales 1 4 --only elo_replay rolling_features
+  python src/benchmarks.py --tolerance 0.10 --memory-tolerance 0.25
+
+Peak memory is the Python/NumPy heap high-water mark reported by
+tracemalloc; native allocations inside XGBoost are not included.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import runpy
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import app_helpers
+import feature_engineering as fe
+from dataset import load_dataset
+from synthetic_data import generate_workload
+
+SRC_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = 'benchmarks/baseline.json'
+RESULTS_PATH = 'benchmarks/latest.json'
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=3, max_scale=None):
+    """Register `setup(workspace) -> callable`; the callable is what gets timed."""
+    def register(setup):
+        BENCHMARKS[name] = {'setup': setup, 'repeat': repeat, 'max_scale': max_scale}
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class Workspace:
+    """A synthetic data directory at one scale, with lazily built fixtures."""
+
+    def __init__(self, root, scale, seed=42):
+        self.root = root
+        self.scale = scale
+        with quiet():
+            _, self.n_matches = generate_workload(root, scale=scale, seed=seed)
+
+    @contextlib.contextmanager
+    def cwd(self):
+        with contextlib.chdir(self.root):
+            yield
+
+    @cached_property
+    def raw_matches(self):
+        with self.cwd(), quiet():
+            runpy.run_path(str(SRC_DIR / 'mergedata.py'))
+            return fe.load_and_prepare_data('data/merged_matches.csv')
+
+    @cached_property
+    def matches(self):
+        return fe.create_match_outcomes(fe.compute_elo_ratings(self.raw_matches))
+
+    @cached_property
+    def team_df(self):
+        return fe.create_team_perspective_df(self.matches)
+
+    @cached_property
+    def team_features(self):
+        team_df = fe.create_rolling_features(self.team_df, windows=[3, 5, 10])
+        return fe.create_head_to_head_features(team_df)
+
+    @cached_property
+    def features(self):
+        with quiet():
+            features = fe.merge_features(self.matches, self.team_features)
+        features = fe.create_differential_features(features)
+        features = features[features.isna().sum(axis=1) < len(features.columns) * 0.3].fillna(0)
+        with self.cwd():
+            features.to_csv('data/features.csv', index=False)
+        return features
+
+    @cached_property
+    def dataset(self):
+        self.features
+        with self.cwd(), quiet():
+            return load_dataset('data/features.csv')
+
+    @cached_property
+    def split(self):
+        import train_models
+        self.features
+        with self.cwd(), quiet():
+            return train_models.load_and_split_data('data/features.csv')
+
+    @cached_property
+    def models(self):
+        import train_models
+        X_train, X_test, y_train, y_test, feature_cols, _ = self.split
+        with self.cwd(), quiet():
+            xgb_model = train_models.train_xgboost(X_train, y_train, X_test, y_test)[0]
+            rf_model = train_models.train_random_forest(X_train, y_train, X_test, y_test)[0]
+            train_models.save_models(xgb_model, rf_model, feature_cols)
+        return xgb_model, rf_model, feature_cols
+
+    @cached_property
+    def fixtures(self):
+        """A handful of (home, away) pairs that exist in the data."""
+        features = self.features
+        pairs = features[['HomeTeam', 'AwayTeam']].drop_duplicates().tail(10)
+        return list(pairs.itertuples(index=False, name=None))
+
+
+# ── Feature engineering ───────────────────────────────────────────────────────
+
+@benchmark('merge_seasons')
+def bench_merge_seasons(ws):
+    ws.raw_matches
+
+    def run():
+        with ws.cwd(), quiet():
+            runpy.run_path(str(SRC_DIR / 'mergedata.py'))
+    return run
+
+
+@benchmark('elo_replay')
+def bench_elo_replay(ws):
+    df = ws.raw_matches
+    return lambda: fe.compute_elo_ratings(df)
+
+
+@benchmark('rolling_features')
+def bench_rolling_features(ws):
+    team_df = ws.team_df
+    return lambda: fe.create_rolling_features(team_df, windows=[3, 5, 10])
+
+
+@benchmark('head_to_head')
+def bench_head_to_head(ws):
+    team_df = ws.team_df
+    return lambda: fe.create_head_to_head_features(team_df)
+
+
+@benchmark('merge_features')
+def bench_merge_features(ws):
+    matches, team_features = ws.matches, ws.team_features
+
+    def run():
+        with quiet():
+            fe.create_differential_features(fe.merge_features(matches, team_features))
+    return run
+
+
+@benchmark('load_dataset')
+def bench_load_dataset(ws):
+    ws.features
+
+    def run():
+        with ws.cwd(), quiet():
+            load_dataset('data/features.csv', use_cache=False)
+    return run
+
+
+# ── Training ──────────────────────────────────────────────────────────────────
+
+@benchmark('train_xgboost', repeat=1)
+def bench_train_xgboost(ws):
+    import train_models
+    X_train, X_test, y_train, y_test, _, _ = ws.split
+
+    def run():
+        with quiet():
+            train_models.train_xgboost(X_train, y_train, X_test, y_test)
+    return run
+
+
+@benchmark('train_random_forest', repeat=1)
+def bench_train_random_forest(ws):
+    import train_models
+    X_train, X_test, y_train, y_test, _, _ = ws.split
+
+    def run():
+        with quiet():
+            train_models.train_random_forest(X_train, y_train, X_test, y_test)
+    return run
+
+
+@benchmark('load_artifacts', repeat=5)
+def bench_load_artifacts(ws):
+    from artifacts import load_artifacts
+    ws.models
+
+    def run():
+        with ws.cwd():
+            load_artifacts('models')
+    return run
+
+
+# ── Prediction ────────────────────────────────────────────────────────────────
+
+@benchmark('run_prediction', repeat=5)
+def bench_run_prediction(ws):
+    from ensemble import EnsemblePredictor
+    predictor = EnsemblePredictor.from_models(*ws.models)
+    df = ws.features
+    home, away = ws.fixtures[0]
+    return lambda: app_helpers.run_prediction(home, away, predictor, df)
+
+
+@benchmark('rf_single_row', repeat=5)
+def bench_rf_single_row(ws):
+    _, rf_model, _ = ws.models
+    row = ws.split[1].iloc[[0]]
+    return lambda: rf_model.predict_proba(row)
+
+
+@benchmark('flat_forest_single_row', repeat=5)
+def bench_flat_forest_single_row(ws):
+    from flat_forest import FlatForest
+    forest = FlatForest.from_sklearn(ws.models[1])
+    row = ws.split[1].iloc[[0]]
+    return lambda: forest.predict_proba(row)
+
+
+@benchmark('ensemble_batch', repeat=5)
+def bench_ensemble_batch(ws):
+    from ensemble import EnsemblePredictor
+    predictor = EnsemblePredictor.from_models(*ws.models)
+    X = np.ascontiguousarray(ws.split[1].to_numpy(), dtype=np.float32)
+    return lambda: predictor.predict_proba(X)
+
+
+@benchmark('batch_prediction', repeat=1)
+def bench_batch_prediction(ws):
+    import predict
+    ws.models
+    matches = ws.fixtures
+
+    def run():
+        with ws.cwd(), quiet():
+            predict.predict_multiple_matches(matches)
+    return run
+
+
+@benchmark('get_score_probs', repeat=5)
+def bench_get_score_probs(ws):
+    def run():
+        for exp_h in np.linspace(0.5, 3.0, 20):
+            app_helpers.get_score_probs(exp_h, 1.2)
+    return run
+
+
+@benchmark('app_helpers', repeat=5)
+def bench_app_helpers(ws):
+    df = ws.features
+    home, away = ws.fixtures[0]
+
+    def run():
+        app_helpers.get_team_stats(df, home)
+        app_helpers.get_team_stats(df, away)
+        app_helpers.get_team_form(df, home, 5)
+        app_helpers.get_team_form(df, away, 5)
+        app_helpers.get_h2h(df, home, away, 5)
+        app_helpers.get_streak(df, home)
+        app_helpers.get_streak(df, away)
+    return run
+
+
+# ── Explainability ────────────────────────────────────────────────────────────
+
+@benchmark('shap_values', repeat=1)
+def bench_shap_values(ws):
+    try:
+        import shap
+    except ImportError:
+        return None
+
+    xgb_model = ws.models[0]
+    X_sample = ws.split[1].iloc[:500]
+    explainer = shap.TreeExplainer(xgb_model)
+    return lambda: explainer.shap_values(X_sample)
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+def measure(fn, repeat):
+    """Best/median wall time over `repeat` runs, then one traced run for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'peak_mb': peak / 2**20,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(scales, only=None, workdir=None):
+    names = [n for n in BENCHMARKS if not only or n in only]
+    results = {}
+
+    for scale in scales:
+        with tempfile.TemporaryDirectory(dir=workdir, prefix=f'bench_x{scale}_') as root:
+            ws = Workspace(root, scale)
+            print(f"\nScale {scale}x ({ws.n_matches:,} matches)")
+            print("-"*72)
+
+            for name in names:
+                spec = BENCHMARKS[name]
+                if spec['max_scale'] and scale > spec['max_scale']:
+                    continue
+                fn = spec['setup'](ws)
+                if fn is None:
+                    print(f"  {name:22s} skipped (optional dependency missing)")
+                    continue
+
+                result = measure(fn, spec['repeat'])
+                result['scale'] = scale
+                result['n_matches'] = ws.n_matches
+                results[f'{name}@{scale}'] = result
+                print(f"  {name:22s} {result['seconds']*1000:10.1f} ms   "
+                      f"peak {result['peak_mb']:8.1f} MB")
+
+    return results
+
+
+def environment():
+    import sklearn
+    import xgboost
+    return {
+        'created': datetime.now().isoformat(),
+        'platform': platform.platform(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+
+def compare(results, baseline, tolerance, memory_tolerance, min_seconds=0.005):
+    """Return a list of regression messages against the baseline results."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+
+        # Sub-millisecond timings are mostly noise; only memory is checked there
+        if base['seconds'] >= min_seconds and current['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append(
+                f"{key}: latency {base['seconds']*1000:.1f} ms → {current['seconds']*1000:.1f} ms "
+                f"(+{(current['seconds']/base['seconds']-1)*100:.0f}%)")
+
+        if base['peak_mb'] >= 1 and current['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance):
+            regressions.append(
+                f"{key}: peak memory {base['peak_mb']:.1f} MB → {current['peak_mb']:.1f} MB "
+                f"(+{(current['peak_mb']/base['peak_mb']-1)*100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline's hot paths")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4],
+                        help="synthetic data scales to run (1 = bundled data size)")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="write these results as the new baseline instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help="allowed latency growth before failing (0.20 = +20%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.20,
+                        help="allowed peak-memory growth before failing")
+    parser.add_argument('--workdir', help="where to build the synthetic workspaces")
+    args = parser.parse_args()
+
+    print("\n" + "="*72)
+    print("PIPELINE BENCHMARKS")
+    print("="*72)
+
+    results = run_benchmarks(args.scales, only=args.only, workdir=args.workdir)
+    save_results(results, args.output)
+    print(f"\n✓ Results saved to {args.output}")
+
+    if args.update_baseline:
+        save_results(results, args.baseline)
+        print(f"✓ Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n No baseline at {args.baseline} — run with --update-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+
+    print("\n" + "="*72)
+    if regressions:
+        print(f"REGRESSIONS ({len(regressions)})")
+        print("="*72)
+        for message in regressions:
+            print(f"  ✗ {message}")
+        sys.exit(1)
+
+    print(f"NO REGRESSIONS (latency ±{args.tolerance:.0%}, memory ±{args.memory_tolerance:.0%})")
+    print("="*72 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+chunked_features.py
+───────────────────
+Out-of-core variant of the feature_engineering.py pipeline.
+
+The in-memory pipeline materialises the full two-rows-per-match `team_df`
+with ~50 float64 feature columns, plus several copies of it. This module
+produces the same features.csv while keeping peak memory under a budget:
+
+  1. A compact index pass reads only Date/teams/goals/result in chunks and
+     replays Elo over it (≈30 bytes per match).
+  2. Teams are packed into groups sized to the budget. Each group's
+     team-perspective rows go through the unchanged rolling and
+     head-to-head feature functions, and the results are written into an
+     on-disk float64 store (np.memmap) at fixed row slots.
+  3. The raw match file is streamed again in chunks; each chunk is joined
+     to its home/away rows from the store, gets differential features, is
+     cleaned and appended straight to the output file (CSV, or Parquet when
+     the output path ends in .parquet and pyarrow is installed).
+
+Rolling and H2H windows only look at a team's own history, so grouping by
+team gives identical values to the in-memory pipeline. The input must be
+sorted by Date, as written by mergedata.py.
+"""
+
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+import feature_engineering as fe
+
+INDEX_CHUNK_ROWS = 200_000
+NAN_THRESHOLD = 0.3
+
+TEAM_META_COLS = ["Date", "Team", "Opponent", "GoalsFor", "GoalsAgainst",
+                  "Points", "Win", "is_home", "row_id"]
+
+# Rough working-set multipliers measured on the in-memory pipeline: pandas
+# keeps several temporaries per groupby transform on top of the frame itself.
+TEAM_ROW_OVERHEAD = 4
+MATCH_ROW_OVERHEAD = 3
+
+
+def read_match_index(filepath: str):
+    """Compact arrays for the rows the in-memory pipeline keeps, in file order."""
+    dates, home, away, fthg, ftag, ftr = [], [], [], [], [], []
+    team_codes = {}
+    ftr_codes = {'H': 0, 'D': 1, 'A': 2}
+
+    def encode(names):
+        return np.array([team_codes.setdefault(t, len(team_codes)) for t in names], dtype=np.int32)
+
+    usecols = ["Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG", "FTR"]
+    for chunk in pd.read_csv(filepath, usecols=usecols, chunksize=INDEX_CHUNK_ROWS):
+        chunk["Date"] = pd.to_datetime(chunk["Date"], errors="coerce")
+        chunk = chunk.dropna(subset=["Date"])
+        dates.append(chunk["Date"].to_numpy(dtype="datetime64[ns]"))
+        home.append(encode(chunk["HomeTeam"]))
+        away.append(encode(chunk["AwayTeam"]))
+        fthg.append(chunk["FTHG"].to_numpy(dtype=np.float64))
+        ftag.append(chunk["FTAG"].to_numpy(dtype=np.float64))
+        ftr.append(chunk["FTR"].map(ftr_codes).fillna(3).to_numpy(dtype=np.int8))
+
+    index = {
+        'dates': np.concatenate(dates),
+        'home': np.concatenate(home),
+        'away': np.concatenate(away),
+        'fthg': np.concatenate(fthg),
+        'ftag': np.concatenate(ftag),
+        'ftr': np.concatenate(ftr),
+        'teams': np.array(list(team_codes), dtype=object),
+    }
+
+    if np.any(index['dates'][1:] < index['dates'][:-1]):
+        raise ValueError(f"{filepath} is not sorted by Date; run mergedata.py first")
+    return index
+
+
+def replay_elo(index, k=20, base_rating=1500):
+    """Same update rule as feature_engineering.compute_elo_ratings, over the index."""
+    n = len(index['dates'])
+    home_elo = np.empty(n)
+    away_elo = np.empty(n)
+    ratings = [float(base_rating)] * len(index['teams'])
+
+    for i, (h, a, r) in enumerate(zip(index['home'].tolist(), index['away'].tolist(),
+                                      index['ftr'].tolist())):
+        home_rating = ratings[h]
+        away_rating = ratings[a]
+        home_elo[i] = home_rating
+        away_elo[i] = away_rating
+
+        expected_home = 1 / (1 + 10 ** ((away_rating - home_rating) / 400))
+        expected_away = 1 - expected_home
+
+        if r == 0:
+            actual_home, actual_away = 1, 0
+        elif r == 2:
+            actual_home, actual_away = 0, 1
+        else:
+            actual_home = actual_away = 0.5
+
+        ratings[h] = home_rating + k * (actual_home - expected_home)
+        ratings[a] = away_rating + k * (actual_away - expected_away)
+
+    return home_elo, away_elo
+
+
+def team_perspective_rows(index, team_mask):
+    """create_team_perspective_df for the teams selected by `team_mask`."""
+    n = len(index['dates'])
+    home_win = (index['ftr'] == 0).astype(np.int64)
+    away_win = (index['ftr'] == 2).astype(np.int64)
+    draw = (index['ftr'] == 1).astype(np.int64)
+    teams = index['teams']
+
+    parts = []
+    for side, team, opp, gf, ga, points, win, offset in (
+        (1, index['home'], index['away'], index['fthg'], index['ftag'], home_win * 3 + draw, home_win, 0),
+        (0, index['away'], index['home'], index['ftag'], index['fthg'], away_win * 3 + draw, away_win, n),
+    ):
+        rows = np.flatnonzero(team_mask[team])
+        parts.append(pd.DataFrame({
+            "Date": index['dates'][rows],
+            "Team": teams[team[rows]],
+            "Opponent": teams[opp[rows]],
+            "GoalsFor": gf[rows],
+            "GoalsAgainst": ga[rows],
+            "Points": points[rows],
+            "Win": win[rows],
+            "is_home": side,
+            "row_id": rows + offset,
+        }))
+
+    return pd.concat(parts, ignore_index=True).sort_values(["Team", "Date"]).reset_index(drop=True)
+
+
+def plan_team_groups(index, budget_bytes, n_feature_cols):
+    """Pack teams into groups whose team_df fits in half the memory budget."""
+    counts = np.bincount(index['home'], minlength=len(index['teams'])) + \
+        np.bincount(index['away'], minlength=len(index['teams']))
+    bytes_per_row = (n_feature_cols + len(TEAM_META_COLS)) * 8 * TEAM_ROW_OVERHEAD
+    max_rows = max(1, int(budget_bytes // 2 // bytes_per_row))
+
+    groups, current, current_rows = [], [], 0
+    for team in np.argsort(-counts, kind="stable"):
+        if current and current_rows + counts[team] > max_rows:
+            groups.append(current)
+            current, current_rows = [], 0
+        current.append(team)
+        current_rows += counts[team]
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _probe_team_feature_cols(index):
+    """Column layout and integer columns of the team features, from a one-team dry run."""
+    mask = np.zeros(len(index['teams']), dtype=bool)
+    mask[index['home'][0]] = True
+    team_df = team_perspective_rows(index, mask)
+    team_df = fe.create_head_to_head_features(fe.create_rolling_features(team_df, windows=[3, 5, 10]))
+    feature_cols = [c for c in team_df.columns if c not in TEAM_META_COLS]
+    int_cols = [c for c in feature_cols if pd.api.types.is_integer_dtype(team_df[c])]
+    return feature_cols, int_cols
+
+
+def build_team_store(index, store_path, budget_bytes):
+    """Compute rolling + H2H features group by group into a (2n, n_cols) memmap."""
+    n = len(index['dates'])
+    feature_cols, int_cols = _probe_team_feature_cols(index)
+    groups = plan_team_groups(index, budget_bytes, len(feature_cols))
+
+    store = np.lib.format.open_memmap(store_path, mode='w+', dtype=np.float64,
+                                      shape=(2 * n, len(feature_cols)))
+    del store
+
+    print(f"  Team features: {len(feature_cols)} columns, {len(groups)} team group(s)")
+    for group in groups:
+        mask = np.zeros(len(index['teams']), dtype=bool)
+        mask[group] = True
+        team_df = team_perspective_rows(index, mask)
+        team_df = fe.create_rolling_features(team_df, windows=[3, 5, 10])
+        team_df = fe.create_head_to_head_features(team_df)
+
+        store = np.load(store_path, mmap_mode='r+')
+        store[team_df["row_id"].to_numpy()] = team_df[feature_cols].to_numpy(dtype=np.float64)
+        store.flush()
+        del store, team_df
+
+    return feature_cols, int_cols
+
+
+def _match_chunk_rows(filepath, budget_bytes, n_team_cols):
+    sample = pd.read_csv(filepath, nrows=1000)
+    raw_bytes = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    derived_bytes = (3 * n_team_cols + 32) * 8
+    per_row = (raw_bytes + derived_bytes) * MATCH_ROW_OVERHEAD
+    return max(100, int(budget_bytes // 2 // per_row))
+
+
+class _ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.writer = None
+        self.schema_cols = None
+        self.rows = 0
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+    def write(self, chunk):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Keep one schema across chunks: numbers as float64, the rest as text
+            if self.schema_cols is None:
+                self.schema_cols = {c: pd.api.types.is_numeric_dtype(chunk[c]) for c in chunk.columns
+                                    if c != "Date"}
+            chunk = chunk.copy()
+            for col, numeric in self.schema_cols.items():
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(np.float64) \
+                    if numeric else chunk[col].astype(str)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='w' if self.rows == 0 else 'a',
+                         header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def build_features_chunked(input_path="data/merged_matches.csv", output_path="data/features.csv",
+                           memory_budget_mb=512, work_dir=None):
+    """Chunked equivalent of feature_engineering.main(); returns (rows, n_columns)."""
+    budget_bytes = memory_budget_mb * 2**20
+
+    print("\n Reading match index")
+    index = read_match_index(input_path)
+    n = len(index['dates'])
+    print(f" Indexed {n} matches, {len(index['teams'])} teams")
+
+    print(" Replaying Elo ratings")
+    home_elo, away_elo = replay_elo(index)
+
+    tmp_dir = tempfile.mkdtemp(prefix='features_', dir=work_dir)
+    try:
+        store_path = os.path.join(tmp_dir, 'team_features.npy')
+        print(" Creating rolling and head-to-head features by team group")
+        team_cols, int_cols = build_team_store(index, store_path, budget_bytes)
+        del index
+
+        chunk_rows = _match_chunk_rows(input_path, budget_bytes, len(team_cols))
+        print(f" Streaming matches in chunks of {chunk_rows} rows")
+
+        writer = _ChunkWriter(output_path)
+        home_cols = [f"{c}_home" for c in team_cols]
+        away_cols = [f"{c}_away" for c in team_cols]
+        pos = 0
+        n_columns = 0
+        try:
+            for chunk in pd.read_csv(input_path, chunksize=chunk_rows):
+                chunk["Date"] = pd.to_datetime(chunk["Date"], errors="coerce")
+                chunk = chunk.dropna(subset=["Date"]).reset_index(drop=True)
+                rows = np.arange(pos, pos + len(chunk))
+                pos += len(chunk)
+
+                chunk["home_elo"] = home_elo[rows]
+                chunk["away_elo"] = away_elo[rows]
+                chunk["elo_diff"] = chunk["home_elo"] - chunk["away_elo"]
+                chunk = fe.create_match_outcomes(chunk)
+
+                store = np.load(store_path, mmap_mode='r')
+                home_feats = pd.DataFrame(np.asarray(store[rows]), columns=home_cols)
+                away_feats = pd.DataFrame(np.asarray(store[rows + n]), columns=away_cols)
+                del store
+                # The store is float64; restore the integer columns so the CSV matches
+                for col in int_cols:
+                    home_feats[f"{col}_home"] = home_feats[f"{col}_home"].astype(np.int64)
+                    away_feats[f"{col}_away"] = away_feats[f"{col}_away"].astype(np.int64)
+
+                features = pd.concat([chunk, home_feats, away_feats], axis=1)
+                features = fe.create_differential_features(features)
+
+                nan_count = features.isna().sum(axis=1)
+                features = features[nan_count < (len(features.columns) * NAN_THRESHOLD)]
+                features = features.fillna(0)
+                n_columns = len(features.columns)
+
+                writer.write(features)
+                del chunk, home_feats, away_feats, features
+        finally:
+            writer.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return writer.rows, n_columns
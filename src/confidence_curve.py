@@ -0,0 +1,187 @@
+"""
+confidence_curve.py
+───────────────────
+Coverage and hit rate at every confidence threshold, from a single sort.
+
+Predictions are sorted by confidence (the top class probability) once.
+Running sums of the sorted hit flags then give, for every distinct
+confidence value t:
+  - how many matches have confidence >= t
+  - how many of those the model called right
+  - the coverage and hit rate that follow from those counts
+
+A fixed threshold table (the betting analysis in train_models.py) or a
+confidence band (the app's signal badges, predict.py's recommendation) is
+a lookup into that curve. There is no re-filtering per threshold.
+
+Every artifact directory carries the curves of its own models:
+train_models.py saves models/confidence_curves.npz (held-out test split),
+hyperparameter_tuning.py models/tuned/confidence_curves.npz (the tuned
+configurations' out-of-fold probabilities). This script prints tables from
+such a file or exports the full curves to CSV:
+
+  python src/confidence_curve.py
+  python src/confidence_curve.py --thresholds 0.4 0.5 0.6 0.7 --csv curves.csv
+  python src/confidence_curve.py --curves models/tuned/confidence_curves.npz
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+CURVES_NAME = 'confidence_curves.npz'
+CURVES_PATH = os.path.join('models', CURVES_NAME)
+TABLE_THRESHOLDS = (0.50, 0.55, 0.60, 0.65)
+
+# (lower confidence bound, label), strongest first; each band runs up to the one above it
+SIGNAL_BANDS = (
+    (0.65, 'STRONG SIGNAL'),
+    (0.55, 'MODERATE SIGNAL'),
+    (0.45, 'WEAK SIGNAL'),
+    (0.0, 'NO CLEAR EDGE'),
+)
+
+FIELDS = ('threshold', 'n_bets', 'n_correct')
+
+
+@dataclass(frozen=True)
+class ConfidenceCurve:
+    threshold: np.ndarray   # distinct confidence values, descending
+    n_bets: np.ndarray      # matches with confidence >= threshold
+    n_correct: np.ndarray   # ... of which the predicted outcome happened
+    n_total: int
+
+    @classmethod
+    def from_predictions(cls, probabilities, y_true):
+        proba = np.asarray(probabilities)
+        confidence = proba.max(axis=1)
+        hit = proba.argmax(axis=1) == np.asarray(y_true)
+
+        order = np.argsort(-confidence, kind='stable')
+        confidence = confidence[order]
+        cum_correct = np.cumsum(hit[order])
+        # Last position of every run of equal confidences: ties enter together
+        ends = np.flatnonzero(np.append(confidence[1:] != confidence[:-1], True)) if len(confidence) else \
+            np.empty(0, dtype=np.intp)
+        return cls(confidence[ends], (ends + 1).astype(np.int64), cum_correct[ends].astype(np.int64),
+                   len(confidence))
+
+    @property
+    def coverage(self):
+        return self.n_bets / max(self.n_total, 1)
+
+    @property
+    def hit_rate(self):
+        return self.n_correct / self.n_bets
+
+    def at(self, thresholds):
+        """(n_bets, n_correct) arrays for confidence >= each threshold."""
+        # Thresholds take the probabilities' dtype, as in a plain `confidence >= t` filter
+        k = np.searchsorted(-self.threshold, -np.asarray(thresholds).astype(self.threshold.dtype), side='right')
+        return np.append(0, self.n_bets)[k], np.append(0, self.n_correct)[k]
+
+    def band(self, lower, upper=None):
+        """(n_bets, n_correct) for lower <= confidence < upper."""
+        bets, correct = self.at([lower, np.inf if upper is None else upper])
+        return int(bets[0] - bets[1]), int(correct[0] - correct[1])
+
+    def table(self, thresholds=TABLE_THRESHOLDS):
+        bets, correct = self.at(thresholds)
+        return [{'threshold': float(t), 'n_bets': int(b), 'n_correct': int(c),
+                 'coverage': b / max(self.n_total, 1), 'hit_rate': c / b if b else float('nan')}
+                for t, b, c in zip(thresholds, bets, correct)]
+
+
+def signal_band(confidence):
+    """(label, lower, upper) of the SIGNAL_BANDS entry containing `confidence`."""
+    upper = None
+    for lower, label in SIGNAL_BANDS:
+        if confidence >= lower:
+            return label, lower, upper
+        upper = lower
+    return SIGNAL_BANDS[-1][1], SIGNAL_BANDS[-1][0], upper
+
+
+def curves_path(model_dir):
+    """Where the curves of the models saved in `model_dir` live."""
+    return os.path.join(model_dir, CURVES_NAME)
+
+
+def compute_curves(probabilities, y_true):
+    """{model name: ConfidenceCurve} for {model name: (n, 3) probabilities} on the same targets."""
+    return {name: ConfidenceCurve.from_predictions(proba, y_true) for name, proba in probabilities.items()}
+
+
+def save_curves(path, curves):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    arrays = {}
+    for name, curve in curves.items():
+        for field in FIELDS:
+            arrays[f'{name}:{field}'] = getattr(curve, field)
+        arrays[f'{name}:n_total'] = np.int64(curve.n_total)
+    np.savez(path, **arrays)
+
+
+def load_curves(path=CURVES_PATH):
+    with np.load(path) as data:
+        names = dict.fromkeys(key.partition(':')[0] for key in data.keys())
+        return {name: ConfidenceCurve(*(data[f'{name}:{field}'] for field in FIELDS),
+                                      int(data[f'{name}:n_total']))
+                for name in names}
+
+
+def print_threshold_table(curve, thresholds=TABLE_THRESHOLDS):
+    for row in curve.table(thresholds):
+        if row['n_bets'] == 0:
+            continue
+        print(f"\nConfidence ≥ {row['threshold']:.0%}:")
+        print(f"  Bets:     {row['n_bets']} ({row['coverage']:.1%})")
+        print(f"  Accuracy: {row['hit_rate']:.1%} ({row['n_correct']}/{row['n_bets']})")
+
+
+def export_csv(path, curves):
+    import pandas as pd
+
+    frames = [pd.DataFrame({'model': name, 'threshold': c.threshold, 'n_bets': c.n_bets,
+                            'n_correct': c.n_correct, 'coverage': c.coverage, 'hit_rate': c.hit_rate})
+              for name, c in curves.items()]
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confidence threshold tables from the saved curves")
+    parser.add_argument('--curves', default=CURVES_PATH)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=list(TABLE_THRESHOLDS))
+    parser.add_argument('--csv', default=None, help="also export every curve point to this CSV file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.curves):
+        print(f"\n Error: {args.curves} not found!")
+        print("   Run: python src/train_models.py")
+        return
+
+    curves = load_curves(args.curves)
+    for name, curve in curves.items():
+        print(f"\n{'='*80}")
+        print(f"CONFIDENCE THRESHOLDS - {name} ({curve.n_total} matches, {len(curve.threshold)} curve points)")
+        print("="*80)
+        print_threshold_table(curve, args.thresholds)
+
+        print(f"\nSignal bands:")
+        upper = None
+        for lower, label in SIGNAL_BANDS:
+            bets, correct = curve.band(lower, upper)
+            rate = f"{correct / bets:.1%}" if bets else "  -  "
+            print(f"  {label:16s} {bets:5d} matches  hit rate {rate}")
+            upper = lower
+
+    if args.csv:
+        export_csv(args.csv, curves)
+        print(f"\n✓ Curves exported to {args.csv}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from types import MappingProxyType
+
+CACHE_DIR = 'data/cache'
+LOADER_VERSION = 1
+
+TARGET_MAP = {'H': 0, 'D': 1, 'A': 2}
+
+EXCLUDE_COLS = [
+    'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR',
+    'home_win', 'away_win', 'draw', 'home_points', 'away_points', 'target',
+    'Div', 'Season', 'Time', 'Referee', 'HTR', 'HTHG', 'HTAG',
+    'Date_home', 'Date_away', 'Team_home', 'Team_away',
+    'Opponent_home', 'Opponent_away'
+]
+
+META_COLS = ['Season', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR']
+
+_MEMO = {}
+
+
+def sanitize_feature_names(feature_cols):
+    """Feature names for XGBoost compatibility"""
+    sanitized = []
+    for col in feature_cols:
+        clean_name = col.replace('[', '_').replace(']', '_').replace('<', '_lt_').replace('>', '_gt_')
+        sanitized.append(clean_name)
+    return sanitized
+
+
+def file_hash(filepath: str) -> str:
+    """SHA-256 of a file's contents, read in 1MB blocks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_only(arr):
+    arr = np.asarray(arr)
+    arr.flags.writeable = False
+    return arr
+
+
+@dataclass(frozen=True)
+class MatchDataset:
+    """Read-only feature matrix shared by the training, tuning and SHAP stages.
+
+    X is float32 (n_matches, n_features) in chronological order, y holds the
+    encoded FTR target (0=H, 1=D, 2=A), and `meta` keeps the identifying
+    match columns (Season, teams, score, FTR) as read-only arrays.
+    """
+    X: np.ndarray
+    y: np.ndarray
+    feature_cols: tuple
+    dates: pd.DatetimeIndex
+    name_mapping: MappingProxyType
+    meta: MappingProxyType
+    data_hash: str
+    source: str
+
+    def __len__(self):
+        return len(self.y)
+
+    def frame(self, rows=slice(None)) -> pd.DataFrame:
+        """Features as a DataFrame with sanitized column names."""
+        return pd.DataFrame(self.X[rows], columns=list(self.feature_cols))
+
+    def target(self, rows=slice(None)) -> pd.Series:
+        return pd.Series(self.y[rows], name='target')
+
+    def meta_frame(self, rows=slice(None)) -> pd.DataFrame:
+        """Date, match metadata and target as a fresh DataFrame."""
+        meta = pd.DataFrame({'Date': self.dates[rows]})
+        for col, values in self.meta.items():
+            meta[col] = values[rows]
+        meta['target'] = self.y[rows]
+        return meta
+
+    def split_index(self, test_size: float = 0.2) -> int:
+        """Row index separating the chronological train and test periods."""
+        return int(len(self) * (1 - test_size))
+
+
+def _parse_features_csv(filepath: str, data_hash: str) -> MatchDataset:
+    df = pd.read_csv(filepath)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values('Date').reset_index(drop=True)
+
+    df['target'] = df['FTR'].map(TARGET_MAP)
+    invalid = df['target'].isna().sum()
+    if invalid > 0:
+        print(f"\n⚠ Warning: {invalid} invalid FTR values found")
+        df = df.dropna(subset=['target']).reset_index(drop=True)
+
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    original_feature_cols = [col for col in numeric_cols if col not in EXCLUDE_COLS]
+    feature_cols = sanitize_feature_names(original_feature_cols)
+
+    X = df[original_feature_cols].fillna(0).to_numpy(dtype=np.float32)
+
+    meta = {}
+    for col in META_COLS:
+        if col in df.columns:
+            values = df[col].to_numpy()
+            meta[col] = values.astype(str) if values.dtype == object else values
+
+    return MatchDataset(
+        X=_read_only(np.ascontiguousarray(X)),
+        y=_read_only(df['target'].to_numpy(dtype=np.int64)),
+        feature_cols=tuple(feature_cols),
+        dates=pd.DatetimeIndex(df['Date']),
+        name_mapping=MappingProxyType(dict(zip(original_feature_cols, feature_cols))),
+        meta=MappingProxyType({col: _read_only(v) for col, v in meta.items()}),
+        data_hash=data_hash,
+        source=os.path.abspath(filepath),
+    )
+
+
+def _cache_path(data_hash: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f'dataset-v{LOADER_VERSION}-{data_hash[:16]}')
+
+
+def _write_cache(dataset: MatchDataset, path: str):
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    os.makedirs(tmp_path, exist_ok=True)
+
+    np.save(os.path.join(tmp_path, 'X.npy'), dataset.X)
+    np.save(os.path.join(tmp_path, 'y.npy'), dataset.y)
+    np.save(os.path.join(tmp_path, 'dates.npy'), dataset.dates.asi8)
+    for col, values in dataset.meta.items():
+        np.save(os.path.join(tmp_path, f'meta_{col}.npy'), values)
+
+    with open(os.path.join(tmp_path, 'info.json'), 'w') as f:
+        json.dump({
+            'loader_version': LOADER_VERSION,
+            'data_hash': dataset.data_hash,
+            'source': dataset.source,
+            'feature_cols': list(dataset.feature_cols),
+            'name_mapping': dict(dataset.name_mapping),
+            'meta_cols': list(dataset.meta.keys()),
+        }, f)
+
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process published the same cache entry first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _read_cache(path: str) -> MatchDataset:
+    with open(os.path.join(path, 'info.json')) as f:
+        info = json.load(f)
+
+    meta = {
+        col: np.load(os.path.join(path, f'meta_{col}.npy'), mmap_mode='r')
+        for col in info['meta_cols']
+    }
+    return MatchDataset(
+        X=np.load(os.path.join(path, 'X.npy'), mmap_mode='r'),
+        y=np.load(os.path.join(path, 'y.npy'), mmap_mode='r'),
+        feature_cols=tuple(info['feature_cols']),
+        dates=pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')).view('datetime64[ns]')),
+        name_mapping=MappingProxyType(info['name_mapping']),
+        meta=MappingProxyType(meta),
+        data_hash=info['data_hash'],
+        source=info['source'],
+    )
+
+
+def load_dataset(filepath: str = 'data/features.csv', cache_dir: str = CACHE_DIR,
+                 use_cache: bool = True) -> MatchDataset:
+    """Load the engineered feature matrix, memoized in-process and on disk.
+
+    The on-disk cache is keyed by the SHA-256 of the CSV, so every stage of a
+    pipeline run (and every process) shares a single parse of features.csv.
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+    if use_cache and memo_key in _MEMO:
+        return _MEMO[memo_key]
+
+    data_hash = file_hash(filepath)
+    path = _cache_path(data_hash, cache_dir)
+
+    if use_cache and os.path.exists(os.path.join(path, 'info.json')):
+        dataset = _read_cache(path)
+        print(f"✓ Dataset cache hit ({data_hash[:12]})")
+    else:
+        dataset = _parse_features_csv(filepath, data_hash)
+        if use_cache:
+            _write_cache(dataset, path)
+
+    if use_cache:
+        _MEMO[memo_key] = dataset
+    return dataset
+
+
+def load_cached(data_hash: str, cache_dir: str = CACHE_DIR) -> MatchDataset:
+    """Memory-map a dataset already in the on-disk cache, by its data hash.
+
+    Worker processes use this to share the parent's feature matrix through
+    the page cache without re-hashing or re-parsing features.csv.
+    """
+    path = _cache_path(data_hash, cache_dir)
+    if not os.path.exists(os.path.join(path, 'info.json')):
+        raise FileNotFoundError(f"No cached dataset for {data_hash[:12]} in {cache_dir}")
+    return _read_cache(path)
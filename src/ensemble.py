@@ -0,0 +1,108 @@
+"""
+ensemble.py
+───────────
+One object for the deployed XGBoost + Random Forest blend.
+
+EnsemblePredictor owns the booster, the flat-array forest (flat_forest.py)
+and the blend settings from the artifact manifest: weights and, when
+ensemble_weights.py fitted them, per-class temperatures. Column order is checked
+once, when the predictor is built; after that predict_proba() takes a
+contiguous float32 (n_matches, n_features) array and returns the per-model
+and blended probabilities for the whole batch with no DataFrame in sight.
+"""
+
+import numpy as np
+
+from artifacts import DEFAULT_WEIGHTS, load_artifacts
+from flat_forest import FlatForest
+
+OUTCOMES = ['Home Win', 'Draw', 'Away Win']
+
+
+def apply_temperature(proba, temperature):
+    """softmax(log(p) / T) over the last axis; T is a scalar or one value per class."""
+    if temperature is None:
+        return proba
+    logits = np.log(np.clip(proba, 1e-15, None)) / np.asarray(temperature, dtype=np.float64)
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def blend_from_manifest(manifest):
+    """Keyword arguments for EnsemblePredictor taken from an artifact manifest (or None)."""
+    manifest = manifest or {}
+    return {'weights': manifest.get('ensemble_weights'),
+            'temperature': manifest.get('ensemble_temperature')}
+
+
+class EnsemblePredictor:
+    """Blended XGBoost + Random Forest probabilities for batches of matches."""
+
+    def __init__(self, booster, forest, feature_cols, weights=None, temperature=None):
+        self.booster = booster
+        self.forest = forest
+        self.feature_cols = list(feature_cols)
+        weights = dict(weights or DEFAULT_WEIGHTS)
+        total = weights['xgboost'] + weights['random_forest']
+        self.weights = {name: w / total for name, w in weights.items()}
+        self.temperature = None if temperature is None else np.asarray(temperature, dtype=np.float64)
+
+        # Validate the column contract once, up front
+        n_features = len(self.feature_cols)
+        if booster.feature_names is not None and list(booster.feature_names) != self.feature_cols:
+            raise ValueError("XGBoost feature names do not match feature_cols")
+        if booster.num_features() != n_features:
+            raise ValueError(f"XGBoost expects {booster.num_features()} features, got {n_features}")
+        if forest.feature_names_in_ is not None and list(forest.feature_names_in_) != self.feature_cols:
+            raise ValueError("Random Forest feature names do not match feature_cols")
+        if forest.n_features_in_ != n_features:
+            raise ValueError(f"Random Forest expects {forest.n_features_in_} features, got {n_features}")
+
+        self._names = np.array(self.feature_cols, dtype=object)
+        self._home_idx = np.array([i for i, c in enumerate(self.feature_cols) if '_home' in c], dtype=np.intp)
+        self._away_idx = np.array([i for i, c in enumerate(self.feature_cols)
+                                   if '_away' in c and '_home' not in c], dtype=np.intp)
+
+    @classmethod
+    def from_models(cls, xgb_model, rf_model, feature_cols, weights=None, temperature=None):
+        """Wrap fitted estimators (XGBClassifier or Booster, sklearn forest or FlatForest)."""
+        booster = xgb_model.get_booster() if hasattr(xgb_model, 'get_booster') else xgb_model
+        forest = rf_model if isinstance(rf_model, FlatForest) else FlatForest.from_sklearn(rf_model)
+        return cls(booster, forest, feature_cols, weights, temperature)
+
+    @classmethod
+    def load(cls, model_dir='models', legacy_names=('xgboost_model', 'random_forest_model')):
+        """Load both models and the blend settings from an artifact directory."""
+        xgb_model, forest, feature_cols, manifest = load_artifacts(
+            model_dir, legacy_names=legacy_names, flat_forest=True)
+        return cls.from_models(xgb_model, forest, feature_cols, **blend_from_manifest(manifest))
+
+    def match_features(self, home_row, away_row):
+        """(1, n_features) float32 row from a home team's and away team's latest
+        feature rows (pandas Series): `_home` columns come from the home row,
+        `_away` columns from the away row, anything else or missing is 0."""
+        X = np.zeros((1, len(self.feature_cols)), dtype=np.float32)
+        for idx, row in ((self._home_idx, home_row), (self._away_idx, away_row)):
+            values = row.reindex(self._names[idx]).to_numpy(dtype=np.float64, na_value=0.0)
+            X[0, idx] = np.nan_to_num(values, nan=0.0)
+        return X
+
+    def predict_proba(self, X):
+        """Per-model and blended probabilities for a float32 feature matrix.
+
+        Returns a dict of (n, 3) arrays: 'xgb', 'rf' and 'ensemble'.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_cols):
+            raise ValueError(f"Expected an (n, {len(self.feature_cols)}) feature matrix, got shape {X.shape}")
+
+        xgb_proba = np.asarray(self.booster.inplace_predict(X), dtype=np.float64)
+        rf_proba = self.forest.predict_proba(X)
+        ensemble = apply_temperature(
+            self.weights['xgboost'] * xgb_proba + self.weights['random_forest'] * rf_proba,
+            self.temperature)
+        return {'xgb': xgb_proba, 'rf': rf_proba, 'ensemble': ensemble}
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X)['ensemble'], axis=1)
@@ -0,0 +1,208 @@
+"""
+ensemble_tuning.py
+──────────────────
+Joint search over XGBoost configuration, Random Forest configuration and
+blend weight, judged on probabilities, without a single extra fit.
+
+Every tuning fit stores its test-fold probabilities in the TrialStore.
+Stitched across the TimeSeriesSplit folds, they give each candidate
+(configuration, tree count) out-of-fold (OOF) probabilities over the same
+rows. Only tree counts of the search space are candidates: successive
+halving's early rungs fit fewer trees than any deployable model. The `top_k` candidates of each model by their own log-loss are
+paired, and every pair is blended at every weight of the grid:
+  - Brier score is quadratic in the weight, so for all pairs at once it
+    follows from the candidates' squared residuals and one matrix product
+    of their cross terms.
+  - Log-loss and accuracy need the blended probabilities, so they are
+    computed one XGBoost candidate at a time against every Random Forest
+    candidate and weight.
+What gets deployed is the best (XGBoost, Random Forest, weight) triple
+rather than each search's own winner blended 60/40, which is reported
+alongside as the baseline (the best single candidates when run on its own).
+
+Usage:
+  python src/ensemble_tuning.py                  # rank what the trial store already holds
+  python src/ensemble_tuning.py --metric brier --top-k 40 --step 0.01
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from artifacts import DEFAULT_WEIGHTS
+from ensemble_weights import EPS, MODELS, weight_grid
+from trial_store import DEFAULT_PATH as TRIAL_STORE, TrialStore
+from tuner import SPACES, time_series_folds
+
+ENSEMBLE_METRICS = ('logloss', 'brier')
+
+
+def load_candidates(store, data_hash, model, folds, y_oof, top_k=25, tree_counts=None):
+    """[(params, OOF probabilities)] of `model`'s best `top_k` stored candidates by their own log-loss.
+
+    Candidates are limited to `tree_counts` (default: the n_estimators of
+    `model`'s search space); top_k=None keeps them all.
+    """
+    tree_counts = set(tree_counts or SPACES[model]['n_estimators'])
+    candidates = [(params, proba.astype(np.float64))
+                  for params, proba in store.oof_probas(data_hash, model, folds, tree_counts).values()]
+    rows = np.arange(len(y_oof))
+    candidates.sort(key=lambda c: -np.mean(np.log(np.clip(c[1][rows, y_oof], EPS, None))))
+    return candidates[:top_k]
+
+
+def score_pairs(a, b, y, weights):
+    """Log-loss, Brier score and accuracy of w * a_i + (1 - w) * b_j for every i, j and weight.
+
+    a is (na, n, 3), b is (nb, n, 3) and weights is (m,). Returns three
+    (na, nb, m) arrays.
+    """
+    n, n_classes = a.shape[1:]
+    onehot = np.eye(n_classes)[y]
+    rows = np.arange(n)
+    w = weights[None, :, None]
+
+    res_a, res_b = a - onehot, b - onehot
+    sq_a = np.einsum('inc,inc->i', res_a, res_a) / n
+    sq_b = np.einsum('jnc,jnc->j', res_b, res_b) / n
+    cross = np.einsum('inc,jnc->ij', res_a, res_b) / n
+    ww = weights[None, None, :]
+    brier = ww ** 2 * sq_a[:, None, None] + 2 * ww * (1 - ww) * cross[:, :, None] + (1 - ww) ** 2 * sq_b[None, :, None]
+
+    logloss = np.empty((len(a), len(b), len(weights)))
+    accuracy = np.empty_like(logloss)
+    b_true = b[:, rows, y]
+    for i in range(len(a)):
+        # (nb, m, n) blended probability of the true class and of each class
+        true = w * a[i, rows, y][None, None, :] + (1 - w) * b_true[:, None, :]
+        logloss[i] = -np.log(np.clip(true, EPS, None)).mean(axis=-1)
+        # argmax takes the first of tied classes, as the deployed EnsemblePredictor does
+        blended = np.stack([w * a[i, :, c][None, None, :] + (1 - w) * b[:, None, :, c] for c in range(n_classes)])
+        accuracy[i] = (np.argmax(blended, axis=0) == y).mean(axis=-1)
+    return logloss, brier, accuracy
+
+
+@dataclass(frozen=True)
+class EnsembleSearch:
+    params: dict            # model -> best configuration (with n_estimators)
+    weights: dict           # model -> blend weight
+    logloss: float
+    brier: float
+    accuracy: float
+    baseline_logloss: float  # each search's winner (else best single candidate), blended 60/40
+    baseline_brier: float
+    baseline_accuracy: float
+    baseline_label: str
+    n_candidates: dict      # model -> candidates paired
+    n_combinations: int
+    n_matches: int
+    seconds: float
+
+    def manifest_fit(self, data_hash):
+        """Provenance recorded next to the weights in manifest.json."""
+        return {
+            'method': 'joint_tuning_oof',
+            'oof_data_hash': data_hash,
+            'n_matches': self.n_matches,
+            'n_candidates': self.n_combinations,
+            'logloss': self.logloss,
+            'brier': self.brier,
+            'accuracy': self.accuracy,
+            'baseline_logloss': self.baseline_logloss,
+            'baseline_accuracy': self.baseline_accuracy,
+        }
+
+
+def search_ensemble(store, data_hash, folds, y, top_k=25, step=0.05, metric='logloss', winners=None):
+    """Best (XGBoost, Random Forest, weight) by OOF `metric` over the candidates in the trial store.
+
+    `winners` ({model: params}, e.g. each search's best_params) are blended
+    60/40 as the baseline; without them, or if one has no OOF probabilities
+    on every fold, each model's best candidate by log-loss stands in.
+    """
+    if metric not in ENSEMBLE_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Use {' or '.join(ENSEMBLE_METRICS)}")
+    start = time.perf_counter()
+    y = np.asarray(y)
+    y_oof = np.concatenate([y[test] for _, test in folds]).astype(np.intp)
+    stored = {model: load_candidates(store, data_hash, model, folds, y_oof, top_k=None) for model in MODELS}
+    for model, found in stored.items():
+        if not found:
+            raise RuntimeError(f"No {model} candidate in {store.path} has probabilities on every fold; "
+                               f"tune it first")
+    candidates = {model: found[:top_k] for model, found in stored.items()}
+
+    a, b = (np.stack([proba for _, proba in candidates[model]]) for model in MODELS)
+    weights = weight_grid(step)[:, 0]
+    logloss, brier, accuracy = score_pairs(a, b, y_oof, weights)
+    best = np.unravel_index(np.argmin(logloss if metric == 'logloss' else brier), logloss.shape)
+
+    winners = winners or {}
+    own = {model: next((proba for params, proba in stored[model] if params == winners.get(model)), None)
+           for model in MODELS}
+    if all(proba is not None for proba in own.values()):
+        base_a, base_b, label = own[MODELS[0]], own[MODELS[1]], "Search winners, 60/40"
+    else:
+        base_a, base_b, label = a[0], b[0], "Best single candidates, 60/40"
+    baseline = score_pairs(base_a[None], base_b[None], y_oof, np.array([DEFAULT_WEIGHTS[MODELS[0]]]))
+    w = float(weights[best[2]])
+    return EnsembleSearch(
+        params={MODELS[0]: candidates[MODELS[0]][best[0]][0], MODELS[1]: candidates[MODELS[1]][best[1]][0]},
+        weights={MODELS[0]: round(w, 6), MODELS[1]: round(1 - w, 6)},
+        logloss=float(logloss[best]),
+        brier=float(brier[best]),
+        accuracy=float(accuracy[best]),
+        baseline_logloss=float(baseline[0][0, 0, 0]),
+        baseline_brier=float(baseline[1][0, 0, 0]),
+        baseline_accuracy=float(baseline[2][0, 0, 0]),
+        baseline_label=label,
+        n_candidates={model: len(found) for model, found in candidates.items()},
+        n_combinations=logloss.size,
+        n_matches=len(y_oof),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def print_ensemble_search(result):
+    counts = ' × '.join(f"{n} {model}" for model, n in result.n_candidates.items())
+    print(f"\n  {result.n_combinations:,} ensembles ({counts} × weights) over {result.n_matches:,} OOF matches "
+          f"in {result.seconds * 1000:.0f} ms")
+    print(f"  {'':28s} {'LogLoss':>8s} {'Brier':>8s} {'Accuracy':>9s}")
+    print(f"  {result.baseline_label:28s} {result.baseline_logloss:8.4f} {result.baseline_brier:8.4f} "
+          f"{result.baseline_accuracy:9.2%}")
+    label = f"Joint best, {result.weights['xgboost']:.2f}/{result.weights['random_forest']:.2f}"
+    print(f"  {label:28s} {result.logloss:8.4f} {result.brier:8.4f} {result.accuracy:9.2%}")
+    for model, params in result.params.items():
+        print(f"\n  {model}:")
+        for param, value in params.items():
+            print(f"    {param:20s}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick base-model configurations and blend weights jointly "
+                                                 "from the OOF probabilities in the trial store")
+    parser.add_argument('--store', default=TRIAL_STORE)
+    parser.add_argument('--metric', choices=ENSEMBLE_METRICS, default='logloss')
+    parser.add_argument('--top-k', type=int, default=25, help="candidates per model paired with each other")
+    parser.add_argument('--step', type=float, default=0.05, help="weight grid step")
+    parser.add_argument('--n-splits', type=int, default=5, help="TimeSeriesSplit folds the tuner used")
+    args = parser.parse_args()
+
+    from dataset import load_dataset
+
+    print("\n" + "="*80)
+    print("JOINT ENSEMBLE TUNING")
+    print("="*80)
+
+    dataset = load_dataset('data/features.csv')
+    with TrialStore(args.store) as store:
+        result = search_ensemble(store, dataset.data_hash, time_series_folds(len(dataset), args.n_splits),
+                                 dataset.y, args.top_k, args.step, args.metric)
+    print_ensemble_search(result)
+    print("\n" + "="*80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
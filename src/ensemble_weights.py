@@ -0,0 +1,274 @@
+"""
+ensemble_weights.py
+───────────────────
+Fits the XGBoost / Random Forest blend on out-of-fold (OOF) probabilities
+instead of hard-coding 60/40.
+
+The OOF matrices come from the season walk-forward backtest
+(season_backtest.py): every tested match is predicted by models that never
+saw its season. They are saved to models/oof/oof_probabilities.npz, so
+trying other weights never needs a retrain. The search blends all
+candidate weights in a single einsum and scores every (weight,
+temperature) pair's log-loss and accuracy at once. Temperatures can be
+shared across classes or fitted per class (home / draw / away). A few
+thousand candidates take a fraction of a second. Matches of
+train_models.py's test period are left out of the fit (--test-size), so
+the ensemble score reported on that period is still held out.
+
+The chosen weights (and temperatures, if any) are written into the
+artifact manifest, which EnsemblePredictor reads.
+
+Usage:
+  python src/ensemble_weights.py                       # fit and update models/manifest.json
+  python src/ensemble_weights.py --temperature per-class --model-dirs models models/tuned
+  python src/ensemble_weights.py --dry-run --step 0.005
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from artifacts import DEFAULT_WEIGHTS, ArtifactError, set_ensemble_blend
+
+OOF_PATH = 'models/oof/oof_probabilities.npz'
+MODELS = ('xgboost', 'random_forest')
+EPS = 1e-15
+
+# Bytes of candidate logits scored per chunk of temperatures
+CHUNK_BYTES = 64 * 2**20
+
+
+# ── Out-of-fold probabilities ──────────────────────────────────────────────
+
+def save_oof(path, probas, y, tested, data_hash):
+    """Per-model OOF probability matrices plus targets and the tested-row mask."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {f'proba:{name}': np.asarray(proba) for name, proba in probas.items()}
+    np.savez(path, y=np.asarray(y), tested=np.asarray(tested), data_hash=np.asarray(data_hash), **arrays)
+
+
+def load_oof(path=OOF_PATH):
+    with np.load(path) as data:
+        return {
+            'probas': {key.partition(':')[2]: data[key] for key in data.keys() if key.startswith('proba:')},
+            'y': data['y'],
+            'tested': data['tested'],
+            'data_hash': str(data['data_hash']),
+        }
+
+
+def collect_oof(dataset, models=MODELS, workers=None, cores=None, path=OOF_PATH):
+    """Run (or reuse cached) season backtests for every base model and save their OOF matrices."""
+    from season_backtest import season_backtest
+
+    probas, tested = {}, None
+    for model in models:
+        result = season_backtest(dataset, model, workers=workers, cores=cores)
+        probas[model] = result.oof_proba
+        tested = result.tested if tested is None else tested & result.tested
+
+    save_oof(path, probas, dataset.y, tested, dataset.data_hash)
+    return load_oof(path)
+
+
+# ── Vectorized search ──────────────────────────────────────────────────────
+
+def weight_grid(step=0.01):
+    """(m, 2) candidate [xgboost, random_forest] weights summing to one."""
+    w = np.round(np.arange(0.0, 1.0 + step / 2, step), 10)
+    return np.stack([w, 1.0 - w], axis=1)
+
+
+def temperature_grid(mode='shared', t_min=0.5, t_max=2.0, steps=31):
+    """(t, 3) candidate per-class temperatures; always includes T = 1 (no scaling)."""
+    if mode == 'none':
+        return np.ones((1, 3))
+    t = np.unique(np.append(np.geomspace(t_min, t_max, steps), 1.0))
+    if mode == 'shared':
+        return np.repeat(t[:, None], 3, axis=1)
+    if mode == 'per-class':
+        return np.stack(np.meshgrid(t, t, t, indexing='ij'), axis=-1).reshape(-1, 3)
+    raise ValueError(f"Unknown temperature mode '{mode}'. Use none, shared or per-class")
+
+
+def score_grid(probas, y, weights, temperatures):
+    """Log-loss and accuracy of every (weight, temperature) candidate.
+
+    probas is (k, n, 3) with one OOF matrix per model, weights is (m, k) and
+    temperatures is (t, 3). Returns two (m, t) arrays.
+    """
+    blend = np.einsum('mk,knc->mnc', weights, probas)
+    log_blend = np.log(np.clip(blend, EPS, None))
+    m, n, n_classes = log_blend.shape
+    # One contiguous (m, 1, n) slab per class; the class axis of 3 is far too
+    # short for NumPy reductions over it to be efficient
+    by_class = [np.ascontiguousarray(log_blend[:, None, :, c]) for c in range(n_classes)]
+    log_true = log_blend[:, np.arange(n), y][:, None, :]
+
+    logloss = np.empty((m, len(temperatures)))
+    accuracy = np.empty((m, len(temperatures)))
+    chunk = max(1, CHUNK_BYTES // (m * n * 8))
+    for start in range(0, len(temperatures), chunk):
+        cols = slice(start, start + chunk)
+        inv_t = 1.0 / temperatures[cols]
+        logits = [by_class[c] * inv_t[None, :, c, None] for c in range(n_classes)]
+        # log p <= 0 and T <= t_max keep every logit above log(EPS) / t_max, so
+        # the plain sum of exponentials cannot underflow or overflow
+        log_norm = np.log(sum(np.exp(z) for z in logits))
+        true_logit = log_true * inv_t[None, :, y]
+        logloss[:, cols] = (log_norm - true_logit).mean(axis=-1)
+        # argmax takes the first of tied classes, as create_ensemble and EnsemblePredictor do
+        accuracy[:, cols] = (np.argmax(np.stack(logits), axis=0) == y).mean(axis=-1)
+    return logloss, accuracy
+
+
+@dataclass(frozen=True)
+class BlendSearch:
+    weights: dict
+    temperature: list      # per-class temperatures, or None when T = 1 won
+    logloss: float
+    accuracy: float
+    baseline_logloss: float
+    baseline_accuracy: float
+    n_candidates: int
+    n_matches: int
+    seconds: float
+    rows_before: int = None  # only OOF rows before this index were fitted on (None: every tested row)
+
+    def manifest_fit(self, data_hash):
+        """Provenance recorded next to the weights in manifest.json."""
+        return {
+            'method': 'oof_grid_search',
+            'oof_data_hash': data_hash,
+            'rows_before': self.rows_before,
+            'n_matches': self.n_matches,
+            'n_candidates': self.n_candidates,
+            'logloss': self.logloss,
+            'accuracy': self.accuracy,
+            'baseline_logloss': self.baseline_logloss,
+            'baseline_accuracy': self.baseline_accuracy,
+        }
+
+
+def search_blend(oof, step=0.01, temperature='shared', metric='logloss', t_min=0.5, t_max=2.0, t_steps=31,
+                 rows_before=None):
+    """Best blend weights (and temperatures) for the tested rows of an OOF set.
+
+    With `rows_before` (e.g. Dataset.split_index()), rows from that index on
+    are left out, so a later held-out period stays unseen by the fit.
+    """
+    start = time.perf_counter()
+    tested = oof['tested']
+    if rows_before is not None:
+        tested = tested & (np.arange(len(tested)) < rows_before)
+    probas = np.stack([np.asarray(oof['probas'][name], dtype=np.float64)[tested] for name in MODELS])
+    y = np.asarray(oof['y'])[tested].astype(np.intp)
+
+    weights = weight_grid(step)
+    temperatures = temperature_grid(temperature, t_min, t_max, t_steps)
+    logloss, accuracy = score_grid(probas, y, weights, temperatures)
+
+    if metric == 'logloss':
+        best = np.unravel_index(np.argmin(logloss), logloss.shape)
+    elif metric == 'accuracy':
+        # Highest accuracy; log-loss breaks the (frequent) ties
+        order = np.lexsort((logloss.ravel(), -accuracy.ravel()))
+        best = np.unravel_index(order[0], logloss.shape)
+    else:
+        raise ValueError(f"Unknown metric '{metric}'. Use logloss or accuracy")
+
+    baseline = np.array([[DEFAULT_WEIGHTS[name] for name in MODELS]])
+    base_logloss, base_accuracy = score_grid(probas, y, baseline, np.ones((1, 3)))
+
+    w = weights[best[0]]
+    t = temperatures[best[1]]
+    return BlendSearch(
+        weights={name: round(float(value), 6) for name, value in zip(MODELS, w)},
+        temperature=None if np.all(t == 1.0) else [float(v) for v in t],
+        logloss=float(logloss[best]),
+        accuracy=float(accuracy[best]),
+        baseline_logloss=float(base_logloss[0, 0]),
+        baseline_accuracy=float(base_accuracy[0, 0]),
+        n_candidates=logloss.size,
+        n_matches=len(y),
+        seconds=time.perf_counter() - start,
+        rows_before=rows_before,
+    )
+
+
+def print_search(result):
+    rows = f" (rows before {result.rows_before:,})" if result.rows_before is not None else ""
+    print(f"\n  {result.n_candidates:,} candidates over {result.n_matches:,} OOF matches{rows} "
+          f"in {result.seconds * 1000:.0f} ms")
+    print(f"  {'':22s} {'LogLoss':>8s} {'Accuracy':>9s}")
+    print(f"  {'60/40 (default)':22s} {result.baseline_logloss:8.4f} {result.baseline_accuracy:9.2%}")
+    label = f"{result.weights['xgboost']:.2f}/{result.weights['random_forest']:.2f} (fitted)"
+    print(f"  {label:22s} {result.logloss:8.4f} {result.accuracy:9.2%}")
+    if result.temperature is not None:
+        print(f"  Temperature (H/D/A): {' / '.join(f'{t:.3f}' for t in result.temperature)}")
+
+
+def cached_oof(dataset, oof_path=OOF_PATH):
+    """The saved OOF matrices if they were computed for `dataset`, else None."""
+    oof = load_oof(oof_path) if os.path.exists(oof_path) else None
+    return oof if oof is not None and oof['data_hash'] == dataset.data_hash else None
+
+
+def optimize_blend(dataset, oof_path=OOF_PATH, refresh=False, workers=None, cores=None, **search_kwargs):
+    """OOF matrices for `dataset` (reused from oof_path when its data hash matches) and the best blend."""
+    oof = None if refresh else cached_oof(dataset, oof_path)
+    if oof is None:
+        oof = collect_oof(dataset, workers=workers, cores=cores, path=oof_path)
+        print(f"✓ OOF probabilities saved to {oof_path}")
+    return search_blend(oof, **search_kwargs), oof
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit ensemble blend weights on out-of-fold probabilities")
+    parser.add_argument('--model-dirs', nargs='+', default=['models'],
+                        help="artifact directories whose manifest.json gets the fitted blend")
+    parser.add_argument('--oof', default=OOF_PATH, help="OOF probability file")
+    parser.add_argument('--refresh', action='store_true', help="recompute OOF probabilities even if saved")
+    parser.add_argument('--step', type=float, default=0.01, help="weight grid step")
+    parser.add_argument('--temperature', choices=['none', 'shared', 'per-class'], default='shared')
+    parser.add_argument('--t-min', type=float, default=0.5)
+    parser.add_argument('--t-max', type=float, default=2.0)
+    parser.add_argument('--t-steps', type=int, default=31, help="temperatures per class")
+    parser.add_argument('--metric', choices=['logloss', 'accuracy'], default='logloss')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cores', type=int, default=None)
+    parser.add_argument('--test-size', type=float, default=0.2,
+                        help="leave out this final share of matches, train_models.py's test split (0: fit on all)")
+    parser.add_argument('--dry-run', action='store_true', help="report the fit without touching any manifest")
+    args = parser.parse_args()
+
+    from dataset import load_dataset
+
+    print("\n" + "="*80)
+    print("ENSEMBLE WEIGHT OPTIMIZATION")
+    print("="*80)
+
+    dataset = load_dataset('data/features.csv')
+    result, oof = optimize_blend(dataset, args.oof, args.refresh, args.workers, args.cores,
+                                 step=args.step, temperature=args.temperature, metric=args.metric,
+                                 t_min=args.t_min, t_max=args.t_max, t_steps=args.t_steps,
+                                 rows_before=dataset.split_index(args.test_size) if args.test_size else None)
+    print_search(result)
+
+    if not args.dry_run:
+        for model_dir in args.model_dirs:
+            try:
+                set_ensemble_blend(model_dir, result.weights, result.temperature,
+                                   fit=result.manifest_fit(oof['data_hash']))
+                print(f"✓ Blend written to {os.path.join(model_dir, 'manifest.json')}")
+            except ArtifactError as e:
+                print(f"  ⚠ {e}")
+
+    print("\n" + "="*80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
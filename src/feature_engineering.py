@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
+import argparse
 from typing import List
 
 def compute_elo_ratings(df, k=20, base_rating=1500):
-    df = df.copy().sort_values("Date")
+    df = df.copy().sort_values("Date", kind="stable")
 
     ratings = {}
 
@@ -44,7 +45,7 @@ def compute_elo_ratings(df, k=20, base_rating=1500):
 def load_and_prepare_data(filepath: str) -> pd.DataFrame:
     df = pd.read_csv(filepath)
     df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df = df.sort_values("Date").reset_index(drop=True)
+    df = df.sort_values("Date", kind="stable").reset_index(drop=True)
     df = df.dropna(subset=["Date"])
     return df
 
@@ -327,12 +328,32 @@ def create_differential_features(features: pd.DataFrame) -> pd.DataFrame:
     return features
 
 def main():
+    parser = argparse.ArgumentParser(description="Build data/features.csv from merged matches")
+    parser.add_argument("--input", default="data/merged_matches.csv")
+    parser.add_argument("--output", default="data/features.csv")
+    parser.add_argument("--memory-budget-mb", type=int,
+                        help="stream teams and matches in chunks under this memory budget")
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print("FEATURE ENGINEERING PIPELINE")
     print("="*60)
     
+    if args.memory_budget_mb:
+        from chunked_features import build_features_chunked
+        print(f"\n Chunked mode, memory budget {args.memory_budget_mb} MB")
+        rows, n_columns = build_features_chunked(args.input, args.output,
+                                                 memory_budget_mb=args.memory_budget_mb)
+        print("\n" + "="*60)
+        print("RESULTS")
+        print("="*60)
+        print(f" Feature dataset created: ({rows}, {n_columns})")
+        print(f" Saved to: {args.output}")
+        print("="*60 + "\n")
+        return
+    
     print("\n Loading data")
-    df = load_and_prepare_data("data/merged_matches.csv")
+    df = load_and_prepare_data(args.input)
     print(f" Loaded {len(df)} matches")
 
     print("Computing Elo ratings")
@@ -370,7 +391,7 @@ def main():
     
     features_clean = features_clean.fillna(0)
     
-    features_clean.to_csv("data/features.csv", index=False)
+    features_clean.to_csv(args.output, index=False)
     
     print("\n" + "="*60)
     print("RESULTS")
@@ -383,7 +404,7 @@ def main():
     
     print(f" Number of feature columns: {len(feature_cols)}")
     print(f" Date range: {features_clean['Date'].min()} to {features_clean['Date'].max()}")
-    print(f" Saved to: data/features.csv")
+    print(f" Saved to: {args.output}")
     print("="*60 + "\n")
 
 if __name__ == "__main__":
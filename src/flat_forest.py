@@ -0,0 +1,113 @@
+"""
+flat_forest.py
+──────────────
+Vectorized Random Forest inference over contiguous node arrays.
+
+sklearn's RandomForestClassifier.predict_proba dispatches every tree through
+joblib and its own Python-level per-tree loop, which dominates the latency of a
+single-match prediction. FlatForest keeps all trees in one set of arrays
+(the same ones artifacts.py stores in random_forest_*.npz) and walks every
+tree for every row at once, one depth level per NumPy step.
+
+Leaves point at themselves with an infinite threshold, so rows that reach a
+leaf early simply stay put until the deepest tree is done. Per-tree leaf
+probabilities are accumulated in tree order and divided by the number of
+trees, exactly like sklearn, so the output matches predict_proba bit for bit.
+"""
+
+import numpy as np
+
+from artifacts import forest_to_arrays, load_forest_arrays, read_manifest
+
+BATCH_ROWS = 512
+
+
+class FlatForest:
+    """Random Forest classifier evaluated from flat node arrays."""
+
+    def __init__(self, arrays):
+        offsets = arrays['offsets']
+        self.n_trees = len(offsets) - 1
+        self.classes_ = np.asarray(arrays['classes'])
+        self.n_features_in_ = int(arrays['n_features']) if 'n_features' in arrays else \
+            int(arrays['node_feature'].max()) + 1
+        self.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object) \
+            if 'feature_names' in arrays else None
+        self.roots = offsets[:-1].astype(np.int64)
+        self.depth = int(arrays['max_depth'].max())
+
+        left = arrays['node_left_child']
+        right = arrays['node_right_child']
+        tree_of_node = np.repeat(np.arange(self.n_trees), np.diff(offsets))
+        base = offsets[tree_of_node]
+        node_ids = np.arange(len(left), dtype=np.int64)
+        is_leaf = left == -1
+
+        # Global child indices, interleaved as [right, left] per node so that
+        # children[2 * node + go_left] is the next node; leaves loop back to themselves
+        left = np.where(is_leaf, node_ids, left + base)
+        right = np.where(is_leaf, node_ids, right + base)
+        self.children = np.stack([right, left], axis=1).ravel().astype(np.int64)
+        self.feature = np.where(is_leaf, 0, arrays['node_feature']).astype(np.int64)
+        self.threshold = np.where(is_leaf, np.inf, arrays['node_threshold'])
+        self.missing_left = arrays['node_missing_go_to_left'].astype(bool)
+
+        # sklearn stores classifier node values as class proportions, which is
+        # exactly what DecisionTreeClassifier.predict_proba returns for a leaf
+        self.leaf_proba = np.ascontiguousarray(arrays['value'], dtype=np.float64)
+
+    @classmethod
+    def from_sklearn(cls, rf):
+        arrays = forest_to_arrays(rf)
+        arrays['n_features'] = np.int64(rf.n_features_in_)
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, model_dir, manifest=None, verify=True):
+        """Load from an artifact directory written by artifacts.save_artifacts."""
+        manifest = manifest or read_manifest(model_dir)
+        return cls(load_forest_arrays(model_dir, manifest, verify))
+
+    def _as_array(self, X):
+        if hasattr(X, 'columns'):
+            if self.feature_names_in_ is not None and list(X.columns) != list(self.feature_names_in_):
+                raise ValueError("Feature columns do not match the ones the forest was trained on")
+            X = X.to_numpy()
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected an (n, {self.n_features_in_}) feature matrix, got shape {X.shape}")
+        return X
+
+    def _apply(self, X):
+        rows = np.arange(len(X))
+        has_missing = np.isnan(X).any()
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+
+        for _ in range(self.depth):
+            # float32 features against float64 thresholds, as in sklearn's Tree
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = self.children[2 * node + go_left]
+        return node
+
+    def apply(self, X):
+        """Global leaf index reached in every tree, shape (n_trees, n_rows)."""
+        X = self._as_array(X)
+        return np.concatenate([self._apply(X[i:i + BATCH_ROWS])
+                               for i in range(0, len(X), BATCH_ROWS)], axis=1)
+
+    def predict_proba(self, X):
+        X = self._as_array(X)
+        proba = np.zeros((len(X), len(self.classes_)))
+        # Row blocks keep the (n_trees, rows) index arrays cache-sized on big batches
+        for i in range(0, len(X), BATCH_ROWS):
+            block = proba[i:i + BATCH_ROWS]
+            for tree_leaves in self._apply(X[i:i + BATCH_ROWS]):
+                block += self.leaf_proba[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -1,180 +1,273 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
-from sklearn.metrics import accuracy_score, make_scorer
-import xgboost as xgb
-from sklearn.ensemble import RandomForestClassifier
 import joblib
+from dataset import load_dataset
+from artifacts import DEFAULT_WEIGHTS, save_artifacts, set_ensemble_blend
+from tuner import (METRICS, fit_within, halving_schedule, plan_threads, successive_halving, time_series_folds,
+                   tpe_search, refit_best, print_search_report, score_proba, warm_start, SPACES)
+from ensemble_tuning import ENSEMBLE_METRICS, load_candidates, print_ensemble_search, search_ensemble
+from confidence_curve import compute_curves, curves_path, save_curves
+from anytime import Deadline
+from trial_store import DEFAULT_PATH as TRIAL_STORE, TrialStore
+from work_queue import WorkQueue, start_local_workers, stop_workers
 import os
 import re
+import ast
+import argparse
 from datetime import datetime
 
-def sanitize_feature_names(feature_cols):
-    sanitized = []
-    for col in feature_cols:
-        clean_name = col.replace('[', '_').replace(']', '_').replace('<', '_lt_').replace('>', '_gt_')
-        sanitized.append(clean_name)
-    return sanitized
+BEST_PARAMETERS = 'models/tuned/best_parameters.txt'
+SECTIONS = {'XGBoost Best Parameters:': 'xgboost', 'Random Forest Best Parameters:': 'random_forest'}
+REFIT_SHARE = 0.15  # of each model's share of --total-budget, kept back for refitting the winner
 
 def load_and_prepare_data(filepath: str = 'data/features.csv'):
     print("\n" + "="*80)
     print("LOADING DATA FOR HYPERPARAMETER TUNING")
     print("="*80)
     
-    df = pd.read_csv(filepath)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date').reset_index(drop=True)
-    
-    print(f" Loaded {len(df)} matches")
-    
-    exclude_cols = [
-        'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR',
-        'home_win', 'away_win', 'draw', 'home_points', 'away_points', 'target',
-        'Div', 'Season', 'Time', 'Referee', 'HTR', 'HTHG', 'HTAG',
-        'Date_home', 'Date_away', 'Team_home', 'Team_away', 
-        'Opponent_home', 'Opponent_away'
-    ]
-    
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    feature_cols = [col for col in numeric_cols if col not in exclude_cols]
-    
-    original_feature_cols = feature_cols.copy()
-    feature_cols_clean = sanitize_feature_names(feature_cols)
-    feature_name_mapping = dict(zip(original_feature_cols, feature_cols_clean))
-    
-    df = df.rename(columns=feature_name_mapping)
-    feature_cols = feature_cols_clean
+    dataset = load_dataset(filepath)
+    feature_cols = list(dataset.feature_cols)
     
+    print(f" Loaded {len(dataset)} matches")
     print(f" Features: {len(feature_cols)}")
     
-    target_map = {'H': 0, 'D': 1, 'A': 2}
-    df['target'] = df['FTR'].map(target_map)
-    df = df.dropna(subset=['target'])
-    
-    X = df[feature_cols].fillna(0)
-    y = df['target'].astype(int)
-    
-    non_numeric = X.select_dtypes(exclude=[np.number]).columns
-    if len(non_numeric) > 0:
-        raise ValueError(f"Non-numeric columns found: {list(non_numeric)}")
-    
-    return X, y, feature_cols
+    return dataset.frame(), dataset.target(), feature_cols, dataset.data_hash
+
+def load_best_parameters(path=BEST_PARAMETERS):
+    """{model: params} from a best_parameters.txt written by save_tuned_models, or {} if there is none."""
+    if not os.path.exists(path):
+        return {}
+    params, model = {}, None
+    with open(path) as f:
+        for line in f:
+            if line.strip() in SECTIONS:
+                model = SECTIONS[line.strip()]
+                params[model] = {}
+                continue
+            match = re.match(r'^  (\w+)\s*: (.*)$', line.rstrip('\n'))
+            if model and match:
+                try:
+                    value = ast.literal_eval(match.group(2))
+                except (ValueError, SyntaxError):
+                    value = match.group(2)
+                params[model][match.group(1)] = value
+    return params
+
+def prior_seeds(model, store, metric, top_k=5):
+    """Best configurations of the last search in the trial store, else the last saved best parameters.
+
+    Stored probabilities are rescored with `metric`, so a search scored on another metric still seeds this one.
+    """
+    if store is not None:
+        # Extra candidates, as warm_start drops those outside the space (e.g. partial tree budgets)
+        best = store.best_configs(model, metric, top_k=top_k * 4, rescore=score_proba)
+        if best:
+            return [params for params, _ in best], "the trial store (best of the last search)"
+    saved = load_best_parameters().get(model)
+    return ([saved], BEST_PARAMETERS) if saved else ([], None)
+
+def off_space(seed, space):
+    """What puts `seed` outside `space`: its out-of-space values and the axes it lacks."""
+    issues = [f"{k}={v}" for k, v in seed.items() if k in space and v not in space[k]]
+    issues += [f"{k} unset" for k in space if k not in seed]
+    issues += [f"{k} not searched" for k in seed if k not in space]
+    return ", ".join(issues)
 
-def tune_xgboost(X, y, n_iter: int = 50):
+def model_share(deadline, models_left):
+    """Seconds of a budgeted `deadline` left for the next model, or None without a budget."""
+    if deadline is None or deadline.budget is None:
+        return None
+    return max(deadline.remaining(), 0) / models_left
+
+def run_search(model, label, X, y, n_random, compare_random=False, cores=None, trials=None, threads=None,
+               method='tpe', warm_top_k=None, deadline=None, models_left=1, **search):
+    """TPE or successive halving for one model; `search` goes to tuner.tpe_search / successive_halving.
+
+    With `warm_top_k`, the search is seeded with that many of the previous search's best
+    configurations and its space narrowed around them. With a budgeted `deadline`, the
+    search gets its share of the remaining time (split over `models_left` models), less
+    what the refit needs.
+    """
     print("\n" + "="*80)
-    print("TUNING XGBOOST HYPERPARAMETERS")
+    print(f"TUNING {label.upper()} HYPERPARAMETERS")
     print("="*80)
     
-    param_grid = {
-        'max_depth': [4, 6, 8, 10, 12],
-        'learning_rate': [0.01, 0.03, 0.05, 0.1, 0.15],
-        'n_estimators': [200, 300, 400, 500],
-        'subsample': [0.6, 0.7, 0.8, 0.9],
-        'colsample_bytree': [0.6, 0.7, 0.8, 0.9],
-        'min_child_weight': [1, 3, 5, 7],
-        'gamma': [0, 0.1, 0.2, 0.3],
-        'reg_alpha': [0, 0.1, 0.5, 1.0],
-        'reg_lambda': [0.5, 1.0, 2.0]
-    }
-    
-    tscv = TimeSeriesSplit(n_splits=5)
-    
-    base_model = xgb.XGBClassifier(
-        objective='multi:softprob',
-        num_class=3,
-        random_state=42,
-        eval_metric='mlogloss'
-    )
-    
-    print(f"\nSearching {n_iter} parameter combinations...")
-    print(f"Using TimeSeriesSplit with 5 folds")
-    
-    search = RandomizedSearchCV(
-        estimator=base_model,
-        param_distributions=param_grid,
-        n_iter=n_iter,
-        cv=tscv,
-        scoring='accuracy',
-        n_jobs=-1,
-        verbose=2,
-        random_state=42
-    )
-    
-    search.fit(X, y)
+    if warm_top_k:
+        seeds, source = prior_seeds(model, search.get('store'), search.get('metric', 'accuracy'), warm_top_k)
+        warm = warm_start(model, seeds, search.get('space'), warm_top_k, sweep_trees=search.get('sweep_trees', True))
+        if warm.dropped:
+            reasons = sorted({off_space(seed, search.get('space') or SPACES[model]) for seed in warm.dropped})
+            print(f"\n⚠ Warm start: {len(warm.dropped)} earlier configuration(s) from {source} left out, "
+                  f"outside the search space ({'; '.join(reasons[:3])}{'; ...' if len(reasons) > 3 else ''})")
+        if warm.seeds:
+            search.update(space=warm.space, seeds=warm.seeds)
+            print(f"\nWarm start from {source}: {len(warm.seeds)} seed configuration(s)")
+            print("Narrowed space: " + ", ".join(f"{k}={v}" for k, v in warm.space.items()))
+        else:
+            print("\nWarm start: no earlier results for this model, searching the full space")
+    
+    plan = plan_threads(model, cores, threads, trials)
+    share = model_share(deadline, models_left)
+    if share is not None:
+        search_budget = share * (1 - REFIT_SHARE)
+        search['time_budget'] = min(search.get('time_budget', search_budget), search_budget)
+        print(f"\nTotal budget: {deadline.remaining():.0f}s left, {search['time_budget']:.0f}s for this search")
+    if method == 'tpe':
+        search = {'time_budget': 900, **search}
+        print(f"\nTPE search for {search['time_budget']:.0f}s of wall-clock time"
+              + (f" (at most {search['max_trials']} trials)" if search.get('max_trials') else ""))
+        if search.get('prune_after'):
+            print(f"Pruning after {search['prune_after']} folds when "
+                  f"{search.get('prune_margin', 0.02):.3f} below the incumbent")
+    else:
+        search = {'n_configs': 81, 'eta': 3, 'min_budget': 1/9, 'resource': 'trees', **search}
+        schedule = halving_schedule(search['n_configs'], search['eta'], search['min_budget'])
+        print(f"\nSuccessive halving over {search['n_configs']} configurations "
+              f"(eta={search['eta']}, resource={search['resource']})")
+        print(f"Rungs: " + " → ".join(f"{n}@{b:.0%}" for n, b in schedule)
+              + (f" (within {search['time_budget']:.0f}s)" if search.get('time_budget') is not None else ""))
+    if search.get('sweep_trees', True):
+        print("Tree counts swept from one fit per configuration and fold")
+    print(f"Using TimeSeriesSplit with 5 folds, scored by {search.get('metric', 'accuracy')}, {plan}")
+    if search.get('store') is not None:
+        print(f"Trial store: {search['store'].path}")
+    if search.get('queue') is not None:
+        print(f"Work queue: {search['queue'].path} (fits run by queue workers)")
+    print()
+    
+    if method == 'tpe':
+        result = tpe_search(model, X, y, plan=plan, **search)
+    else:
+        result = successive_halving(model, X, y, plan=plan, **search)
+    
+    baseline = None
+    if compare_random:
+        print(f"\nRandom search baseline: {n_random} configurations in full (the old RandomizedSearchCV)")
+        # No trial store here: the baseline's compute must be spent, not looked up
+        baseline = successive_halving(model, X, y, n_configs=n_random, min_budget=1, plan=plan, sweep_trees=False,
+                                      metric=search.get('metric', 'accuracy'))
     
     print("\n" + "="*80)
-    print("TUNING RESULTS ARE")
+    print("TUNING RESULTS")
     print("="*80)
-    print(f"\n✓ Best CV Score: {search.best_score_:.4f} ({search.best_score_*100:.2f}%)")
+    print_search_report(result, baseline)
     print(f"\nBest Parameters:")
-    for param, value in search.best_params_.items():
+    for param, value in result.best_params.items():
         print(f"  {param:20s}: {value}")
     
     print("\n" + "-"*80)
     print("Top 5 Configurations:")
     print("-"*80)
-    results_df = pd.DataFrame(search.cv_results_)
-    top_5 = results_df.nsmallest(5, 'rank_test_score')[
-        ['rank_test_score', 'mean_test_score', 'std_test_score', 'params']
-    ]
+    for rank, row in enumerate(result.top(5).itertuples(), 1):
+        print(f"\nRank {rank}:")
+        print(f"  Score: {row.score:.4f} (±{row.std:.4f})")
+        print(f"  Params: {row.params}")
     
-    for idx, row in top_5.iterrows():
-        print(f"\nRank {int(row['rank_test_score'])}:")
-        print(f"  Score: {row['mean_test_score']:.4f} (±{row['std_test_score']:.4f})")
-        print(f"  Params: {row['params']}")
-    
-    return search.best_estimator_, search.best_params_
+    return result
 
-def tune_random_forest(X, y, n_iter: int = 30):
-    print("\n" + "="*80)
-    print("TUNING RANDOM FOREST HYPERPARAMETERS")
-    print("="*80)
-    
-    param_grid = {
-        'n_estimators': [200, 300, 400, 500],
-        'max_depth': [10, 15, 20, 25, None],
-        'min_samples_split': [5, 10, 15, 20],
-        'min_samples_leaf': [2, 4, 6, 8],
-        'max_features': ['sqrt', 'log2', None],
-        'bootstrap': [True, False]
-    }
-    
-    tscv = TimeSeriesSplit(n_splits=5)
-    
-    base_model = RandomForestClassifier(random_state=42, n_jobs=-1)
-    
-    print(f"\nSearching {n_iter} parameter combinations...")
-    print(f"Using TimeSeriesSplit with 5 folds")
-    print(f"This may take 10-20 minutes...\n")
-    
-    search = RandomizedSearchCV(
-        estimator=base_model,
-        param_distributions=param_grid,
-        n_iter=n_iter,
-        cv=tscv,
-        scoring='accuracy',
-        n_jobs=-1,
-        verbose=2,
-        random_state=42
-    )
-    
-    search.fit(X, y)
-    
+def refit_deadline(deadline, models_left=1):
+    """A Deadline for one refit: its model's share of what is left of a budgeted `deadline`."""
+    share = model_share(deadline, models_left)
+    return Deadline(share) if share is not None else None
+
+def tune_xgboost(X, y, cores=None, refit=True, deadline=None, models_left=1, **search):
+    """(refitted model or None, search result)."""
+    result = run_search('xgboost', 'XGBoost', X, y, n_random=50, cores=cores, deadline=deadline,
+                        models_left=models_left, **search)
+    model = None
+    if refit:
+        model = refit_best(result, X, y, n_jobs=cores, deadline=refit_deadline(deadline, models_left))
+    return model, result
+
+def tune_random_forest(X, y, cores=None, refit=True, deadline=None, models_left=1, **search):
+    """(refitted model or None, search result)."""
+    result = run_search('random_forest', 'Random Forest', X, y, n_random=30, cores=cores, deadline=deadline,
+                        models_left=models_left, **search)
+    model = None
+    if refit:
+        model = refit_best(result, X, y, n_jobs=cores or -1, deadline=refit_deadline(deadline, models_left))
+    return model, result
+
+def tune_ensemble(X, y, store, data_hash, results, cores=None, top_k=25, step=0.05, metric='logloss',
+                  deadline=None):
+    """Both models' configurations and the blend weight picked together from the stored OOF probabilities.
+
+    `results` ({model: search result}) hold the searches' own best, reported as
+    the 60/40 baseline. If a model has no candidate with probabilities on every
+    fold (e.g. the time budget cut its last rung), those winners are refitted
+    and blended 60/40 instead; the blend result is None then.
+    """
     print("\n" + "="*80)
-    print("TUNING RESULTS")
+    print("STEP 3: JOINT ENSEMBLE SELECTION")
     print("="*80)
-    print(f"\n Best CV Score: {search.best_score_:.4f} ({search.best_score_*100:.2f}%)")
-    print(f"\nBest Parameters:")
-    for param, value in search.best_params_.items():
-        print(f"  {param:20s}: {value}")
     
-    return search.best_estimator_, search.best_params_
+    winners = {model: result.best_params for model, result in results.items()}
+    try:
+        result = search_ensemble(store, data_hash, time_series_folds(len(X)), y, top_k, step, metric, winners)
+    except RuntimeError as e:
+        print(f"\n  ⚠ {e}")
+        print("  Keeping each search's best configuration, blended 60/40")
+        xgb_model = refit_best(results['xgboost'], X, y, n_jobs=cores or -1, deadline=refit_deadline(deadline, 2))
+        rf_model = refit_best(results['random_forest'], X, y, n_jobs=cores or -1,
+                              deadline=refit_deadline(deadline, 1))
+        return xgb_model, winners['xgboost'], rf_model, winners['random_forest'], None
+    print_ensemble_search(result)
+    xgb_params, rf_params = result.params['xgboost'], result.params['random_forest']
+    xgb_model = fit_within('xgboost', xgb_params, X, y, cores, refit_deadline(deadline, 2))
+    rf_model = fit_within('random_forest', rf_params, X, y, cores or -1, refit_deadline(deadline, 1))
+    return xgb_model, xgb_params, rf_model, rf_params, result
+
+def tuning_run(deadline, results, models, params):
+    """Time used and quality reached, recorded in the manifest as 'training_run'.
+
+    `params` are the configurations deployed, which --ensemble may pick over each search's best.
+    """
+    run = {'time_budget': deadline.budget, 'seconds_used': round(deadline.used(), 3),
+           'overrun_seconds': round(deadline.overrun(), 3), 'models': {}}
+    for name, result in results.items():
+        run['models'][name] = {
+            'metric': result.metric,
+            'best_score': float(result.best_score),
+            'complete': result.complete,
+            'evaluations': len(result.trials),
+            'search_seconds': round(result.seconds, 3),
+            'n_trees': int(models[name].n_estimators),
+            'planned': int(params[name]['n_estimators']),
+        }
+    run['deadline_hit'] = any(not m['complete'] or m['n_trees'] < m['planned'] for m in run['models'].values())
+    return run
 
-def save_tuned_models(xgb_model, xgb_params, rf_model, rf_params, feature_cols):
+def save_tuned_curves(store, data_hash, y, params, weights, model_dir='models/tuned'):
+    """Confidence curves of the saved configurations, from their stored out-of-fold probabilities.
+
+    The tuned models are refit on every row, so their held-out predictions
+    are the search's forward-chained test folds. Without those (no trial
+    store, or a configuration not scored on every fold) older curves are
+    removed rather than left describing other models; returns None then.
+    """
+    path = curves_path(model_dir)
+    folds = time_series_folds(len(y))
+    y = np.asarray(y)
+    y_oof = np.concatenate([y[test] for _, test in folds]).astype(np.intp)
+    oof = {}
+    for model in ('xgboost', 'random_forest'):
+        stored = load_candidates(store, data_hash, model, folds, y_oof, top_k=None) if store is not None else []
+        oof[model] = next((proba for p, proba in stored if p == params[model]), None)
+    if any(proba is None for proba in oof.values()):
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    ens_proba = weights['xgboost'] * oof['xgboost'] + weights['random_forest'] * oof['random_forest']
+    curves = compute_curves({'XGBoost': oof['xgboost'], 'Random Forest': oof['random_forest'],
+                             'Ensemble': ens_proba}, y_oof)
+    save_curves(path, curves)
+    return curves
+
+def save_tuned_models(xgb_model, xgb_params, rf_model, rf_params, feature_cols, data_hash, extra=None):
     os.makedirs('models/tuned', exist_ok=True)
     
-    joblib.dump(xgb_model, 'models/tuned/xgboost_tuned.pkl')
-    joblib.dump(rf_model, 'models/tuned/random_forest_tuned.pkl')
+    save_artifacts('models/tuned', xgb_model, rf_model, feature_cols,
+                   data_hash=data_hash,
+                   names=('xgboost_tuned', 'random_forest_tuned'), extra=extra)
     joblib.dump(feature_cols, 'models/tuned/feature_columns.pkl')
     
     with open('models/tuned/best_parameters.txt', 'w') as f:
@@ -193,12 +286,62 @@ def save_tuned_models(xgb_model, xgb_params, rf_model, rf_params, feature_cols):
             f.write(f"  {param:20s}: {value}\n")
     
     print("\n Tuned models saved:")
-    print("  - models/tuned/xgboost_tuned.pkl")
-    print("  - models/tuned/random_forest_tuned.pkl")
+    print("  - models/tuned/xgboost_tuned.ubj")
+    print("  - models/tuned/random_forest_tuned.npz")
+    print("  - models/tuned/manifest.json")
     print("  - models/tuned/feature_columns.pkl")
     print("  - models/tuned/best_parameters.txt")
 
 def main():
+    parser = argparse.ArgumentParser(description="Tune the XGBoost and Random Forest hyperparameters")
+    parser.add_argument('--search', choices=['tpe', 'halving'], default='tpe',
+                        help="TPE with per-fold pruning (time budget) or successive halving (config count)")
+    parser.add_argument('--time-budget', type=float, default=900,
+                        help="TPE: wall-clock seconds per model")
+    parser.add_argument('--total-budget', type=float, default=None,
+                        help="wall-clock seconds for the whole run, searches and refits of both models; "
+                             "either search method stops in time and the best so far is saved")
+    parser.add_argument('--max-trials', type=int, default=None, help="TPE: stop after this many trials")
+    parser.add_argument('--prune-after', type=int, default=2,
+                        help="TPE: folds scored before a trial may be pruned")
+    parser.add_argument('--prune-margin', type=float, default=0.02,
+                        help="TPE: prune when this far below the incumbent on the same folds")
+    parser.add_argument('--no-prune', action='store_true', help="TPE: always score every fold")
+    parser.add_argument('--n-configs', type=int, default=81, help="halving: configurations sampled per model")
+    parser.add_argument('--eta', type=int, default=3, help="halving: keep the best 1/eta of each rung")
+    parser.add_argument('--min-budget', type=float, default=1/9, help="halving: budget fraction of the first rung")
+    parser.add_argument('--resource', choices=['trees', 'folds'], default='trees',
+                        help="what a partial budget cuts: tree count or number of (earliest) folds")
+    parser.add_argument('--no-tree-sweep', action='store_true',
+                        help="search n_estimators as its own axis instead of scoring every tree count from one fit")
+    parser.add_argument('--metric', choices=list(METRICS), default=None,
+                        help="fold score each model is tuned on (default: accuracy, or neg_log_loss with --ensemble)")
+    parser.add_argument('--ensemble', action='store_true',
+                        help="pick both configurations and the blend weight jointly from the cached OOF "
+                             "probabilities (needs the trial store)")
+    parser.add_argument('--ensemble-metric', choices=ENSEMBLE_METRICS, default='logloss',
+                        help="--ensemble: what the blended probabilities are judged on")
+    parser.add_argument('--top-k', type=int, default=25, help="--ensemble: candidates per model to pair up")
+    parser.add_argument('--warm-start', action='store_true',
+                        help="seed the search with the previous search's best configurations (trial store, "
+                             "else models/tuned/best_parameters.txt) and narrow the space around them")
+    parser.add_argument('--warm-top-k', type=int, default=5, help="--warm-start: configurations to seed with")
+    parser.add_argument('--compare-random', action='store_true',
+                        help="also run the old full random search (50 XGBoost / 30 RF configs) for comparison")
+    parser.add_argument('--cores', type=int, default=None, help="global thread budget (default: all available)")
+    parser.add_argument('--trials', type=int, default=None, help="fits run in parallel (default: from --threads)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="threads per fit (default: 4 for XGBoost, 1 for Random Forest)")
+    parser.add_argument('--store', default=TRIAL_STORE,
+                        help="SQLite trial database; finished fold scores are reused on resume")
+    parser.add_argument('--no-store', action='store_true', help="do not read or write the trial database")
+    parser.add_argument('--queue', default=None,
+                        help="coordinate through this SQLite job database; workers run the fits "
+                             "(python src/work_queue.py worker --queue PATH, on any machine sharing it)")
+    parser.add_argument('--local-workers', type=int, default=0,
+                        help="with --queue: also start this many worker processes on this machine")
+    args = parser.parse_args()
+    
     print("\n" + "="*80)
     print(" "*20 + "HYPERPARAMETER TUNING PIPELINE")
     print("="*80)
@@ -208,27 +351,79 @@ def main():
         print("   Please run feature_engineering.py first.")
         return
     
-    X, y, feature_cols = load_and_prepare_data()
-    
-    print("\n" + "="*80)
-    print("STEP 1: TUNING XGBOOST (This will take 10-30 minutes)")
-    print("="*80)
-    xgb_model, xgb_params = tune_xgboost(X, y, n_iter=50)
-    
-    print("\n" + "="*80)
-    print("STEP 2: TUNING RANDOM FOREST (This will take 10-20 minutes)")
-    print("="*80)
-    rf_model, rf_params = tune_random_forest(X, y, n_iter=30)
+    if args.ensemble and args.no_store:
+        print("\n Error: --ensemble reads the cached probabilities from the trial store; drop --no-store.")
+        return
     
-    save_tuned_models(xgb_model, xgb_params, rf_model, rf_params, feature_cols)
+    deadline = Deadline(args.total_budget)
+    X, y, feature_cols, data_hash = load_and_prepare_data()
+    store = None if args.no_store else TrialStore(args.store)
+    queue = WorkQueue(args.queue) if args.queue else None
+    workers = start_local_workers(args.queue, args.local_workers, args.threads) if queue and args.local_workers else []
+    search = dict(compare_random=args.compare_random, cores=args.cores, trials=args.trials,
+                  threads=args.threads, store=store, data_hash=data_hash, method=args.search,
+                  sweep_trees=not args.no_tree_sweep, queue=queue,
+                  metric=args.metric or ('neg_log_loss' if args.ensemble else 'accuracy'),
+                  warm_top_k=args.warm_top_k if args.warm_start else None)
+    if args.search == 'tpe':
+        search.update(time_budget=args.time_budget, max_trials=args.max_trials,
+                      prune_after=None if args.no_prune else args.prune_after, prune_margin=args.prune_margin)
+    else:
+        search.update(n_configs=args.n_configs, eta=args.eta, min_budget=args.min_budget,
+                      resource=args.resource)
+    
+    try:
+        print("\n" + "="*80)
+        print("STEP 1: TUNING XGBOOST")
+        print("="*80)
+        xgb_model, xgb_result = tune_xgboost(X, y, refit=not args.ensemble, deadline=deadline, models_left=2,
+                                             **search)
+        
+        print("\n" + "="*80)
+        print("STEP 2: TUNING RANDOM FOREST")
+        print("="*80)
+        rf_model, rf_result = tune_random_forest(X, y, refit=not args.ensemble, deadline=deadline, **search)
+    finally:
+        stop_workers(workers)
+    xgb_params, rf_params = xgb_result.best_params, rf_result.best_params
+    blend = None
+    if args.ensemble:
+        xgb_model, xgb_params, rf_model, rf_params, blend = tune_ensemble(
+            X, y, store, data_hash, {'xgboost': xgb_result, 'random_forest': rf_result}, args.cores, args.top_k,
+            metric=args.ensemble_metric, deadline=deadline)
+    
+    run = tuning_run(deadline, {'xgboost': xgb_result, 'random_forest': rf_result},
+                     {'xgboost': xgb_model, 'random_forest': rf_model},
+                     {'xgboost': xgb_params, 'random_forest': rf_params})
+    save_tuned_models(xgb_model, xgb_params, rf_model, rf_params, feature_cols, data_hash,
+                      extra={'training_run': run})
+    if args.total_budget is not None:
+        print(f"\n  Total budget: {run['seconds_used']:.1f}s used of {args.total_budget:.0f}s"
+              + (" (best so far saved)" if run['deadline_hit'] else ""))
+        if run['overrun_seconds']:
+            print(f"  ⚠ Over budget by {run['overrun_seconds']:.1f}s: each search's first fit and each "
+                  f"refit's first round / tree chunk always run")
+    if blend is not None:
+        set_ensemble_blend('models/tuned', blend.weights, fit=blend.manifest_fit(data_hash))
+        print("  - blend weights written to models/tuned/manifest.json")
+    
+    curves = save_tuned_curves(store, data_hash, y, {'xgboost': xgb_params, 'random_forest': rf_params},
+                               blend.weights if blend is not None else DEFAULT_WEIGHTS)
+    if curves is None:
+        print("  - no stored OOF probabilities of the tuned configurations on every fold: "
+              "models/tuned has no confidence curves (the app shows signal bands without hit rates)")
+    else:
+        print(f"  - confidence curves ({curves['Ensemble'].n_total} OOF matches) written to "
+              f"{curves_path('models/tuned')}")
     
     print("\n" + "="*80)
     print("TUNING COMPLETE!")
     print("="*80)
     print("\n Next steps:")
-    print("  1. Check models/tuned/best_parameters.txt for the best parameters")
-    print("  2. Update train_models.py with these parameters")
-    print("  3. Re-train with the optimized parameters")
+    print("  1. Run the app: it serves models/tuned directly (manifest, blend weights and confidence curves)")
+    print("  2. Load them elsewhere with EnsemblePredictor.load('models/tuned', "
+          "legacy_names=('xgboost_tuned', 'random_forest_tuned'))")
+    print("  3. Rerun with --warm-start to continue from this search (trial store, else best_parameters.txt)")
     print("\n Tuned models saved and ready to use!")
     print("="*80 + "\n")
 
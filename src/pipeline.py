@@ -0,0 +1,311 @@
+"""
+pipeline.py
+───────────
+Runs the data → features → models pipeline as a DAG of stages.
+
+Each stage declares the files it reads and writes. A stage is skipped when
+its outputs exist and the content hashes of its inputs match the last
+successful run. Inputs are the declared data files plus the stage's source
+code: its script and every local module (src/*.py) it imports, directly or
+through other local modules, at module level or inside functions. Stages whose
+dependencies are satisfied run in parallel, e.g. SHAP analysis alongside
+hyperparameter tuning.
+
+Usage:
+  python src/pipeline.py                 # run everything that is out of date
+  python src/pipeline.py train           # run `train` and whatever it needs
+  python src/pipeline.py --force tune    # rerun `tune` even if up to date
+  python src/pipeline.py --dry-run       # show what would run
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from dataset import CACHE_DIR, file_hash
+
+STATE_PATH = os.path.join(CACHE_DIR, 'pipeline_state.json')
+LOG_DIR = os.path.join(CACHE_DIR, 'logs')
+
+SEASON_FILES = [f'data/{year}.csv' for year in range(2015, 2025)]
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: list
+    outputs: list
+    args: list = field(default_factory=list)
+
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+
+STAGES = [
+    Stage('merge', 'src/mergedata.py',
+          inputs=SEASON_FILES,
+          outputs=['data/merged_matches.csv']),
+    Stage('features', 'src/feature_engineering.py',
+          inputs=['data/merged_matches.csv'],
+          outputs=['data/features.csv']),
+    Stage('train', 'src/train_models.py',
+          inputs=['data/features.csv'],
+          outputs=['models/xgboost_model.ubj', 'models/random_forest_model.npz',
+                   'models/manifest.json', 'models/feature_columns.pkl', 'models/metadata.pkl',
+                   'models/plot_data/training_metrics.npz', 'models/oof/oof_probabilities.npz',
+                   'models/confidence_curves.npz'],
+          args=['--no-plots', '--fit-weights']),
+    Stage('tune', 'src/hyperparameter_tuning.py',
+          inputs=['data/features.csv'],
+          outputs=['models/tuned/xgboost_tuned.ubj', 'models/tuned/random_forest_tuned.npz',
+                   'models/tuned/manifest.json', 'models/tuned/feature_columns.pkl', 'models/tuned/best_parameters.txt']),
+    Stage('shap', 'src/train_with_shap.py',
+          inputs=['data/features.csv'],
+          outputs=['models/shap_analysis/model.pkl', 'models/shap_analysis/shap_data.pkl',
+                   'models/shap_analysis/shap_values.npz'],
+          args=['--no-plots']),
+    # Figures are rendered off the training critical path, from the saved arrays
+    Stage('plots', 'src/render_plots.py',
+          inputs=['models/plot_data/training_metrics.npz', 'models/shap_analysis/shap_values.npz'],
+          outputs=['models/xgb_cm.png', 'models/rf_cm.png', 'models/ens_cm.png',
+                   'models/shap_analysis/shap_overall_importance.png']),
+]
+
+
+def build_graph(stages):
+    """Map each stage name to the set of stages producing its inputs."""
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            if path in producers:
+                raise ValueError(f"{path} is produced by both {producers[path]} and {stage.name}")
+            producers[path] = stage.name
+
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = {producers[p] for p in stage.inputs if p in producers}
+        deps[stage.name].discard(stage.name)
+
+    # Reject cycles up front rather than deadlocking the scheduler
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through stage '{name}'")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in deps:
+        visit(name)
+    return deps
+
+
+def select_stages(deps, targets):
+    """Targets plus everything upstream of them."""
+    if not targets:
+        return set(deps)
+    unknown = [t for t in targets if t not in deps]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(deps)}")
+
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+    return selected
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def local_imports(script):
+    """Paths of the local modules `script` imports, transitively, next to it in the same directory."""
+    src_dir = os.path.dirname(script)
+    found, stack = set(), [script]
+    while stack:
+        with open(stack.pop()) as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = os.path.join(src_dir, name.split('.')[0] + '.py')
+                if path not in found and path != script and os.path.exists(path):
+                    found.add(path)
+                    stack.append(path)
+    return sorted(found)
+
+
+def input_fingerprint(stage):
+    """Content hashes of the stage's inputs, its own script and the local modules it imports."""
+    fingerprint = {}
+    for path in stage.inputs + [stage.script] + local_imports(stage.script):
+        fingerprint[path] = file_hash(path) if os.path.exists(path) else None
+    fingerprint['__args__'] = ' '.join(stage.args)
+    return fingerprint
+
+
+def is_up_to_date(stage, fingerprint, state):
+    if not all(os.path.exists(p) for p in stage.outputs):
+        return False
+    recorded = state.get(stage.name, {}).get('inputs')
+    return recorded == fingerprint
+
+
+def run_stage(stage):
+    """Run one stage as a subprocess, logging its output to a file."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f'{stage.name}.log')
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        proc = subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - start, log_path
+
+
+def run_pipeline(targets=None, force=False, jobs=2, dry_run=False, stages=STAGES):
+    by_name = {s.name: s for s in stages}
+    deps = build_graph(stages)
+    selected = select_stages(deps, targets)
+    state = load_state()
+    # --force reruns the named targets; upstream stages still skip when fresh
+    forced = set(targets or selected) if force else set()
+
+    results = {}
+    pending = {name for name in deps if name in selected}
+    running = {}
+    pipeline_start = time.perf_counter()
+
+    def ready(name):
+        return all(results.get(d, {}).get('status') in ('ran', 'skipped', 'dry-run') for d in deps[name] if d in selected)
+
+    def blocked(name):
+        return any(results.get(d, {}).get('status') in ('failed', 'blocked') for d in deps[name] if d in selected)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                if blocked(name):
+                    results[name] = {'status': 'blocked', 'seconds': 0.0}
+                    pending.discard(name)
+                    print(f"  ✗ {name:10s} blocked by a failed dependency")
+                    continue
+                if not ready(name):
+                    continue
+
+                stage = by_name[name]
+                pending.discard(name)
+                fingerprint = input_fingerprint(stage)
+
+                if name not in forced and is_up_to_date(stage, fingerprint, state):
+                    results[name] = {'status': 'skipped', 'seconds': 0.0}
+                    print(f"  ✓ {name:10s} up to date")
+                    continue
+                if dry_run:
+                    results[name] = {'status': 'dry-run', 'seconds': 0.0}
+                    print(f"  → {name:10s} would run: {' '.join(stage.command()[1:])}")
+                    continue
+
+                print(f"  → {name:10s} started")
+                running[pool.submit(run_stage, stage)] = (name, fingerprint)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint = running.pop(future)
+                returncode, seconds, log_path = future.result()
+                if returncode == 0:
+                    results[name] = {'status': 'ran', 'seconds': seconds}
+                    state[name] = {
+                        'inputs': fingerprint,
+                        'completed': datetime.now().isoformat(),
+                        'seconds': round(seconds, 2),
+                    }
+                    save_state(state)
+                    print(f"  ✓ {name:10s} finished in {seconds:.1f}s")
+                else:
+                    results[name] = {'status': 'failed', 'seconds': seconds}
+                    print(f"  ✗ {name:10s} failed (exit {returncode}) — see {log_path}")
+
+    wall_clock = time.perf_counter() - pipeline_start
+    return results, wall_clock
+
+
+def print_summary(results, wall_clock):
+    print("\n" + "="*60)
+    print("PIPELINE SUMMARY")
+    print("="*60)
+    for name, result in results.items():
+        print(f"  {name:10s} {result['status']:8s} {result['seconds']:8.1f}s")
+    print("-"*60)
+    stage_total = sum(r['seconds'] for r in results.values())
+    print(f"  Stage time:  {stage_total:8.1f}s")
+    print(f"  Wall clock:  {wall_clock:8.1f}s")
+    if wall_clock > 0 and stage_total > wall_clock:
+        print(f"  Parallel saving: {stage_total - wall_clock:.1f}s")
+    print("="*60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the prediction pipeline as a DAG")
+    parser.add_argument('targets', nargs='*', help="stages to build (default: all)")
+    parser.add_argument('--force', action='store_true', help="rerun selected stages even if up to date")
+    parser.add_argument('--jobs', type=int, default=2, help="max stages to run in parallel")
+    parser.add_argument('--dry-run', action='store_true', help="show what would run")
+    parser.add_argument('--list', action='store_true', help="list stages and dependencies")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = build_graph(STAGES)
+        for stage in STAGES:
+            after = ', '.join(sorted(deps[stage.name])) or '-'
+            print(f"  {stage.name:10s} after: {after:20s} {stage.script}")
+        return
+
+    print("\n" + "="*60)
+    print("PREDICTION PIPELINE")
+    print("="*60)
+
+    results, wall_clock = run_pipeline(args.targets, force=args.force, jobs=args.jobs,
+                                       dry_run=args.dry_run)
+    print_summary(results, wall_clock)
+
+    if any(r['status'] in ('failed', 'blocked') for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
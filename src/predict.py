@@ -1,20 +1,28 @@
-import joblib
+from artifacts import ArtifactError
+from ensemble import EnsemblePredictor
+from confidence_curve import signal_band
 import pandas as pd
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+# Keyed by the confidence_curve.SIGNAL_BANDS labels the app's badges also use
+RECOMMENDATIONS = {
+    'STRONG SIGNAL': " Strong bet on {outcome}",
+    'MODERATE SIGNAL': " Moderate bet on {outcome}",
+    'WEAK SIGNAL': " Weak signal - Consider avoiding",
+    'NO CLEAR EDGE': " No clear prediction - Avoid betting",
+}
+
 def load_models():
     try:
-        xgb_model = joblib.load('models/xgboost_model.pkl')
-        rf_model = joblib.load('models/random_forest_model.pkl')
-        feature_cols = joblib.load('models/feature_columns.pkl')
+        predictor = EnsemblePredictor.load('models')
         print(" Models loaded successfully")
-        return xgb_model, rf_model, feature_cols
-    except FileNotFoundError as e:
-        print(f" Error: Model files not found!")
+        return predictor
+    except (FileNotFoundError, ArtifactError) as e:
+        print(f" Error: {e}")
         print(f"   Please run: python src/train_models.py")
-        return None, None, None
+        return None
 
 def get_team_latest_stats(features_df, team_name, is_home=True):
     if is_home:
@@ -30,104 +38,62 @@ def get_team_latest_stats(features_df, team_name, is_home=True):
     
     return latest
 
-def predict_match(home_team, away_team, use_ensemble=True):
-    xgb_model, rf_model, feature_cols = load_models()
-    if xgb_model is None:
-        return None
-    
+def load_features():
     try:
         features_df = pd.read_csv('data/features.csv')
-        features_df['Date'] = pd.to_datetime(features_df['Date'])
     except FileNotFoundError:
         print(" Error: data/features.csv not found!")
         return None
+    features_df['Date'] = pd.to_datetime(features_df['Date'])
+    return features_df
+
+def report_prediction(home_team, away_team, out, row=0, use_ensemble=True):
+    """Print and return the prediction for row `row` of a predict_proba result."""
+    if use_ensemble:
+        proba = out['ensemble'][row]
+        model_used = "Ensemble"
+    else:
+        proba = out['xgb'][row]
+        model_used = "XGBoost"
+    
+    prediction_idx = np.argmax(proba)
+    outcomes = ['Home Win', 'Draw', 'Away Win']
+    predicted_outcome = outcomes[prediction_idx]
+    confidence = proba[prediction_idx]
     
     print(f"\n{'='*60}")
     print(f"PREDICTING: {home_team} vs {away_team}")
     print(f"{'='*60}")
+    print(f"\nModel: {model_used}")
+    print(f"\nPredicted Outcome: {predicted_outcome}")
+    print(f"Confidence: {confidence:.1%}")
+    print(f"\nProbabilities:")
+    print(f"  Home Win ({home_team}): {proba[0]:.1%}")
+    print(f"  Draw:                    {proba[1]:.1%}")
+    print(f"  Away Win ({away_team}): {proba[2]:.1%}")
     
-    try:
-        home_stats = get_team_latest_stats(features_df, home_team, is_home=True)
-        away_stats = get_team_latest_stats(features_df, away_team, is_home=False)
-        
-        match_features = pd.DataFrame(index=[0])
-        
-        for col in feature_cols:
-            if '_home' in col:
-                try:
-                    match_features[col] = home_stats[col]
-                except KeyError:
-                    match_features[col] = 0
-            elif '_away' in col:
-                try:
-                    match_features[col] = away_stats[col]
-                except KeyError:
-                    match_features[col] = 0
-            else:
-                match_features[col] = 0
-        
-        for col in feature_cols:
-            if col not in match_features.columns:
-                match_features[col] = 0
-        
-        match_features = match_features[feature_cols]
-        
-        xgb_proba = xgb_model.predict_proba(match_features)[0]
-        
-        if use_ensemble and rf_model is not None:
-            rf_proba = rf_model.predict_proba(match_features)[0]
-            proba = 0.6 * xgb_proba + 0.4 * rf_proba
-            model_used = "Ensemble"
-        else:
-            proba = xgb_proba
-            model_used = "XGBoost"
-        
-        prediction_idx = np.argmax(proba)
-        outcomes = ['Home Win', 'Draw', 'Away Win']
-        predicted_outcome = outcomes[prediction_idx]
-        confidence = proba[prediction_idx]
-        
-        print(f"\nModel: {model_used}")
-        print(f"\nPredicted Outcome: {predicted_outcome}")
-        print(f"Confidence: {confidence:.1%}")
-        print(f"\nProbabilities:")
-        print(f"  Home Win ({home_team}): {proba[0]:.1%}")
-        print(f"  Draw:                    {proba[1]:.1%}")
-        print(f"  Away Win ({away_team}): {proba[2]:.1%}")
-        
-        print(f"\nBetting Recommendation:")
-        if confidence >= 0.65:
-            print(f" Strong bet on {predicted_outcome}")
-        elif confidence >= 0.55:
-            print(f" Moderate bet on {predicted_outcome}")
-        elif confidence >= 0.45:
-            print(f" Weak signal - Consider avoiding")
-        else:
-            print(f" No clear prediction - Avoid betting")
-        
-        print(f"{'='*60}\n")
-        
-        return {
-            'home_team': home_team,
-            'away_team': away_team,
-            'predicted_outcome': predicted_outcome,
-            'confidence': confidence,
-            'probabilities': {
-                'home_win': proba[0],
-                'draw': proba[1],
-                'away_win': proba[2]
-            },
-            'model': model_used
-        }
-        
-    except ValueError as e:
-        print(f" Error: {e}")
-        return None
-    except Exception as e:
-        print(f" Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+    print(f"\nBetting Recommendation:")
+    label, _, _ = signal_band(confidence)
+    print(RECOMMENDATIONS[label].format(outcome=predicted_outcome))
+    
+    print(f"{'='*60}\n")
+    
+    return {
+        'home_team': home_team,
+        'away_team': away_team,
+        'predicted_outcome': predicted_outcome,
+        'confidence': confidence,
+        'probabilities': {
+            'home_win': proba[0],
+            'draw': proba[1],
+            'away_win': proba[2]
+        },
+        'model': model_used
+    }
+
+def predict_match(home_team, away_team, use_ensemble=True):
+    results = predict_multiple_matches([(home_team, away_team)], use_ensemble=use_ensemble)
+    return results[0] if results else None
 
 def show_available_teams():
     try:
@@ -149,13 +115,30 @@ def show_available_teams():
         print(" Error: data/features.csv not found!")
         return []
 
-def predict_multiple_matches(matches):
-    results = []
+def predict_multiple_matches(matches, use_ensemble=True):
+    """Predict many (home, away) matches with one model load and one batched predict_proba call."""
+    predictor = load_models()
+    if predictor is None:
+        return []
+    features_df = load_features()
+    if features_df is None:
+        return []
+    
+    rows, known = [], []
     for home, away in matches:
-        result = predict_match(home, away, use_ensemble=True)
-        if result:
-            results.append(result)
-    return results
+        try:
+            home_stats = get_team_latest_stats(features_df, home, is_home=True)
+            away_stats = get_team_latest_stats(features_df, away, is_home=False)
+        except ValueError as e:
+            print(f" Error: {e}")
+            continue
+        rows.append(predictor.match_features(home_stats, away_stats))
+        known.append((home, away))
+    if not rows:
+        return []
+    
+    out = predictor.predict_proba(np.vstack(rows))
+    return [report_prediction(home, away, out, k, use_ensemble) for k, (home, away) in enumerate(known)]
 
 def main():
     print("\n" + "="*60)
@@ -177,11 +160,7 @@ def main():
         ("Man City", "Tottenham")
     ]
  
-    for home, away in example_matches:
-        try:
-            predict_match(home, away, use_ensemble=True)
-        except:
-            print(f" Could not predict {home} vs {away} - team names may not exist\n")
+    predict_multiple_matches(example_matches)
     
     print("\n" + "="*60)
     print("CUSTOM PREDICTIONS")
@@ -0,0 +1,297 @@
+"""
+render_plots.py
+───────────────
+Renders the training and SHAP figures from saved arrays, off the training
+critical path.
+
+train_models.py and train_with_shap.py save what the figures need
+(predictions, importances, SHAP values) to .npz files and hand the figures
+to a background process pool, or skip them entirely with --no-plots. This
+script re-renders them from those files at any time, e.g. as the `plots`
+pipeline stage or at a different resolution:
+
+  python src/render_plots.py                       # everything with saved data
+  python src/render_plots.py training --dpi 100 --formats png svg
+"""
+
+import argparse
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+TRAINING_DATA = 'models/plot_data/training_metrics.npz'
+SHAP_DATA = 'models/shap_analysis/shap_values.npz'
+CLASS_NAMES = ['Home Win', 'Draw', 'Away Win']
+
+DEFAULT_DPI = 300
+DEFAULT_FORMATS = ('png',)
+
+
+@dataclass(frozen=True)
+class PlotJob:
+    kind: str
+    data_path: str
+    out_stem: str       # output path without extension
+    params: tuple = ()  # extra keyword arguments as (name, value) pairs
+
+
+def save_training_data(path, y_test, predictions, importances, feature_cols):
+    """Arrays behind the confusion-matrix and feature-importance figures."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {'y_test': np.asarray(y_test), 'feature_cols': np.asarray(feature_cols)}
+    for name, pred in predictions.items():
+        arrays[f'pred:{name}'] = np.asarray(pred)
+    for name, importance in importances.items():
+        arrays[f'importance:{name}'] = np.asarray(importance)
+    np.savez(path, **arrays)
+
+
+def save_shap_data(path, shap_values, X_sample, feature_cols):
+    """Per-class SHAP values as one (classes, rows, features) array."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, shap_values=np.stack(shap_values).astype(np.float32),
+             X_sample=np.asarray(X_sample, dtype=np.float32),
+             feature_cols=np.asarray(feature_cols))
+
+
+def _slug(name):
+    return name.lower().replace(' ', '_')
+
+
+def training_jobs(path=TRAINING_DATA, out_dir='models'):
+    with np.load(path) as data:
+        keys = list(data.keys())
+    jobs = []
+    for key in keys:
+        kind, _, name = key.partition(':')
+        if kind == 'pred':
+            stem = {'XGBoost': 'xgb_cm', 'Random Forest': 'rf_cm', 'Ensemble': 'ens_cm'}.get(name, f'{_slug(name)}_cm')
+            jobs.append(PlotJob('confusion_matrix', path, os.path.join(out_dir, stem), (('name', name),)))
+        elif kind == 'importance':
+            jobs.append(PlotJob('feature_importance', path, os.path.join(out_dir, f'{_slug(name)}_features'),
+                                (('name', name), ('top_n', 20))))
+    return jobs
+
+
+def shap_jobs(path=SHAP_DATA, out_dir='models/shap_analysis', top_features=5):
+    with np.load(path) as data:
+        shap_values = data['shap_values']
+        feature_cols = data['feature_cols']
+
+    jobs = [PlotJob('shap_overall', path, os.path.join(out_dir, 'shap_overall_importance'))]
+    for class_idx, class_name in enumerate(CLASS_NAMES):
+        jobs.append(PlotJob('shap_summary', path, os.path.join(out_dir, f'shap_summary_{_slug(class_name)}'),
+                            (('class_idx', class_idx),)))
+        jobs.append(PlotJob('shap_bar', path, os.path.join(out_dir, f'shap_bar_{_slug(class_name)}'),
+                            (('class_idx', class_idx),)))
+
+        mean_abs_shap = np.abs(shap_values[class_idx]).mean(axis=0)
+        for idx in np.argsort(mean_abs_shap)[-top_features:][::-1]:
+            safe_feature_name = str(feature_cols[idx]).replace('/', '_').replace('\\', '_')
+            jobs.append(PlotJob('shap_dependence', path,
+                                os.path.join(out_dir, 'dependence', f'{_slug(class_name)}_{safe_feature_name}'),
+                                (('class_idx', class_idx), ('feature_idx', int(idx)))))
+    return jobs
+
+
+def _pyplot():
+    """pyplot on the Agg backend, imported on first use: --no-plots runs never need matplotlib."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# ── Figure builders: each draws on the current pyplot figure ───────────────
+
+def draw_confusion_matrix(data, name):
+    import seaborn as sns
+    from sklearn.metrics import confusion_matrix
+    plt = _pyplot()
+
+    cm = confusion_matrix(data['y_test'], data[f'pred:{name}'], labels=[0, 1, 2])
+    cm_percent = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis] * 100
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax1,
+                xticklabels=['Home', 'Draw', 'Away'],
+                yticklabels=['Home', 'Draw', 'Away'])
+    ax1.set_title(f'{name} - Counts')
+    ax1.set_ylabel('Actual')
+    ax1.set_xlabel('Predicted')
+
+    sns.heatmap(cm_percent, annot=True, fmt='.1f', cmap='Greens', ax=ax2,
+                xticklabels=['Home', 'Draw', 'Away'],
+                yticklabels=['Home', 'Draw', 'Away'])
+    ax2.set_title(f'{name} - Percentages')
+    ax2.set_ylabel('Actual')
+    ax2.set_xlabel('Predicted')
+
+
+def draw_feature_importance(data, name, top_n=20):
+    plt = _pyplot()
+    importances = data[f'importance:{name}']
+    feature_cols = data['feature_cols']
+    indices = np.argsort(importances)[-top_n:]
+
+    plt.figure(figsize=(10, 8))
+    plt.barh(range(len(indices)), importances[indices])
+    plt.yticks(range(len(indices)), [feature_cols[i] for i in indices])
+    plt.xlabel('Importance')
+    plt.title(f'Top {top_n} Features - {name}')
+
+
+def draw_shap_summary(data, class_idx, plot_type=None):
+    import shap
+    plt = _pyplot()
+
+    plt.figure(figsize=(12, 10))
+    shap.summary_plot(data['shap_values'][class_idx], data['X_sample'],
+                      feature_names=list(data['feature_cols']), plot_type=plot_type,
+                      show=False, max_display=20)
+    title = 'SHAP Feature Importance' if plot_type == 'bar' else 'SHAP Summary'
+    plt.title(f'{title} - {CLASS_NAMES[class_idx]}', fontsize=14, fontweight='bold', pad=20)
+
+
+def draw_shap_overall(data):
+    plt = _pyplot()
+    mean_abs_shap = np.abs(data['shap_values']).mean(axis=1).mean(axis=0)
+    top_indices = np.argsort(mean_abs_shap)[-25:][::-1]
+    feature_cols = data['feature_cols']
+
+    plt.figure(figsize=(12, 10))
+    plt.barh(range(len(top_indices)), mean_abs_shap[top_indices])
+    plt.yticks(range(len(top_indices)), [feature_cols[i] for i in top_indices])
+    plt.xlabel('Mean |SHAP value| (across all classes)', fontsize=12)
+    plt.title('Top 25 Most Important Features (All Classes Combined)',
+              fontsize=14, fontweight='bold')
+
+
+def draw_shap_dependence(data, class_idx, feature_idx):
+    import shap
+    plt = _pyplot()
+
+    feature_cols = list(data['feature_cols'])
+    plt.figure(figsize=(10, 6))
+    shap.dependence_plot(feature_idx, data['shap_values'][class_idx], data['X_sample'],
+                         feature_names=feature_cols, show=False)
+    plt.title(f'SHAP Dependence - {feature_cols[feature_idx]} ({CLASS_NAMES[class_idx]})',
+              fontsize=12, fontweight='bold')
+
+
+DRAWERS = {
+    'confusion_matrix': draw_confusion_matrix,
+    'feature_importance': draw_feature_importance,
+    'shap_summary': draw_shap_summary,
+    'shap_bar': lambda data, class_idx: draw_shap_summary(data, class_idx, plot_type='bar'),
+    'shap_overall': draw_shap_overall,
+    'shap_dependence': draw_shap_dependence,
+}
+
+STYLES = {
+    'confusion_matrix': 'seaborn-v0_8-whitegrid',
+    'feature_importance': 'seaborn-v0_8-whitegrid',
+}
+SHAP_STYLE = 'seaborn-v0_8-darkgrid'
+
+_DATA = {}
+
+
+def _load(path):
+    """Arrays of one .npz file, loaded once per worker process."""
+    if path not in _DATA:
+        with np.load(path) as data:
+            _DATA[path] = {key: data[key] for key in data.keys()}
+    return _DATA[path]
+
+
+def render_job(job, dpi=DEFAULT_DPI, formats=DEFAULT_FORMATS):
+    """Draw one figure and save it in every format. Returns (paths, error)."""
+    plt = None
+    try:
+        plt = _pyplot()
+        os.makedirs(os.path.dirname(job.out_stem) or '.', exist_ok=True)
+        paths = []
+        with plt.style.context(STYLES.get(job.kind, SHAP_STYLE)):
+            DRAWERS[job.kind](_load(job.data_path), **dict(job.params))
+            plt.tight_layout()
+            for fmt in formats:
+                path = f'{job.out_stem}.{fmt}'
+                plt.savefig(path, dpi=dpi, bbox_inches='tight')
+                paths.append(path)
+        return paths, None
+    except Exception as e:
+        return [], f'{job.out_stem}: {e}'
+    finally:
+        if plt is not None:
+            plt.close('all')
+
+
+class BackgroundRenderer:
+    """Renders plot jobs in a process pool while the caller carries on."""
+
+    def __init__(self, jobs, dpi=DEFAULT_DPI, formats=DEFAULT_FORMATS, workers=2):
+        self.start = time.perf_counter()
+        self.n_jobs = len(jobs)
+        # spawn: never fork a parent that already has XGBoost/OpenMP threads running
+        self.pool = ProcessPoolExecutor(max_workers=max(1, workers),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        self.futures = [self.pool.submit(render_job, job, dpi, tuple(formats)) for job in jobs]
+
+    def wait(self):
+        """Block until every figure is written; returns (paths, errors, seconds)."""
+        paths, errors = [], []
+        for future in self.futures:
+            job_paths, error = future.result()
+            paths.extend(job_paths)
+            if error:
+                errors.append(error)
+        self.pool.shutdown()
+        return paths, errors, time.perf_counter() - self.start
+
+
+def report(paths, errors, seconds, label='Plots'):
+    print(f"✓ {label}: {len(paths)} file(s) rendered in {seconds:.1f}s")
+    for error in errors:
+        print(f"  ⚠ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render training and SHAP figures from saved arrays")
+    parser.add_argument('groups', nargs='*', choices=['training', 'shap'],
+                        help="figure groups to render (default: all with saved data)")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('--formats', nargs='+', default=list(DEFAULT_FORMATS),
+                        help="output formats, e.g. png svg pdf")
+    parser.add_argument('--workers', type=int, default=2, help="rendering processes")
+    args = parser.parse_args()
+
+    sources = {'training': (TRAINING_DATA, training_jobs), 'shap': (SHAP_DATA, shap_jobs)}
+    groups = args.groups or [g for g, (path, _) in sources.items() if os.path.exists(path)]
+
+    print("\n" + "="*60)
+    print("RENDERING PLOTS")
+    print("="*60)
+
+    jobs = []
+    for group in groups:
+        path, make_jobs = sources[group]
+        if not os.path.exists(path):
+            print(f"  ⚠ {path} not found - run the {group} stage first")
+            continue
+        group_jobs = make_jobs(path)
+        print(f"  {group:10s} {len(group_jobs)} figure(s) from {path}")
+        jobs.extend(group_jobs)
+
+    if jobs:
+        renderer = BackgroundRenderer(jobs, dpi=args.dpi, formats=args.formats, workers=args.workers)
+        report(*renderer.wait())
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+season_backtest.py
+──────────────────
+Rolling-origin evaluation by season: train on seasons <= N, test on N+1,
+for every N.
+
+A single 80/20 split scores the models on one test window. Here every
+season after the first is predicted by a model that never saw it, giving
+per-season metrics and an out-of-fold (OOF) probability matrix covering
+all but the first season.
+
+Folds run in a process pool. Workers memory-map the parent's cached
+feature matrix (dataset.load_cached) instead of receiving a pickled copy,
+and each fit gets an equal share of the core budget. Results are cached in
+data/cache/backtest/ keyed by the data hash and a hash of the model
+parameters, so repeated calls with the same data and settings are free.
+
+Usage:
+  python src/season_backtest.py                        # xgboost and random_forest
+  python src/season_backtest.py --models xgboost --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, log_loss
+
+from dataset import CACHE_DIR, load_cached, load_dataset
+from train_models import RF_PARAMS, XGB_PARAMS, fit_xgboost
+from training_scheduler import available_cores
+
+BACKTEST_VERSION = 1
+
+DEFAULT_PARAMS = {
+    'xgboost': XGB_PARAMS,
+    'random_forest': RF_PARAMS,
+}
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    """Per-season metrics plus OOF probabilities aligned with the dataset rows.
+
+    Rows of the first season are never tested; their `oof_proba` rows are NaN
+    and `tested` is False.
+    """
+    model: str
+    metrics: pd.DataFrame
+    oof_proba: np.ndarray
+    tested: np.ndarray
+    data_hash: str
+    params_hash: str
+
+    def summary(self, y):
+        """Match-weighted accuracy and log-loss over all tested rows, given the dataset targets."""
+        y = np.asarray(y)[self.tested]
+        proba = self.oof_proba[self.tested]
+        return {
+            'accuracy': accuracy_score(y, proba.argmax(axis=1)),
+            'logloss': log_loss(y, proba, labels=[0, 1, 2]),
+        }
+
+
+def season_folds(dataset):
+    """(test season, train rows, test rows) for every season after the first.
+
+    The dataset is in date order, so seasons <= N are always a prefix.
+    """
+    seasons = np.asarray(dataset.meta['Season'])
+    order = list(dict.fromkeys(seasons))
+    folds = []
+    for season in order[1:]:
+        rows = np.flatnonzero(seasons == season)
+        folds.append((season, slice(0, rows[0]), slice(rows[0], rows[-1] + 1)))
+    return folds
+
+
+def params_hash(model, params):
+    payload = json.dumps({'model': model, 'params': params, 'version': BACKTEST_VERSION},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fit_and_predict(model, params, X_train, y_train, X_test, n_jobs):
+    if model == 'xgboost':
+        fitted, _ = fit_xgboost(X_train, y_train, n_jobs=n_jobs, params=params)
+    elif model == 'random_forest':
+        fitted = RandomForestClassifier(**params, n_jobs=n_jobs).fit(X_train, y_train)
+    else:
+        raise ValueError(f"Unknown model '{model}'. Available: {', '.join(DEFAULT_PARAMS)}")
+    # XGBoost returns float32 rows; renormalise in float64 so log-loss sees exact probabilities
+    proba = fitted.predict_proba(X_test).astype(np.float64)
+    return proba / proba.sum(axis=1, keepdims=True)
+
+
+_WORKER_DATASET = None
+
+
+def _init_worker(data_hash, cache_dir):
+    global _WORKER_DATASET
+    _WORKER_DATASET = load_cached(data_hash, cache_dir)
+
+
+def _run_fold(model, params, train_rows, test_rows, n_jobs):
+    dataset = _WORKER_DATASET
+    start = time.perf_counter()
+    proba = fit_and_predict(model, params, dataset.frame(train_rows), dataset.target(train_rows),
+                            dataset.frame(test_rows), n_jobs)
+    return proba, time.perf_counter() - start
+
+
+def _cache_file(model, data_hash, p_hash, cache_dir):
+    return os.path.join(cache_dir, 'backtest', f'{model}-{data_hash[:16]}-{p_hash[:16]}.npz')
+
+
+def _save_result(result, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}.npz'
+    np.savez(tmp_path, oof_proba=result.oof_proba, tested=result.tested,
+             metrics=result.metrics.to_json(orient='split'))
+    os.replace(tmp_path, path)
+
+
+def _load_result(path, model, dataset, p_hash):
+    with np.load(path) as cached:
+        metrics = pd.read_json(StringIO(str(cached['metrics'])), orient='split')
+        return BacktestResult(model, metrics, cached['oof_proba'], cached['tested'],
+                              dataset.data_hash, p_hash)
+
+
+def season_backtest(dataset, model='xgboost', params=None, workers=None, cores=None,
+                    cache_dir=CACHE_DIR, use_cache=True):
+    """Walk-forward evaluation of one model over every season of `dataset`.
+
+    `params` overrides the model's defaults from train_models. The dataset
+    must come from load_dataset with caching enabled, since workers
+    memory-map its cache entry.
+    """
+    params = {**DEFAULT_PARAMS[model], **(params or {})}
+    p_hash = params_hash(model, params)
+    path = _cache_file(model, dataset.data_hash, p_hash, cache_dir)
+    if use_cache and os.path.exists(path):
+        print(f"✓ Backtest cache hit ({model}, {p_hash[:12]})")
+        return _load_result(path, model, dataset, p_hash)
+
+    folds = season_folds(dataset)
+    cores = cores or available_cores()
+    workers = max(1, min(workers or cores, len(folds)))
+    threads = max(1, cores // workers)
+
+    oof = np.full((len(dataset), 3), np.nan)
+    tested = np.zeros(len(dataset), dtype=bool)
+    rows = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dataset.data_hash, cache_dir)) as pool:
+        # Largest training sets first so the slowest folds are not left for last
+        futures = [
+            (season, train_rows, test_rows,
+             pool.submit(_run_fold, model, params, train_rows, test_rows, threads))
+            for season, train_rows, test_rows in reversed(folds)
+        ]
+        for season, train_rows, test_rows, future in reversed(futures):
+            proba, seconds = future.result()
+            y_test = dataset.y[test_rows]
+            oof[test_rows] = proba
+            tested[test_rows] = True
+            rows.append({
+                'season': season,
+                'n_train': train_rows.stop,
+                'n_test': test_rows.stop - test_rows.start,
+                'accuracy': accuracy_score(y_test, proba.argmax(axis=1)),
+                'logloss': log_loss(y_test, proba, labels=[0, 1, 2]),
+                'brier': float(np.mean(np.sum((proba - np.eye(3)[y_test]) ** 2, axis=1))),
+                'fit_seconds': seconds,
+            })
+
+    result = BacktestResult(model, pd.DataFrame(rows), oof, tested, dataset.data_hash, p_hash)
+    if use_cache:
+        _save_result(result, path)
+    return result
+
+
+def print_backtest(result, y):
+    print(f"\n{result.model}:")
+    print(f"  {'Season':10s} {'Train':>6s} {'Test':>6s} {'Accuracy':>9s} {'LogLoss':>8s} {'Brier':>7s} {'Fit':>7s}")
+    for row in result.metrics.itertuples():
+        print(f"  {row.season:10s} {row.n_train:6d} {row.n_test:6d} {row.accuracy:9.2%} "
+              f"{row.logloss:8.4f} {row.brier:7.4f} {row.fit_seconds:6.1f}s")
+    overall = result.summary(y)
+    print(f"  {'All':10s} {'':6s} {int(result.tested.sum()):6d} {overall['accuracy']:9.2%} {overall['logloss']:8.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Season-by-season walk-forward evaluation")
+    parser.add_argument('--models', nargs='+', default=list(DEFAULT_PARAMS), choices=list(DEFAULT_PARAMS))
+    parser.add_argument('--workers', type=int, default=None, help="fold processes (default: one per core)")
+    parser.add_argument('--cores', type=int, default=None, help="total core budget (default: all available)")
+    parser.add_argument('--no-cache', action='store_true', help="ignore and do not write cached results")
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("SEASON WALK-FORWARD EVALUATION")
+    print("="*80)
+
+    dataset = load_dataset('data/features.csv')
+    folds = season_folds(dataset)
+    print(f"  {len(folds)} folds: {folds[0][0]} ... {folds[-1][0]}")
+
+    for model in args.models:
+        start = time.perf_counter()
+        result = season_backtest(dataset, model, workers=args.workers, cores=args.cores,
+                                 use_cache=not args.no_cache)
+        print_backtest(result, dataset.y)
+        print(f"  Wall clock: {time.perf_counter() - start:.1f}s")
+
+    print("\n" + "="*80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+synthetic_data.py
+─────────────────
+Deterministic synthetic league generator for scale and stress runs.
+
+Writes football-data style season files (data/2015.csv ... data/2024.csv)
+into a workspace directory. The files have the same layout as the bundled
+data, so mergedata.py, feature_engineering.py and the training scripts run
+on them unchanged when started from the workspace directory:
+
+  python src/synthetic_data.py --scale 100 --out /tmp/epl_x100
+  cd /tmp/epl_x100
+  python /path/to/repo/src/mergedata.py
+  python /path/to/repo/src/feature_engineering.py
+  python /path/to/repo/src/train_models.py
+
+--scale N generates N leagues of 20 teams over the ten seasons mergedata.py
+reads, i.e. N times the ~3,800 bundled matches. Goals are Poisson with
+per-team attack/defence strengths that drift between seasons; shots, cards,
+corners and bookmaker odds are derived from the same rates so the features
+carry realistic signal.
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+MERGEDATA_SEASONS = range(2015, 2025)
+WORKLOADS = {'1x': 1, '10x': 10, '100x': 100, '1000x': 1000}
+
+MAX_GOALS = 10
+ODDS_CHUNK = 50_000
+
+
+def round_robin(n_teams: int) -> np.ndarray:
+    """Double round-robin fixtures as (rounds, n_teams // 2, 2) team indices."""
+    if n_teams % 2:
+        raise ValueError("n_teams must be even")
+
+    teams = list(range(n_teams))
+    first_half = []
+    for _ in range(n_teams - 1):
+        pairs = [(teams[i], teams[n_teams - 1 - i]) for i in range(n_teams // 2)]
+        first_half.append(pairs)
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+
+    # Alternate venues round to round so nobody plays at home all season
+    first_half = [
+        [(h, a) if r % 2 == 0 else (a, h) for h, a in pairs]
+        for r, pairs in enumerate(first_half)
+    ]
+    second_half = [[(a, h) for h, a in pairs] for pairs in first_half]
+    return np.array(first_half + second_half, dtype=np.int32)
+
+
+def _poisson_pmf(lam: np.ndarray) -> np.ndarray:
+    """P(k goals) for k = 0..MAX_GOALS, shape (len(lam), MAX_GOALS + 1)."""
+    k = np.arange(MAX_GOALS + 1)
+    log_fact = np.cumsum(np.log(np.maximum(k, 1)))
+    return np.exp(k * np.log(lam[:, None]) - lam[:, None] - log_fact)
+
+
+def outcome_probabilities(lam_home: np.ndarray, lam_away: np.ndarray):
+    """Home/draw/away and over-2.5 probabilities under independent Poisson goals."""
+    n = len(lam_home)
+    home, draw, away = np.empty(n), np.empty(n), np.empty(n)
+
+    for start in range(0, n, ODDS_CHUNK):
+        chunk = slice(start, start + ODDS_CHUNK)
+        grid = _poisson_pmf(lam_home[chunk])[:, :, None] * _poisson_pmf(lam_away[chunk])[:, None, :]
+        home[chunk] = np.tril(grid, -1).sum(axis=(1, 2))
+        draw[chunk] = np.trace(grid, axis1=1, axis2=2)
+        away[chunk] = np.triu(grid, 1).sum(axis=(1, 2))
+
+    total = home + draw + away
+    total_lam = lam_home + lam_away
+    under25 = np.exp(-total_lam) * (1 + total_lam + total_lam ** 2 / 2)
+    return home / total, draw / total, away / total, 1 - under25
+
+
+def _odds(rng, proba, margin, noise=0.03):
+    quoted = proba * (1 + margin) * rng.lognormal(0.0, noise, size=proba.shape)
+    return np.round(np.clip(1 / quoted, 1.01, 50.0), 2)
+
+
+def _season_dates(first_year: int, n_rounds: int):
+    start = date(first_year, 8, 8)
+    start += timedelta(days=(5 - start.weekday()) % 7)  # first Saturday
+    return [start + timedelta(days=7 * r) for r in range(n_rounds)]
+
+
+def generate_season(rng, year, n_leagues, n_teams, attack, defence,
+                    home_goals=1.55, away_goals=1.25):
+    """One season for every league, in football-data column layout."""
+    fixtures = round_robin(n_teams)
+    n_rounds, per_round = fixtures.shape[:2]
+
+    league_idx = np.repeat(np.arange(n_leagues), n_rounds * per_round)
+    round_idx = np.tile(np.repeat(np.arange(n_rounds), per_round), n_leagues)
+    home_idx = np.tile(fixtures[:, :, 0].ravel(), n_leagues)
+    away_idx = np.tile(fixtures[:, :, 1].ravel(), n_leagues)
+    n = len(league_idx)
+
+    # In-season form: a small random walk on top of the season strength
+    form = rng.normal(0.0, 0.03, size=(n_leagues, n_teams, n_rounds)).cumsum(axis=2)
+    att_h = attack[league_idx, home_idx] + form[league_idx, home_idx, round_idx]
+    att_a = attack[league_idx, away_idx] + form[league_idx, away_idx, round_idx]
+    lam_home = home_goals * np.exp(att_h - defence[league_idx, away_idx])
+    lam_away = away_goals * np.exp(att_a - defence[league_idx, home_idx])
+
+    fthg = rng.poisson(lam_home)
+    ftag = rng.poisson(lam_away)
+    hthg = rng.binomial(fthg, 0.45)
+    htag = rng.binomial(ftag, 0.45)
+
+    def result(h, a):
+        return np.where(h > a, 'H', np.where(h < a, 'A', 'D'))
+
+    hs = rng.poisson(4.5 * lam_home + 4) + fthg
+    as_ = rng.poisson(4.5 * lam_away + 4) + ftag
+    hst = np.minimum(hs, fthg + rng.binomial(hs - fthg, 0.25))
+    ast = np.minimum(as_, ftag + rng.binomial(as_ - ftag, 0.25))
+
+    p_home, p_draw, p_away, p_over = outcome_probabilities(lam_home, lam_away)
+    proba = np.column_stack([p_home, p_draw, p_away])
+    b365 = _odds(rng, proba, 0.05)
+    avg = _odds(rng, proba, 0.055, noise=0.02)
+    mx = _odds(rng, proba, 0.02, noise=0.02)
+    ou = np.column_stack([p_over, 1 - p_over])
+    b365_ou = _odds(rng, ou, 0.06)
+    avg_ou = _odds(rng, ou, 0.065, noise=0.02)
+
+    dates = np.array([d.strftime('%d/%m/%Y') for d in _season_dates(year, n_rounds)])
+    team_names = np.array([[f"L{l:03d} Club {t:02d}" for t in range(n_teams)] for l in range(n_leagues)])
+
+    return pd.DataFrame({
+        'Div': np.char.add('L', np.char.zfill(league_idx.astype(str), 3)),
+        'Date': dates[round_idx],
+        'Time': np.where(np.arange(n) % 3 == 0, '12:30', '15:00'),
+        'HomeTeam': team_names[league_idx, home_idx],
+        'AwayTeam': team_names[league_idx, away_idx],
+        'FTHG': fthg, 'FTAG': ftag, 'FTR': result(fthg, ftag),
+        'HTHG': hthg, 'HTAG': htag, 'HTR': result(hthg, htag),
+        'Referee': np.char.add('Ref ', (rng.integers(0, 25, size=n)).astype(str)),
+        'HS': hs, 'AS': as_, 'HST': hst, 'AST': ast,
+        'HF': rng.poisson(10.5, size=n), 'AF': rng.poisson(11.0, size=n),
+        'HC': rng.poisson(1.2 * lam_home + 3.5), 'AC': rng.poisson(1.2 * lam_away + 3.0),
+        'HY': rng.poisson(1.6, size=n), 'AY': rng.poisson(1.8, size=n),
+        'HR': rng.poisson(0.05, size=n), 'AR': rng.poisson(0.07, size=n),
+        'B365H': b365[:, 0], 'B365D': b365[:, 1], 'B365A': b365[:, 2],
+        'MaxH': mx[:, 0], 'MaxD': mx[:, 1], 'MaxA': mx[:, 2],
+        'AvgH': avg[:, 0], 'AvgD': avg[:, 1], 'AvgA': avg[:, 2],
+        'B365>2.5': b365_ou[:, 0], 'B365<2.5': b365_ou[:, 1],
+        'Avg>2.5': avg_ou[:, 0], 'Avg<2.5': avg_ou[:, 1],
+    })
+
+
+def generate_league_data(out_dir, n_leagues=1, n_seasons=10, n_teams=20, first_season=2015,
+                         home_goals=1.55, away_goals=1.25, seed=42):
+    """Write one CSV per season into out_dir/data and return the file paths."""
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(out_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    attack = rng.normal(0.0, 0.25, size=(n_leagues, n_teams))
+    defence = rng.normal(0.0, 0.20, size=(n_leagues, n_teams))
+
+    paths = []
+    n_matches = 0
+    for year in range(first_season, first_season + n_seasons):
+        season = generate_season(rng, year, n_leagues, n_teams, attack, defence,
+                                 home_goals=home_goals, away_goals=away_goals)
+        path = os.path.join(data_dir, f'{year}.csv')
+        season.to_csv(path, index=False)
+        paths.append(path)
+        n_matches += len(season)
+
+        # Squads change over the summer
+        attack = 0.8 * attack + rng.normal(0.0, 0.12, size=attack.shape)
+        defence = 0.8 * defence + rng.normal(0.0, 0.10, size=defence.shape)
+
+    with open(os.path.join(data_dir, 'synthetic.json'), 'w') as f:
+        json.dump({
+            'leagues': n_leagues, 'seasons': n_seasons, 'teams': n_teams,
+            'first_season': first_season, 'home_goals': home_goals,
+            'away_goals': away_goals, 'seed': seed, 'matches': n_matches,
+        }, f, indent=2)
+
+    return paths, n_matches
+
+
+def generate_workload(out_dir, scale=1, seed=42):
+    """Scale N = N leagues over the seasons mergedata.py reads."""
+    return generate_league_data(out_dir, n_leagues=scale, n_seasons=len(MERGEDATA_SEASONS),
+                                first_season=MERGEDATA_SEASONS.start, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic football-data style leagues")
+    parser.add_argument('--out', required=True, help="workspace directory (files go to OUT/data)")
+    parser.add_argument('--workload', choices=sorted(WORKLOADS, key=WORKLOADS.get),
+                        help="preset scale relative to the bundled data")
+    parser.add_argument('--scale', type=int, default=1, help="number of 20-team leagues")
+    parser.add_argument('--leagues', type=int, help="number of leagues (overrides --scale)")
+    parser.add_argument('--seasons', type=int, default=10)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--first-season', type=int, default=2015)
+    parser.add_argument('--home-goals', type=float, default=1.55, help="mean home goals per match")
+    parser.add_argument('--away-goals', type=float, default=1.25, help="mean away goals per match")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    n_leagues = args.leagues or (WORKLOADS[args.workload] if args.workload else args.scale)
+
+    print("\n" + "="*60)
+    print("SYNTHETIC LEAGUE GENERATOR")
+    print("="*60)
+    print(f"  Leagues: {n_leagues}  Teams: {args.teams}  Seasons: {args.seasons} "
+          f"(from {args.first_season})  Seed: {args.seed}")
+
+    paths, n_matches = generate_league_data(
+        args.out, n_leagues=n_leagues, n_seasons=args.seasons, n_teams=args.teams,
+        first_season=args.first_season, home_goals=args.home_goals,
+        away_goals=args.away_goals, seed=args.seed,
+    )
+
+    years = range(args.first_season, args.first_season + args.seasons)
+    ignored = [y for y in years if y not in MERGEDATA_SEASONS]
+    print(f"\n✓ Wrote {len(paths)} season files, {n_matches:,} matches, to {args.out}/data")
+    if ignored:
+        print(f"  Note: mergedata.py only reads 2015-2024; seasons {ignored[0]}-{ignored[-1]} will be ignored")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,10 @@
 import pandas as pd
-import joblib
+from artifacts import load_artifacts
 from sklearn.metrics import accuracy_score
 
 df = pd.read_csv("data/features.csv")
 
-rf = joblib.load("models/tuned/random_forest_tuned.pkl")
-xgb = joblib.load("models/tuned/xgboost_tuned.pkl")
-fc = joblib.load("models/tuned/feature_columns.pkl")
+xgb, rf, fc, _ = load_artifacts("models/tuned", legacy_names=("xgboost_tuned", "random_forest_tuned"))
 
 X = df[fc]
 y = df["FTR"]
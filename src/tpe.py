@@ -0,0 +1,97 @@
+"""
+tpe.py
+──────
+Tree-structured Parzen estimator (TPE) over the discrete search spaces in
+tuner.py.
+
+The first `n_startup` suggestions are uniform random. After that:
+  1. Observed trials are split into the best `gamma` fraction and the rest.
+  2. Each parameter gets two smoothed densities over its choices: l(x)
+     from the good trials and g(x) from the others.
+  3. Candidates are drawn from l. The one with the highest l(x) / g(x) is
+     proposed.
+Numeric choice lists are treated as ordered, so a good value also lends
+weight to its neighbours. Other lists (with strings, None or bools) are
+treated as plain categories.
+"""
+
+import math
+
+import numpy as np
+
+
+class TPESampler:
+    """Proposes configurations from past (configuration, score) observations; higher scores are better."""
+
+    def __init__(self, space, seed=42, gamma=0.25, n_startup=10, n_candidates=24, prior_weight=1.0,
+                 bandwidth=1.0):
+        self.space = {name: list(values) for name, values in sorted(space.items())}
+        self.rng = np.random.default_rng(seed)
+        self.gamma = gamma
+        self.n_startup = n_startup
+        self.n_candidates = n_candidates
+        self.prior_weight = prior_weight
+        self.bandwidth = bandwidth
+        self.ordered = {name: all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+                        for name, values in self.space.items()}
+        self.history = []   # (choice indices, score)
+
+    def _indices(self, config):
+        return tuple(self.space[name].index(config[name]) for name in self.space)
+
+    def config(self, indices):
+        return {name: self.space[name][i] for name, i in zip(self.space, indices)}
+
+    def observe(self, config, score):
+        self.history.append((self._indices(config), float(score)))
+
+    def __len__(self):
+        return len(self.history)
+
+    def _density(self, dim, observed):
+        """Smoothed probability of every choice of one parameter given observed choice indices."""
+        n_choices = len(self.space[dim])
+        weights = np.full(n_choices, self.prior_weight / n_choices)
+        if len(observed):
+            if self.ordered[dim]:
+                grid = np.arange(n_choices)
+                kernels = np.exp(-0.5 * ((grid[None, :] - np.asarray(observed)[:, None]) / self.bandwidth) ** 2)
+                weights += (kernels / kernels.sum(axis=1, keepdims=True)).sum(axis=0)
+            else:
+                weights += np.bincount(observed, minlength=n_choices)
+        return weights / weights.sum()
+
+    def _random(self):
+        return tuple(int(self.rng.integers(len(values))) for values in self.space.values())
+
+    def suggest(self, exclude=()):
+        """A configuration dict, avoiding the index tuples in `exclude` when possible."""
+        exclude = set(exclude) | {indices for indices, _ in self.history}
+        if len(self.history) < self.n_startup:
+            for _ in range(100):
+                indices = self._random()
+                if indices not in exclude:
+                    break
+            return self.config(indices)
+
+        ranked = sorted(self.history, key=lambda item: -item[1])
+        n_good = max(1, math.ceil(self.gamma * len(ranked)))
+        good = np.array([indices for indices, _ in ranked[:n_good]])
+        bad = np.array([indices for indices, _ in ranked[n_good:]]).reshape(-1, len(self.space))
+
+        candidates = np.empty((self.n_candidates, len(self.space)), dtype=np.int64)
+        log_ratio = np.zeros(self.n_candidates)
+        for d, dim in enumerate(self.space):
+            l = self._density(dim, good[:, d])
+            g = self._density(dim, bad[:, d])
+            candidates[:, d] = self.rng.choice(len(l), size=self.n_candidates, p=l)
+            log_ratio += np.log(l[candidates[:, d]]) - np.log(g[candidates[:, d]])
+
+        for c in np.argsort(-log_ratio):
+            indices = tuple(int(i) for i in candidates[c])
+            if indices not in exclude:
+                return self.config(indices)
+        return self.config(self._random())
+
+    def key(self, config):
+        return self._indices(config)
@@ -1,90 +1,48 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, log_loss
-from elo_features import compute_elo
+from sklearn.metrics import accuracy_score, classification_report, log_loss
 import xgboost as xgb
 from sklearn.ensemble import RandomForestClassifier
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
+from dataset import load_dataset
+from artifacts import DEFAULT_WEIGHTS, save_artifacts
+from anytime import Deadline, DeadlineCallback, grow_forest
+from ensemble import apply_temperature
+from ensemble_weights import cached_oof, optimize_blend, print_search
+from confidence_curve import CURVES_PATH, TABLE_THRESHOLDS, compute_curves, print_threshold_table, save_curves
+from training_scheduler import TrainingTask, run_concurrent, run_sequential, print_schedule_report
+from render_plots import (TRAINING_DATA, DEFAULT_DPI, DEFAULT_FORMATS, BackgroundRenderer,
+                          save_training_data, training_jobs, report)
 import os
-import re
+import argparse
 from datetime import datetime
 
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (12, 8)
-
-def sanitize_feature_names(feature_cols):
-    sanitized = []
-    for col in feature_cols:
-        clean_name = col.replace('[', '_').replace(']', '_').replace('<', '_lt_').replace('>', '_gt_')
-        sanitized.append(clean_name)
-    return sanitized
-
 def load_and_split_data(filepath: str, test_size: float = 0.2):
     """Load features and split by time (crucial for sports betting!)"""
     print("\n" + "="*80)
     print("STEP 1: LOADING AND SPLITTING DATA")
     print("="*80)
     
-    df = pd.read_csv(filepath)
-    df = compute_elo(df)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date').reset_index(drop=True)
-    
-    print(f"✓ Loaded {len(df)} matches")
-    print(f"  Date range: {df['Date'].min().date()} to {df['Date'].max().date()}")
-    
-    exclude_cols = [
-        'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR',
-        'home_win', 'away_win', 'draw', 'home_points', 'away_points', 'target',
-        'Div', 'Season', 'Time', 'Referee', 'HTR', 'HTHG', 'HTAG',
-        'Date_home', 'Date_away', 'Team_home', 'Team_away', 
-        'Opponent_home', 'Opponent_away'
-    ]
-    
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    feature_cols = [col for col in numeric_cols if col not in exclude_cols]
+    dataset = load_dataset(filepath)
+    feature_cols = list(dataset.feature_cols)
     
-    print(f"  Total columns: {len(df.columns)}")
-    print(f"  Numeric columns: {len(numeric_cols)}")
+    print(f"✓ Loaded {len(dataset)} matches")
+    print(f"  Date range: {dataset.dates.min().date()} to {dataset.dates.max().date()}")
     print(f"  Feature columns: {len(feature_cols)}")
-    
-    original_feature_cols = feature_cols.copy()
-    feature_cols_clean = sanitize_feature_names(feature_cols)
-    
-    feature_name_mapping = dict(zip(original_feature_cols, feature_cols_clean))
-    
-    df = df.rename(columns=feature_name_mapping)
-    feature_cols = feature_cols_clean
-    
     print(f"  Sanitized feature names for XGBoost compatibility")
     
-    if 'FTR' not in df.columns:
-        raise ValueError("FTR column not found!")
-    
-    target_map = {'H': 0, 'D': 1, 'A': 2}
-    df['target'] = df['FTR'].map(target_map)
+    split_idx = dataset.split_index(test_size)
+    train_rows = slice(0, split_idx)
+    test_rows = slice(split_idx, None)
     
-    if df['target'].isna().any():
-        print(f"\n⚠ Warning: {df['target'].isna().sum()} invalid FTR values found")
-        df = df.dropna(subset=['target'])
-        print(f"  New size: {len(df)}")
+    X_train = dataset.frame(train_rows)
+    y_train = dataset.target(train_rows)
+    X_test = dataset.frame(test_rows)
+    y_test = dataset.target(test_rows)
+    test_df = dataset.meta_frame(test_rows)
     
-    split_idx = int(len(df) * (1 - test_size))
-    
-    train_df = df.iloc[:split_idx].copy()
-    test_df = df.iloc[split_idx:].copy()
-    
-    X_train = train_df[feature_cols].fillna(0)
-    y_train = train_df['target'].astype(int)
-    X_test = test_df[feature_cols].fillna(0)
-    y_test = test_df['target'].astype(int)
-    
-    print(f"\n Train set: {len(train_df)} matches")
-    print(f"  Period: {train_df['Date'].min().date()} to {train_df['Date'].max().date()}")
-    print(f"\n Test set: {len(test_df)} matches")
+    print(f"\n Train set: {len(X_train)} matches")
+    print(f"  Period: {dataset.dates[train_rows].min().date()} to {dataset.dates[train_rows].max().date()}")
+    print(f"\n Test set: {len(X_test)} matches")
     print(f"  Period: {test_df['Date'].min().date()} to {test_df['Date'].max().date()}")
     
     print(f"\nClass distribution:")
@@ -93,40 +51,94 @@ def load_and_split_data(filepath: str, test_size: float = 0.2):
     print(f"  Draw:     {dist[1]:.1%}")
     print(f"  Away Win: {dist[2]:.1%}")
     
-    non_numeric = X_train.select_dtypes(exclude=[np.number]).columns
-    if len(non_numeric) > 0:
-        raise ValueError(f"Non-numeric columns found: {list(non_numeric)}")
-    
     print(f"\n All features are numeric and ready for training")
     
     return X_train, X_test, y_train, y_test, feature_cols, test_df
 
-def train_xgboost(X_train, y_train, X_test, y_test):
+def trim_to_best_iteration(model):
+    """Return a copy of an early-stopped XGBClassifier holding only trees up to best_iteration"""
+    n_trees = model.best_iteration + 1
+    trimmed_booster = model.get_booster()[:n_trees]
+    
+    # The trained model's parameters, so the saved manifest describes this booster
+    params = {k: v for k, v in model.get_params().items() if k not in ('early_stopping_rounds', 'callbacks')}
+    trimmed = xgb.XGBClassifier(**{**params, 'n_estimators': n_trees})
+    trimmed.load_model(bytearray(trimmed_booster.save_raw('ubj')))
+    return trimmed
+
+TEST_SIZE = 0.2  # final share of matches held out as the test period
+
+XGB_PARAMS = {
+    'objective': 'multi:softprob',
+    'num_class': 3,
+    'max_depth': 4,
+    'learning_rate': 0.03,
+    'n_estimators': 500,
+    'subsample': 0.7,
+    'colsample_bytree': 0.7,
+    'min_child_weight': 5,
+    'gamma': 0.3,
+    'reg_alpha': 0.3,
+    'reg_lambda': 2.0,
+    'random_state': 42,
+    'eval_metric': 'mlogloss',
+}
+
+RF_PARAMS = {
+    'n_estimators': 300,
+    'max_depth': 15,
+    'min_samples_split': 10,
+    'min_samples_leaf': 4,
+    'max_features': 'sqrt',
+    'random_state': 42,
+}
+
+def fit_xgboost(X_train, y_train, n_jobs=None, val_fraction=0.15, early_stopping_rounds=50,
+                params=None, deadline=None):
+    """Early-stopped XGBoost fit trimmed to its best iteration.
+
+    `params` overrides entries of XGB_PARAMS. With a Deadline, boosting also
+    stops before the round that would overrun it. Returns (model, info) where
+    info holds the number of rounds built, the best validation log-loss and
+    what stopped boosting (completed, early_stopping or deadline).
+    """
+    params = {**XGB_PARAMS, **(params or {}), 'n_jobs': n_jobs}
+    callback = DeadlineCallback(deadline) if deadline is not None and deadline.budget is not None else None
+    
+    # Early stopping watches the last part of the training period, never the test set
+    val_idx = int(len(X_train) * (1 - val_fraction))
+    X_fit, X_val = X_train.iloc[:val_idx], X_train.iloc[val_idx:]
+    y_fit, y_val = y_train.iloc[:val_idx], y_train.iloc[val_idx:]
+    
+    model = xgb.XGBClassifier(**params, early_stopping_rounds=early_stopping_rounds,
+                              callbacks=[callback] if callback else None)
+    model.fit(X_fit, y_fit, eval_set=[(X_fit, y_fit), (X_val, y_val)], verbose=False)
+    
+    n_built = model.get_booster().num_boosted_rounds()
+    info = {
+        'n_built': n_built,
+        'n_val': len(X_val),
+        'val_logloss': float(model.best_score),
+        'stopped_by': 'deadline' if callback and callback.stopped else
+                      'early_stopping' if n_built < params['n_estimators'] else 'completed',
+    }
+    return trim_to_best_iteration(model), info
+
+def train_xgboost(X_train, y_train, X_test, y_test, n_jobs=None,
+                  val_fraction=0.15, early_stopping_rounds=50, deadline=None):
     print("\n" + "="*80)
     print("STEP 2: TRAINING XGBOOST MODEL")
     print("="*80)
     
-    params = {
-        'objective': 'multi:softprob',
-        'num_class': 3,
-        'max_depth': 4,
-        'learning_rate': 0.03,
-        'n_estimators': 500,
-        'subsample': 0.7,
-        'colsample_bytree': 0.7,
-        'min_child_weight': 5,
-        'gamma': 0.3,
-        'reg_alpha': 0.3,
-        'reg_lambda': 2.0,
-        'random_state': 42,
-        'eval_metric': 'mlogloss'
-    }
-    
     print("\nTraining XGBoost...")
-    model = xgb.XGBClassifier(**params)
-    
-    eval_set = [(X_train, y_train), (X_test, y_test)]
-    model.fit(X_train, y_train, eval_set=eval_set, verbose=False)
+    model, info = fit_xgboost(X_train, y_train, n_jobs=n_jobs, val_fraction=val_fraction,
+                              early_stopping_rounds=early_stopping_rounds, deadline=deadline)
+    print(f"  Early stopping on the last {info['n_val']} training matches "
+          f"(patience {early_stopping_rounds} rounds)")
+    print(f"  Best iteration: {model.n_estimators} trees "
+          f"(built {info['n_built']} of max {XGB_PARAMS['n_estimators']})")
+    if info['stopped_by'] == 'deadline':
+        print(f"  ⚠ Time budget reached: kept the best of the {info['n_built']} rounds built")
     
     train_preds = model.predict(X_train)
     test_preds = model.predict(X_test)
@@ -143,27 +155,24 @@ def train_xgboost(X_train, y_train, X_test, y_test):
     if train_acc - test_acc > 0.05:
         print(f"Overfitting gap: {(train_acc-test_acc)*100:.2f}%")
     
-    return model, test_preds, test_proba, test_acc
+    info.update(n_trees=int(model.n_estimators), planned=XGB_PARAMS['n_estimators'])
+    return model, test_preds, test_proba, test_acc, info
 
-def train_random_forest(X_train, y_train, X_test, y_test):
-    """Train Random Forest classifier"""
+def train_random_forest(X_train, y_train, X_test, y_test, n_jobs=-1, deadline=None):
+    """Train Random Forest classifier; with a time-budgeted Deadline it grows in chunks until it runs out"""
     print("\n" + "="*80)
     print("STEP 3: TRAINING RANDOM FOREST MODEL")
     print("="*80)
     
-    params = {
-        'n_estimators': 300,
-        'max_depth': 15,
-        'min_samples_split': 10,
-        'min_samples_leaf': 4,
-        'max_features': 'sqrt',
-        'random_state': 42,
-        'n_jobs': -1
-    }
-    
     print("\nTraining Random Forest...")
-    model = RandomForestClassifier(**params)
-    model.fit(X_train, y_train)
+    stopped = False
+    if deadline is not None and deadline.budget is not None:
+        model, stopped = grow_forest(RF_PARAMS, X_train, y_train, deadline, n_jobs=n_jobs)
+        if stopped:
+            print(f"  ⚠ Time budget reached: kept {len(model.estimators_)} of {RF_PARAMS['n_estimators']} trees")
+    else:
+        model = RandomForestClassifier(**RF_PARAMS, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
     
     train_preds = model.predict(X_train)
     test_preds = model.predict(X_test)
@@ -180,19 +189,22 @@ def train_random_forest(X_train, y_train, X_test, y_test):
     if train_acc - test_acc > 0.05:
         print(f"  ⚠ Overfitting gap: {(train_acc-test_acc)*100:.2f}%")
     
-    return model, test_preds, test_proba, test_acc
+    info = {'n_trees': len(model.estimators_), 'planned': RF_PARAMS['n_estimators'],
+            'stopped_by': 'deadline' if stopped else 'completed'}
+    return model, test_preds, test_proba, test_acc, info
 
-def create_ensemble(xgb_proba, rf_proba, y_test, weights=[0.6, 0.4]):
+def create_ensemble(xgb_proba, rf_proba, y_test, weights=(0.6, 0.4), temperature=None):
     print("\n" + "="*80)
     print("STEP 4: CREATING ENSEMBLE MODEL")
     print("="*80)
     
-    ensemble_proba = (weights[0] * xgb_proba + weights[1] * rf_proba)
+    ensemble_proba = apply_temperature(weights[0] * xgb_proba + weights[1] * rf_proba, temperature)
     ensemble_pred = np.argmax(ensemble_proba, axis=1)
     
     accuracy = accuracy_score(y_test, ensemble_pred)
     
-    print(f"\nEnsemble Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
+    print(f"\nWeights: XGBoost {weights[0]:.2f} / Random Forest {weights[1]:.2f}")
+    print(f"Ensemble Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
     
     return ensemble_pred, ensemble_proba, accuracy
 
@@ -214,79 +226,22 @@ def print_detailed_metrics(y_test, y_pred, model_name):
         print(f"    F1-Score:  {report[outcome]['f1-score']:.4f}")
         print(f"    Support:   {int(report[outcome]['support'])}")
 
-def plot_confusion_matrix(y_test, y_pred, title, save_path):
-    cm = confusion_matrix(y_test, y_pred)
-    cm_percent = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis] * 100
-    
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-    
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax1,
-                xticklabels=['Home', 'Draw', 'Away'],
-                yticklabels=['Home', 'Draw', 'Away'])
-    ax1.set_title(f'{title} - Counts')
-    ax1.set_ylabel('Actual')
-    ax1.set_xlabel('Predicted')
-    
-    sns.heatmap(cm_percent, annot=True, fmt='.1f', cmap='Greens', ax=ax2,
-                xticklabels=['Home', 'Draw', 'Away'],
-                yticklabels=['Home', 'Draw', 'Away'])
-    ax2.set_title(f'{title} - Percentages')
-    ax2.set_ylabel('Actual')
-    ax2.set_xlabel('Predicted')
-    
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    plt.close()
-
-def plot_feature_importance(model, feature_cols, model_name, top_n=20):
-    """Plot feature importance"""
+def print_top_features(model, feature_cols, model_name, top_n=10):
     if not hasattr(model, 'feature_importances_'):
         return
     
     importances = model.feature_importances_
-    indices = np.argsort(importances)[-top_n:]
-    
-    plt.figure(figsize=(10, 8))
-    plt.barh(range(top_n), importances[indices])
-    plt.yticks(range(top_n), [feature_cols[i] for i in indices])
-    plt.xlabel('Importance')
-    plt.title(f'Top {top_n} Features - {model_name}')
-    plt.tight_layout()
-    
-    save_path = f'models/{model_name.lower().replace(" ", "_")}_features.png'
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    print(f"\nTop 10 Features ({model_name}):")
-    top_10 = np.argsort(importances)[-10:][::-1]
-    for i, idx in enumerate(top_10, 1):
+    print(f"\nTop {top_n} Features ({model_name}):")
+    top = np.argsort(importances)[-top_n:][::-1]
+    for i, idx in enumerate(top, 1):
         print(f"  {i:2d}. {feature_cols[idx]:35s} {importances[idx]:.4f}")
 
-def analyze_betting(test_df, predictions, probabilities, model_name):
+def analyze_betting(curve, model_name):
     print(f"\n{'='*80}")
     print(f"BETTING ANALYSIS - {model_name}")
     print("="*80)
     
-    test_df = test_df.copy()
-    test_df['prediction'] = predictions
-    test_df['max_proba'] = np.max(probabilities, axis=1)
-    
-    target_map = {'H': 0, 'D': 1, 'A': 2}
-    test_df['actual'] = test_df['FTR'].map(target_map)
-    test_df['correct'] = (test_df['prediction'] == test_df['actual']).astype(int)
-    
-    for threshold in [0.50, 0.55, 0.60, 0.65]:
-        bets = test_df[test_df['max_proba'] >= threshold]
-        
-        if len(bets) > 0:
-            correct = bets['correct'].sum()
-            total = len(bets)
-            acc = correct / total
-            coverage = total / len(test_df)
-            
-            print(f"\nConfidence ≥ {threshold:.0%}:")
-            print(f"  Bets:     {total} ({coverage:.1%})")
-            print(f"  Accuracy: {acc:.1%} ({correct}/{total})")
+    print_threshold_table(curve, TABLE_THRESHOLDS)
 
 def compare_models(xgb_acc, rf_acc, ens_acc):
     print("\n" + "="*80)
@@ -302,22 +257,68 @@ def compare_models(xgb_acc, rf_acc, ens_acc):
         marker = " ⭐" if acc == accs[best_idx] else ""
         print(f"  {model:15s}: {acc*100:.2f}%{marker}")
 
-def save_models(xgb_model, rf_model, feature_cols):
+def training_run(deadline, infos, y_test, probas):
+    """Time used and quality reached, recorded in the manifest as 'training_run'."""
+    run = {
+        'time_budget': deadline.budget,
+        'seconds_used': round(deadline.used(), 3),
+        'deadline_hit': any(info.get('stopped_by') == 'deadline' for info in infos.values()),
+        # Fits stop in time, but their first round or chunk and the evaluation and saving after them do not
+        'overrun_seconds': round(deadline.overrun(), 3),
+        'models': {},
+    }
+    for name, proba in probas.items():
+        # float32 rows miss 1 by rounding, which log_loss warns about
+        p = np.array(proba, dtype=np.float64)
+        p /= p.sum(axis=1, keepdims=True)
+        quality = {'test_accuracy': float(accuracy_score(y_test, np.argmax(p, axis=1))),
+                   'test_logloss': float(log_loss(y_test, p, labels=[0, 1, 2]))}
+        run['models'][name] = {**infos.get(name, {}), **quality}
+    return run
+
+def save_models(xgb_model, rf_model, feature_cols, data_hash=None, weights=None, extra=None):
     os.makedirs('models', exist_ok=True)
     
-    joblib.dump(xgb_model, 'models/xgboost_model.pkl')
-    joblib.dump(rf_model, 'models/random_forest_model.pkl')
+    manifest = save_artifacts('models', xgb_model, rf_model, feature_cols, data_hash=data_hash,
+                              weights=weights, extra=extra)
     joblib.dump(feature_cols, 'models/feature_columns.pkl')
     
     metadata = {
         'training_date': datetime.now().isoformat(),
-        'n_features': len(feature_cols)
+        'n_features': len(feature_cols),
+        'xgb_n_trees': xgb_model.get_booster().num_boosted_rounds(),
+        'rf_n_trees': len(rf_model.estimators_)
     }
     joblib.dump(metadata, 'models/metadata.pkl')
     
     print("\n Models saved to models/")
+    for entry in manifest['models'].values():
+        print(f"  - {entry['file']:28s} {entry['bytes'] / 1024:8.1f} KB  sha256 {entry['sha256'][:12]}")
+    print(f"  - manifest.json")
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the XGBoost, Random Forest and ensemble models")
+    parser.add_argument('--cores', type=int, default=None,
+                        help="total core budget shared by concurrent fits (default: all available)")
+    parser.add_argument('--compare-sequential', action='store_true',
+                        help="also time a one-model-at-a-time run to report the saving (with its own --time-budget)")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="skip rendering figures (headless retraining); their data is still saved")
+    parser.add_argument('--plot-dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('--plot-formats', nargs='+', default=list(DEFAULT_FORMATS),
+                        help="figure formats, e.g. png svg")
+    parser.add_argument('--fixed-weights', action='store_true',
+                        help="blend 60/40 even when current out-of-fold probabilities are saved")
+    parser.add_argument('--fit-weights', action='store_true',
+                        help="run the season backtest for out-of-fold probabilities when none are saved for "
+                             "this data (slow on a cold cache), then fit the blend weights on them")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="wall-clock seconds for the run; fits stop in time and keep the best model so far "
+                             "(their first round / tree chunk and the saving after them always run, so the "
+                             "manifest records the time actually used)")
+    args = parser.parse_args()
+    deadline = Deadline(args.time_budget)
+    
     print("\n" + "="*80)
     print(" "*20 + "FOOTBALL PREDICTION MODEL")
     print("="*80)
@@ -328,41 +329,96 @@ def main():
         return
     
     X_train, X_test, y_train, y_test, feature_cols, test_df = \
-        load_and_split_data('data/features.csv', test_size=0.2)
-    
-    xgb_model, xgb_pred, xgb_proba, xgb_acc = \
-        train_xgboost(X_train, y_train, X_test, y_test)
+        load_and_split_data('data/features.csv', test_size=TEST_SIZE)
+    dataset = load_dataset('data/features.csv')
+    
+    def training_tasks(deadline):
+        return [
+            TrainingTask('XGBoost', lambda n_jobs: train_xgboost(X_train, y_train, X_test, y_test, n_jobs=n_jobs,
+                                                                 deadline=deadline)),
+            TrainingTask('Random Forest', lambda n_jobs: train_random_forest(X_train, y_train, X_test, y_test,
+                                                                             n_jobs=n_jobs, deadline=deadline)),
+        ]
+    
+    sequential_report = None
+    if args.compare_sequential:
+        # The comparison gets a budget of its own, and the run that is saved starts afresh after it
+        _, sequential_report = run_sequential(training_tasks(Deadline(args.time_budget)), core_budget=args.cores)
+        deadline = Deadline(args.time_budget)
+    
+    results, schedule_report = run_concurrent(training_tasks(deadline), core_budget=args.cores)
+    print_schedule_report(schedule_report, sequential_report)
+    
+    xgb_model, xgb_pred, xgb_proba, xgb_acc, xgb_info = results['XGBoost']
     print_detailed_metrics(y_test, xgb_pred, 'XGBoost')
     
-    rf_model, rf_pred, rf_proba, rf_acc = \
-        train_random_forest(X_train, y_train, X_test, y_test)
+    rf_model, rf_pred, rf_proba, rf_acc, rf_info = results['Random Forest']
     print_detailed_metrics(y_test, rf_pred, 'Random Forest')
     
-    ens_pred, ens_proba, ens_acc = \
-        create_ensemble(xgb_proba, rf_proba, y_test)
+    weights, temperature, blend_extra = DEFAULT_WEIGHTS, None, None
+    # Saved OOF probabilities for this data are always used; computing them takes --fit-weights
+    fit_blend = not args.fixed_weights and cached_oof(dataset) is not None
+    if not args.fixed_weights and not fit_blend:
+        if not args.fit_weights:
+            print("\n  No current OOF probabilities: blending 60/40 (--fit-weights runs the season backtest)")
+        elif args.time_budget is not None:
+            # The season backtest behind fresh OOF probabilities is far too slow for a budgeted run
+            print("\n  Time budget set and no current OOF probabilities: blending 60/40")
+        else:
+            fit_blend = True
+    if fit_blend:
+        # Weights are fitted on season walk-forward OOF probabilities, never on the test split
+        print("\n" + "="*80)
+        print("FITTING ENSEMBLE WEIGHTS ON OUT-OF-FOLD PROBABILITIES")
+        print("="*80)
+        search, oof = optimize_blend(dataset, cores=args.cores, rows_before=dataset.split_index(TEST_SIZE))
+        print_search(search)
+        weights, temperature = search.weights, search.temperature
+        blend_extra = {'ensemble_fit': search.manifest_fit(oof['data_hash'])}
+        if temperature is not None:
+            blend_extra['ensemble_temperature'] = temperature
+    
+    ens_pred, ens_proba, ens_acc = create_ensemble(
+        xgb_proba, rf_proba, y_test,
+        weights=(weights['xgboost'], weights['random_forest']), temperature=temperature)
     print_detailed_metrics(y_test, ens_pred, 'Ensemble')
     
     compare_models(xgb_acc, rf_acc, ens_acc)
     
-    print("\n" + "="*80)
-    print("CREATING VISUALIZATIONS")
-    print("="*80)
-    
-    os.makedirs('models', exist_ok=True)
-    
-    plot_confusion_matrix(y_test, xgb_pred, 'XGBoost', 'models/xgb_cm.png')
-    plot_confusion_matrix(y_test, rf_pred, 'Random Forest', 'models/rf_cm.png')
-    plot_confusion_matrix(y_test, ens_pred, 'Ensemble', 'models/ens_cm.png')
-    print(" Confusion matrices saved")
-    
-    plot_feature_importance(xgb_model, feature_cols, 'XGBoost', top_n=20)
-    plot_feature_importance(rf_model, feature_cols, 'Random Forest', top_n=20)
-    print(" Feature importance saved")
-    
-    analyze_betting(test_df, xgb_pred, xgb_proba, 'XGBoost')
-    analyze_betting(test_df, ens_pred, ens_proba, 'Ensemble')
-    
-    save_models(xgb_model, rf_model, feature_cols)
+    # Figures are rendered from saved arrays, in background processes while the
+    # rest of the run continues (or later by src/render_plots.py with --no-plots)
+    save_training_data(TRAINING_DATA, y_test,
+                       {'XGBoost': xgb_pred, 'Random Forest': rf_pred, 'Ensemble': ens_pred},
+                       {'XGBoost': xgb_model.feature_importances_,
+                        'Random Forest': rf_model.feature_importances_},
+                       feature_cols)
+    renderer = None
+    if not args.no_plots:
+        renderer = BackgroundRenderer(training_jobs(TRAINING_DATA), dpi=args.plot_dpi,
+                                      formats=args.plot_formats)
+    
+    print_top_features(xgb_model, feature_cols, 'XGBoost')
+    print_top_features(rf_model, feature_cols, 'Random Forest')
+    
+    # One sorted pass per model gives every threshold; the app's signal bands read the same file
+    curves = compute_curves({'XGBoost': xgb_proba, 'Random Forest': rf_proba, 'Ensemble': ens_proba}, y_test)
+    save_curves(CURVES_PATH, curves)
+    analyze_betting(curves['XGBoost'], 'XGBoost')
+    analyze_betting(curves['Ensemble'], 'Ensemble')
+    
+    run = training_run(deadline, {'xgboost': xgb_info, 'random_forest': rf_info}, y_test,
+                       {'xgboost': xgb_proba, 'random_forest': rf_proba, 'ensemble': ens_proba})
+    save_models(xgb_model, rf_model, feature_cols, data_hash=dataset.data_hash,
+                weights=weights, extra={**(blend_extra or {}), 'training_run': run})
+    if args.time_budget is not None:
+        print(f"\n  Time budget: {run['seconds_used']:.1f}s used of {args.time_budget:.0f}s"
+              + (" (deadline reached, best-so-far models saved)" if run['deadline_hit'] else ""))
+        if run['overrun_seconds']:
+            print(f"  ⚠ Over budget by {run['overrun_seconds']:.1f}s: the first round / tree chunk of each fit "
+                  f"and the evaluation and saving after training always run")
+    
+    if renderer is not None:
+        report(*renderer.wait(), label="Confusion matrices and feature importance")
     
     print("\n" + "="*80)
     print("TRAINING COMPLETE!")
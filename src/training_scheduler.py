@@ -0,0 +1,147 @@
+"""
+training_scheduler.py
+─────────────────────
+Runs independent model fits concurrently under a fixed core budget.
+
+Each task declares a relative weight and receives a share of the budget as
+its thread count (XGBoost `n_jobs`, Random Forest `n_jobs`). A task only
+starts once its cores are free, so the sum of threads in use never exceeds
+the budget — no cores² oversubscription from nested `n_jobs=-1`.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity / container limits)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@dataclass
+class TrainingTask:
+    name: str
+    fn: object          # called as fn(n_jobs) and returns the task result
+    weight: float = 1.0
+
+
+def split_threads(tasks, core_budget):
+    """Integer thread counts proportional to task weights, each >= 1, summing to <= budget.
+
+    With fewer cores than tasks, every task gets one thread and the scheduler
+    runs them in waves instead of oversubscribing.
+    """
+    if core_budget <= len(tasks):
+        return {t.name: 1 for t in tasks}
+
+    total = sum(t.weight for t in tasks)
+    shares = {t.name: max(1, int(core_budget * t.weight / total)) for t in tasks}
+
+    # Light tasks raised to one thread can push the sum over budget: take it back from the largest shares
+    while sum(shares.values()) > core_budget:
+        shares[max(shares, key=shares.get)] -= 1
+
+    # Hand out cores lost to rounding, heaviest tasks first
+    spare = core_budget - sum(shares.values())
+    for task in sorted(tasks, key=lambda t: -t.weight):
+        if spare <= 0:
+            break
+        shares[task.name] += 1
+        spare -= 1
+    return shares
+
+
+class CoreBudget:
+    """Counting semaphore over cores; acquire(n) blocks until n cores are free."""
+
+    def __init__(self, cores):
+        self.cores = cores
+        self.free = cores
+        self.peak_in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        with self._cond:
+            while self.free < n:
+                self._cond.wait()
+            self.free -= n
+            self.peak_in_use = max(self.peak_in_use, self.cores - self.free)
+
+    def release(self, n):
+        with self._cond:
+            self.free += n
+            self._cond.notify_all()
+
+
+def run_concurrent(tasks, core_budget=None):
+    """Run tasks in threads under the core budget.
+
+    Returns (results by task name, report dict with per-task timings).
+    """
+    core_budget = core_budget or available_cores()
+    threads = split_threads(tasks, core_budget)
+    budget = CoreBudget(core_budget)
+    timings = {}
+
+    def run(task):
+        n = threads[task.name]
+        budget.acquire(n)
+        start = time.perf_counter()
+        try:
+            return task.fn(n)
+        finally:
+            timings[task.name] = time.perf_counter() - start
+            budget.release(n)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = {task.name: pool.submit(run, task) for task in tasks}
+        results = {name: future.result() for name, future in futures.items()}
+    wall_clock = time.perf_counter() - wall_start
+
+    report = {
+        'core_budget': core_budget,
+        'threads': threads,
+        'task_seconds': timings,
+        'wall_clock': wall_clock,
+        'peak_cores_in_use': budget.peak_in_use,
+    }
+    return results, report
+
+
+def run_sequential(tasks, core_budget=None):
+    """Reference run: one task at a time, each with the whole budget."""
+    core_budget = core_budget or available_cores()
+    results, timings = {}, {}
+    wall_start = time.perf_counter()
+    for task in tasks:
+        start = time.perf_counter()
+        results[task.name] = task.fn(core_budget)
+        timings[task.name] = time.perf_counter() - start
+    wall_clock = time.perf_counter() - wall_start
+    return results, {'core_budget': core_budget, 'task_seconds': timings, 'wall_clock': wall_clock}
+
+
+def print_schedule_report(report, sequential_report=None):
+    print("\n" + "="*80)
+    print("TRAINING SCHEDULE")
+    print("="*80)
+    print(f"  Core budget: {report['core_budget']}  (peak in use: {report['peak_cores_in_use']})")
+    for name, seconds in report['task_seconds'].items():
+        print(f"  {name:15s} {report['threads'][name]:3d} thread(s)  {seconds:7.1f}s")
+    print(f"  Wall clock:     {report['wall_clock']:7.1f}s")
+
+    if sequential_report is None:
+        # Each task ran on a share of the cores, so the sum of task times overstates a sequential run
+        print(f"  Task time sum:  {sum(report['task_seconds'].values()):7.1f}s  "
+              f"(not a sequential estimate; measure one with --compare-sequential)")
+        return
+    reference = sequential_report['wall_clock']
+    saving = reference - report['wall_clock']
+    print(f"  Sequential:     {reference:7.1f}s  (measured, each task on all {sequential_report['core_budget']} cores)")
+    print(f"  Saving:         {saving:7.1f}s ({saving / reference:.0%})" if reference > 0 else "")
@@ -0,0 +1,281 @@
+"""
+trial_store.py
+──────────────
+Persistent tuning results in a local SQLite database.
+
+Every finished (configuration, tree count, fold) evaluation is written the
+moment it completes. Rows are keyed by:
+  - the training data hash
+  - the model
+  - a hash of the full parameter set, including the fixed base parameters
+  - the tree count
+  - the fold boundaries
+  - the metric
+A search killed half-way therefore resumes where it stopped: re-running it
+samples the same configurations and finds their finished folds here.
+Any later search on the same data reuses every score it shares with
+earlier ones, whatever search space produced them.
+
+Fits also store their test-fold class probabilities (`predictions`), keyed
+the same way minus the metric, and the test-fold labels (`labels`). Any
+metric can be recomputed from the two, and stitched across folds the
+probabilities are each candidate's out-of-fold predictions, which
+ensemble_tuning.py blends without refitting anything.
+
+Each search also records its search-space hash (space + schedule settings)
+in the `searches` table, so history can be traced back to the run that
+produced it.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset import CACHE_DIR
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, 'tuning', 'trials.sqlite')
+STORE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    data_hash   TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    n_trees     INTEGER NOT NULL,
+    train_end   INTEGER NOT NULL,
+    test_end    INTEGER NOT NULL,
+    metric      TEXT NOT NULL,
+    score       REAL NOT NULL,
+    params      TEXT NOT NULL,
+    space_hash  TEXT,
+    seconds     REAL,
+    created     TEXT,
+    PRIMARY KEY (data_hash, model, params_hash, n_trees, train_end, test_end, metric)
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    data_hash   TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    n_trees     INTEGER NOT NULL,
+    train_end   INTEGER NOT NULL,
+    test_end    INTEGER NOT NULL,
+    proba       BLOB NOT NULL,
+    params      TEXT NOT NULL,
+    PRIMARY KEY (data_hash, model, params_hash, n_trees, train_end, test_end)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    data_hash   TEXT NOT NULL,
+    train_end   INTEGER NOT NULL,
+    test_end    INTEGER NOT NULL,
+    y           BLOB NOT NULL,
+    PRIMARY KEY (data_hash, train_end, test_end)
+);
+CREATE TABLE IF NOT EXISTS searches (
+    space_hash  TEXT NOT NULL,
+    data_hash   TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    settings    TEXT NOT NULL,
+    started     TEXT,
+    finished    TEXT,
+    PRIMARY KEY (space_hash, data_hash)
+);
+"""
+
+
+def _json(obj):
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def encode_array(arr):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(arr), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_array(blob):
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+def params_hash(model, params, base_params=None):
+    """Hash of everything that defines a fit except the tree count."""
+    payload = {'model': model, 'params': {k: v for k, v in params.items() if k != 'n_estimators'},
+               'base': base_params or {}, 'version': STORE_VERSION}
+    return hashlib.sha256(_json(payload).encode()).hexdigest()
+
+
+def space_hash(model, space, settings):
+    return hashlib.sha256(_json({'model': model, 'space': space, 'settings': settings}).encode()).hexdigest()
+
+
+class TrialStore:
+    """Thread-safe handle on the SQLite trial database (WAL mode, so processes can share it)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def lookup(self, data_hash, model, p_hash, n_trees, fold, metric='accuracy'):
+        """Stored score of one fold evaluation, or None."""
+        train, test = fold
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT score FROM evaluations WHERE data_hash=? AND model=? AND params_hash=? '
+                'AND n_trees=? AND train_end=? AND test_end=? AND metric=?',
+                (data_hash, model, p_hash, int(n_trees), train.stop, test.stop, metric)).fetchone()
+        return None if row is None else row[0]
+
+    def record(self, data_hash, model, p_hash, params, n_trees, fold, score, metric='accuracy',
+               s_hash=None, seconds=None):
+        train, test = fold
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (data_hash, model, p_hash, int(n_trees), train.stop, test.stop, metric, float(score),
+                 _json(params), s_hash, seconds, datetime.now().isoformat()))
+            self._conn.commit()
+
+    def lookup_proba(self, data_hash, model, p_hash, n_trees, fold):
+        """Stored test-fold probabilities of one fold evaluation, or None."""
+        train, test = fold
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT proba FROM predictions WHERE data_hash=? AND model=? AND params_hash=? '
+                'AND n_trees=? AND train_end=? AND test_end=?',
+                (data_hash, model, p_hash, int(n_trees), train.stop, test.stop)).fetchone()
+        return None if row is None else decode_array(row[0])
+
+    def record_proba(self, data_hash, model, p_hash, params, n_trees, fold, proba):
+        train, test = fold
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (data_hash, model, p_hash, int(n_trees), train.stop, test.stop,
+                 encode_array(np.asarray(proba, dtype=np.float32)), _json(params)))
+            self._conn.commit()
+
+    def record_labels(self, data_hash, fold, y):
+        """Test-fold labels, so the fold's stored probabilities can be rescored with any metric."""
+        train, test = fold
+        with self._lock:
+            self._conn.execute('INSERT OR IGNORE INTO labels VALUES (?, ?, ?, ?)',
+                               (data_hash, train.stop, test.stop, encode_array(np.asarray(y))))
+            self._conn.commit()
+
+    def rescored(self, data_hash, model, metric, score):
+        """Fold evaluations of every stored probability that has labels, scored with score(metric, y, proba)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT p.params_hash, p.n_trees, p.train_end, p.test_end, p.params, p.proba, l.y '
+                'FROM predictions p JOIN labels l ON p.data_hash=l.data_hash AND p.train_end=l.train_end '
+                'AND p.test_end=l.test_end WHERE p.data_hash=? AND p.model=?', (data_hash, model)).fetchall()
+        return pd.DataFrame(
+            [(p_hash, n_trees, train_end, test_end, json.loads(params),
+              score(metric, decode_array(y), decode_array(proba)))
+             for p_hash, n_trees, train_end, test_end, params, proba, y in rows],
+            columns=['params_hash', 'n_trees', 'train_end', 'test_end', 'params', 'score'])
+
+    def oof_probas(self, data_hash, model, folds, tree_counts=None):
+        """{(params hash, tree count): (params, OOF probabilities)} for candidates stored on every fold.
+
+        The OOF matrix stacks the test folds in order, so its rows line up
+        with the concatenated test rows of `folds`. With `tree_counts`, only
+        candidates at those counts are returned; partial-budget fits (e.g.
+        successive halving's early rungs) are left out that way.
+        """
+        position = {(train.stop, test.stop): k for k, (train, test) in enumerate(folds)}
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT params_hash, n_trees, train_end, test_end, proba, params FROM predictions '
+                'WHERE data_hash=? AND model=?', (data_hash, model)).fetchall()
+        by_candidate = {}
+        for p_hash, n_trees, train_end, test_end, proba, params in rows:
+            if tree_counts is not None and n_trees not in tree_counts:
+                continue
+            k = position.get((train_end, test_end))
+            if k is not None:
+                by_candidate.setdefault((p_hash, n_trees), (params, {}))[1][k] = proba
+        return {key: (json.loads(params), np.concatenate([decode_array(blobs[k]) for k in range(len(folds))]))
+                for key, (params, blobs) in by_candidate.items() if len(blobs) == len(folds)}
+
+    def start_search(self, s_hash, data_hash, model, settings):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO searches (space_hash, data_hash, model, settings, started) '
+                'VALUES (?, ?, ?, ?, ?)', (s_hash, data_hash, model, _json(settings), datetime.now().isoformat()))
+            self._conn.commit()
+
+    def finish_search(self, s_hash, data_hash):
+        with self._lock:
+            self._conn.execute('UPDATE searches SET finished=? WHERE space_hash=? AND data_hash=?',
+                               (datetime.now().isoformat(), s_hash, data_hash))
+            self._conn.commit()
+
+    def history(self, data_hash=None, model=None, metric='accuracy'):
+        """All stored fold evaluations as a DataFrame (params decoded), optionally filtered."""
+        query = 'SELECT * FROM evaluations WHERE metric=?'
+        args = [metric]
+        if data_hash is not None:
+            query += ' AND data_hash=?'
+            args.append(data_hash)
+        if model is not None:
+            query += ' AND model=?'
+            args.append(model)
+        with self._lock:
+            frame = pd.read_sql_query(query, self._conn, params=args)
+        frame['params'] = frame['params'].map(json.loads)
+        return frame
+
+    def best_configs(self, model, metric='accuracy', data_hash=None, top_k=5, rescore=None):
+        """[(params, mean score)] of the best fully scored candidates, best first.
+
+        Candidates come from one dataset: `data_hash`, or else the one most
+        recently evaluated for `model`. Only candidates scored on as many
+        folds as any other count as fully scored. With `rescore` (e.g.
+        tuner.score_proba), stored probabilities are scored with `metric`
+        whatever metric their search used; otherwise only evaluations stored
+        under `metric` count.
+        """
+        if data_hash is None:
+            query = 'SELECT data_hash FROM evaluations WHERE model=?' + (' AND metric=?' if rescore is None else '')
+            with self._lock:
+                row = self._conn.execute(query + ' ORDER BY created DESC LIMIT 1',
+                                         (model, metric) if rescore is None else (model,)).fetchone()
+            if row is None:
+                return []
+            data_hash = row[0]
+        frame = self.history(data_hash, model, metric)
+        if rescore is not None:
+            keys = ['params_hash', 'n_trees', 'train_end', 'test_end']
+            parts = [part for part in (frame[keys + ['params', 'score']], self.rescored(data_hash, model, metric, rescore))
+                     if not part.empty]
+            frame = pd.concat(parts) if parts else frame
+            frame = frame.drop_duplicates(keys, keep='last')
+        if frame.empty:
+            return []
+        grouped = frame.groupby(['params_hash', 'n_trees']).agg(
+            score=('score', 'mean'), n_folds=('score', 'size'), params=('params', 'first'))
+        full = grouped[grouped['n_folds'] == grouped['n_folds'].max()]
+        best = full.sort_values('score', ascending=False).head(top_k)
+        return [(params, float(score)) for params, score in zip(best['params'], best['score'])]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
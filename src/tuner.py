@@ -0,0 +1,869 @@
+"""
+tuner.py
+────────
+Successive-halving hyperparameter search for the XGBoost and Random Forest
+models, scored with the same 5-fold TimeSeriesSplit accuracy as before.
+
+RandomizedSearchCV fits every sampled configuration with its full tree
+count on every fold. Successive halving works in rungs:
+  1. Score many configurations on a small budget: a fraction of their
+     trees (resource='trees') or only the earliest, smallest folds
+     (resource='folds').
+  2. Promote the best 1/eta of them to eta times the budget.
+  3. Repeat until the survivors are scored at full budget on every fold.
+Final-rung scores are therefore directly comparable with
+RandomizedSearchCV's mean_test_score.
+
+Compute is counted in tree-rows (trees fitted x training rows), summed
+over every fit. The report sets it against scoring every sampled
+configuration in full, which is what RandomizedSearchCV would spend on
+the same configurations.
+
+Fits run under one global thread budget. RandomizedSearchCV(n_jobs=-1)
+around estimators that are themselves multithreaded put cores x cores
+threads on the machine. Here a ThreadPlan splits the cores into parallel
+trials x threads per fit, so the product never exceeds the budget. The
+default split depends on the model (FIT_THREADS); `python src/tuner.py
+benchmark` measures any split against the nested -1/-1 setup.
+
+Every fit reads its fold from a FoldCache (fold_cache.py): the training
+rows are views of one float32 array, and XGBoost's quantized training
+matrix is built once per fold rather than once per fit.
+
+Tree counts are not a separate search axis (sweep_trees=True). Each
+configuration is fitted once with the largest n_estimators in the space,
+and every smaller count is scored from the same fit: XGBoost predicts with
+a prefix of its boosting rounds (iteration_range), and a Random Forest
+averages a prefix of its trees. The prefixes are the models a smaller
+n_estimators would have fitted, so the scores are unchanged; four tree
+counts cost one fit instead of four. A configuration's score is that of
+its best tree count.
+
+Every fit yields its test-fold class probabilities, and the score is
+computed from them: accuracy as before, or log-loss / Brier score
+(metric='neg_log_loss' / 'neg_brier_score'; negated, as in sklearn, so
+higher is always better).
+
+With a TrialStore (trial_store.py) every fold score and its probabilities
+are persisted as soon as they exist and looked up before any fit, so
+interrupted searches resume, repeated searches on the same data reuse
+earlier work, and ensemble_tuning.py can blend the stored out-of-fold
+probabilities of both models.
+
+Given a WorkQueue (work_queue.py), both searches enqueue their fits
+instead of running them, and worker processes on any machine sharing the
+queue's volume run them. The search logic is unchanged; only where a fit
+happens differs.
+
+Both searches can be warm-started (warm_start()). The best configurations
+of an earlier search are scored first, and the space is narrowed around
+them, so a re-tune on slightly more data starts where the last one ended.
+
+Both searches are anytime: given a time budget they return the best
+configuration found so far. Every fold fit gets the search's Deadline
+(anytime.py) and stops boosting or growing trees before it would overrun
+it; a fit cut short keeps the tree counts it reached in the trial store
+but leaves its fold unscored. The first fit of a search always runs in
+full, so there is a result to return. Successive halving then reports the
+best of the last rung scored, and TPE falls back to the partial trial with
+the most folds if none finished. Such a result is marked complete=False.
+Fits run by queue workers are not interrupted; the search only stops
+waiting for them, and their results land in the store for the next run.
+Refits (fit_within) take a Deadline as well.
+
+tpe_search() is the model-based alternative. A TPE sampler (tpe.py)
+proposes each configuration from the trials so far, and the budget is
+wall-clock time rather than a trial count. Folds are scored in time
+order. After `prune_after` folds, a trial whose running mean falls more
+than `prune_margin` below the incumbent's mean on the same folds is
+stopped.
+"""
+
+import argparse
+import hashlib
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as ResultTimeout
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+
+from anytime import Deadline, DeadlineCallback, grow_forest
+from fold_cache import DEFAULT_MAX_BIN, FoldCache, xgb_train_params
+from training_scheduler import available_cores
+from tpe import TPESampler
+from trial_store import params_hash, space_hash
+
+XGB_SPACE = {
+    'max_depth': [4, 6, 8, 10, 12],
+    'learning_rate': [0.01, 0.03, 0.05, 0.1, 0.15],
+    'n_estimators': [200, 300, 400, 500],
+    'subsample': [0.6, 0.7, 0.8, 0.9],
+    'colsample_bytree': [0.6, 0.7, 0.8, 0.9],
+    'min_child_weight': [1, 3, 5, 7],
+    'gamma': [0, 0.1, 0.2, 0.3],
+    'reg_alpha': [0, 0.1, 0.5, 1.0],
+    'reg_lambda': [0.5, 1.0, 2.0],
+}
+
+RF_SPACE = {
+    'n_estimators': [200, 300, 400, 500],
+    'max_depth': [10, 15, 20, 25, None],
+    'min_samples_split': [5, 10, 15, 20],
+    'min_samples_leaf': [2, 4, 6, 8],
+    'max_features': ['sqrt', 'log2', None],
+    'bootstrap': [True, False],
+}
+
+SPACES = {'xgboost': XGB_SPACE, 'random_forest': RF_SPACE}
+
+# Fixed settings every candidate shares
+BASE_PARAMS = {
+    'xgboost': {'objective': 'multi:softprob', 'num_class': 3, 'random_state': 42, 'eval_metric': 'mlogloss'},
+    'random_forest': {'random_state': 42},
+}
+
+MIN_TREES = 10
+
+EPS = 1e-15
+
+
+def _neg_log_loss(y, proba):
+    return float(np.mean(np.log(np.clip(proba[np.arange(len(y)), y], EPS, None))))
+
+
+def _neg_brier_score(y, proba):
+    return -float(np.mean(np.sum((proba - np.eye(proba.shape[1])[y]) ** 2, axis=1)))
+
+
+# Fold scores from test-fold probabilities; higher is better for all of them
+METRICS = {
+    'accuracy': lambda y, proba: accuracy_score(y, proba.argmax(axis=1)),
+    'neg_log_loss': _neg_log_loss,
+    'neg_brier_score': _neg_brier_score,
+}
+
+
+def check_metric(metric):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Available: {', '.join(METRICS)}")
+    return metric
+
+
+def score_proba(metric, y, proba):
+    return METRICS[check_metric(metric)](np.asarray(y), proba)
+
+# Threads per fit by default. XGBoost's histogram builder stops scaling after
+# a few threads on a few thousand rows; Random Forest configurations are
+# independent, so RF fits run single-threaded and parallel trials fill the cores.
+FIT_THREADS = {'xgboost': 4, 'random_forest': 1}
+
+
+@dataclass(frozen=True)
+class ThreadPlan:
+    trials: int     # fits running at once
+    threads: int    # threads per fit (-1: every core, i.e. the old nested setup)
+
+    def __str__(self):
+        threads = 'all' if self.threads == -1 else self.threads
+        return f"{self.trials} parallel trial(s) × {threads} thread(s) per fit"
+
+
+def plan_threads(model, cores=None, threads=None, trials=None):
+    """Split a core budget into parallel trials x threads per fit.
+
+    Unset parts are derived: threads from FIT_THREADS (capped at the budget),
+    trials from whatever cores the threads leave.
+    """
+    cores = cores or available_cores()
+    threads = max(1, min(threads or FIT_THREADS[model], cores))
+    trials = max(1, trials or cores // threads)
+    return ThreadPlan(trials, threads)
+
+
+def sample_configs(model, n_configs, seed=42, space=None):
+    """Distinct configurations drawn like RandomizedSearchCV draws them."""
+    return [dict(sorted(p.items())) for p in ParameterSampler(space or SPACES[model], n_configs, random_state=seed)]
+
+
+def time_series_folds(n_rows, n_splits=5):
+    """(train rows, test rows) slices of TimeSeriesSplit; training rows are always a prefix."""
+    folds = []
+    for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(np.empty((n_rows, 1))):
+        # Plain ints, so the boundaries bind as integers in the trial store and work queue
+        folds.append((slice(0, int(train_idx[-1]) + 1), slice(int(test_idx[0]), int(test_idx[-1]) + 1)))
+    return folds
+
+
+def build_model(model, params, n_jobs=None):
+    if model == 'xgboost':
+        return xgb.XGBClassifier(**BASE_PARAMS[model], **params, n_jobs=n_jobs)
+    if model == 'random_forest':
+        return RandomForestClassifier(**BASE_PARAMS[model], **params, n_jobs=n_jobs)
+    raise ValueError(f"Unknown model '{model}'. Available: {', '.join(SPACES)}")
+
+
+def budgeted(deadline):
+    return deadline is not None and deadline.budget is not None
+
+
+def train_booster(params, cache, fold, n_jobs=None, deadline=None):
+    train_params, rounds = xgb_train_params({**BASE_PARAMS['xgboost'], **params}, n_jobs)
+    dtrain = cache.quantile_matrix(fold, train_params.get('max_bin', DEFAULT_MAX_BIN))
+    callbacks = [DeadlineCallback(deadline)] if budgeted(deadline) else None
+    return xgb.train(train_params, dtrain, num_boost_round=rounds, callbacks=callbacks)
+
+
+def fit_score(model, params, cache, fold, n_jobs=None):
+    """Fit on the training rows of one fold (from a FoldCache) and return the test accuracy."""
+    X_test, y_test = cache.test(fold)
+    if model == 'xgboost':
+        booster = train_booster(params, cache, fold, n_jobs)
+        return accuracy_score(y_test, booster.inplace_predict(X_test).argmax(axis=1))
+    fitted = build_model(model, params, n_jobs).fit(*cache.train(fold))
+    return accuracy_score(y_test, fitted.predict(X_test))
+
+
+def predict_sweep(model, params, cache, fold, tree_counts, n_jobs=None, deadline=None):
+    """{tree count: test-fold probabilities} for every count in `tree_counts`, from one fit at the largest.
+
+    With a time-budgeted Deadline the fit may stop early; counts beyond the
+    trees it built are then missing.
+    """
+    X_test = cache.test(fold)[0]
+    params = {**params, 'n_estimators': max(tree_counts)}
+    if model == 'xgboost':
+        booster = train_booster(params, cache, fold, n_jobs, deadline)
+        built = booster.num_boosted_rounds()
+        return {n: booster.inplace_predict(X_test, iteration_range=(0, n)) for n in tree_counts if n <= built}
+    if budgeted(deadline):
+        fitted, _ = grow_forest({**BASE_PARAMS[model], **params}, *cache.train(fold), deadline, n_jobs=n_jobs)
+    else:
+        fitted = build_model(model, params, n_jobs).fit(*cache.train(fold))
+    # RandomForestClassifier.predict_proba is the mean of the tree probabilities
+    total = np.zeros((len(X_test), len(fitted.classes_)))
+    probas = {}
+    for k, tree in enumerate(fitted.estimators_, 1):
+        total += tree.predict_proba(X_test)
+        if k in tree_counts:
+            probas[k] = total / k
+    return probas
+
+
+def sweep_space(space):
+    """`space` without its n_estimators axis, and the tree counts a fit at the largest one covers."""
+    return {k: v for k, v in space.items() if k != 'n_estimators'}, sorted(space['n_estimators'])
+
+
+# ── Warm start ─────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class WarmStart:
+    seeds: list     # configurations to score first, best first
+    space: dict     # the search space narrowed around them
+    dropped: list = ()  # seeds left out for values (or axes) outside the space
+
+
+def narrow_space(space, seeds, margin=1):
+    """`space` cut down to the values the seeds use.
+
+    Numeric axes (ordered, as in tpe.py) keep the span of the seeds' values
+    plus `margin` neighbours on each side; other axes keep exactly the
+    values the seeds use. Axes no seed sets are left whole.
+    """
+    narrowed = {}
+    for name, values in space.items():
+        used = sorted({values.index(seed[name]) for seed in seeds if name in seed and seed[name] in values})
+        if not used:
+            narrowed[name] = list(values)
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            narrowed[name] = list(values[max(0, used[0] - margin):used[-1] + margin + 1])
+        else:
+            narrowed[name] = [values[i] for i in used]
+    return narrowed
+
+
+def warm_start(model, seeds, space=None, top_k=None, margin=1, sweep_trees=True):
+    """The first `top_k` seeds that fit `model`'s space, and the space narrowed around them.
+
+    With sweep_trees, seeds differing only in n_estimators count once, since
+    one fit scores them all. Without any fitting seed the space is returned
+    unchanged. Seeds that do not fit are returned as `dropped`.
+    """
+    space = space or SPACES[model]
+    valid, seen, dropped = [], set(), []
+    for seed in seeds:
+        seed = dict(sorted(seed.items()))
+        if set(seed) != set(space) or not all(seed[k] in space[k] for k in space):
+            dropped.append(seed)
+            continue
+        key = params_hash(model, {k: v for k, v in seed.items() if not (sweep_trees and k == 'n_estimators')})
+        if key not in seen:
+            seen.add(key)
+            valid.append(seed)
+    valid = valid[:top_k]
+    return WarmStart(valid, narrow_space(space, valid, margin) if valid else dict(space), dropped)
+
+
+# ── Successive halving ─────────────────────────────────────────────────────
+
+def seed_configs(seeds, space, configs=()):
+    """`seeds` restricted to the axes of `space`, then `configs`, without repeats."""
+    merged = []
+    for config in [{k: v for k, v in sorted(s.items()) if k in space} for s in seeds or []] + list(configs):
+        if config not in merged:
+            merged.append(config)
+    return merged
+
+
+def halving_schedule(n_configs, eta=3, min_budget=1/9):
+    """[(configurations scored, budget fraction)] per rung, ending at budget 1."""
+    n_rungs = int(round(math.log(1 / min_budget, eta))) + 1 if min_budget < 1 else 1
+    return [(max(1, math.ceil(n_configs / eta ** rung)), min(1.0, min_budget * eta ** rung))
+            for rung in range(n_rungs)]
+
+
+def rung_plan(params, budget, resource, folds):
+    """Folds and tree count that one configuration is scored with at `budget`."""
+    if resource == 'trees':
+        return folds, max(MIN_TREES, int(round(params['n_estimators'] * budget)))
+    if resource == 'folds':
+        return folds[:max(1, int(round(len(folds) * budget)))], params['n_estimators']
+    raise ValueError(f"Unknown resource '{resource}'. Use trees or folds")
+
+
+def fold_cost(n_trees, folds):
+    return n_trees * sum(train.stop - train.start for train, _ in folds)
+
+
+def candidate_cost(config, tree_counts, folds):
+    """Tree-rows to score `config` in full at every swept count (or its own n_estimators), one fit each."""
+    return sum(fold_cost(n, folds) for n in tree_counts or [config['n_estimators']])
+
+
+def best_tree_count(fold_scores):
+    """(tree count, its fold scores) with the best mean; ties go to the fewest trees."""
+    counts = sorted(fold_scores[0])
+    by_count = {n: [scores[n] for scores in fold_scores] for n in counts}
+    n_best = max(counts, key=lambda n: np.mean(by_count[n]))
+    return n_best, by_count[n_best]
+
+
+class Evaluator:
+    """Scores (configuration, tree counts, fold) jobs, consulting and filling a trial store.
+
+    Scores come back as {tree count: score}. Counts missing from the store
+    are scored together by one fit at the largest of them, in this process
+    or, with a WorkQueue, by whichever worker claims the job. Stored
+    probabilities are rescored with `metric`; scores stored without them
+    are used as they are. Given a Deadline, a fit it cuts short (or a queued
+    one it outlasts) comes back as None.
+    """
+
+    def __init__(self, model, X, y, plan, store=None, data_hash=None, s_hash=None, queue=None,
+                 metric='accuracy'):
+        self.model = model
+        self.metric = check_metric(metric)
+        self.cache = FoldCache(X, y)
+        self.plan = plan
+        self.store = store
+        self.data_hash = data_hash or array_hash(X, y)
+        self.s_hash = s_hash
+        self.queue = queue
+        if queue is not None:
+            queue.publish(self.data_hash, self.cache.X, self.cache.y)
+        self.cost = 0       # tree-rows fitted
+        self.fits = 0
+        self.reused = 0     # fold scores served by the store
+        self.scored = 0     # folds fully scored through score()
+        self._labelled = set()
+        self._lock = threading.Lock()
+
+    def _lookup(self, p_hash, tree_counts, fold):
+        if self.store is None:
+            return {}
+        found = {}
+        y_test = self.cache.test(fold)[1]
+        for n_trees in tree_counts:
+            proba = self.store.lookup_proba(self.data_hash, self.model, p_hash, n_trees, fold)
+            if proba is not None:
+                found[n_trees] = score_proba(self.metric, y_test, proba)
+                continue
+            score = self.store.lookup(self.data_hash, self.model, p_hash, n_trees, fold, self.metric)
+            if score is not None:
+                found[n_trees] = score
+        with self._lock:
+            self.reused += len(found)
+        return found
+
+    def _record(self, config, p_hash, fold, probas, seconds):
+        """Scores of freshly predicted probabilities, persisted with them."""
+        y_test = self.cache.test(fold)[1]
+        scores = {n: score_proba(self.metric, y_test, proba) for n, proba in probas.items()}
+        if self.store is not None and (fold[0].stop, fold[1].stop) not in self._labelled:
+            self.store.record_labels(self.data_hash, fold, y_test)
+            self._labelled.add((fold[0].stop, fold[1].stop))
+        if self.store is not None:
+            for n_trees, score in scores.items():
+                params = {**config, 'n_estimators': n_trees}
+                self.store.record_proba(self.data_hash, self.model, p_hash, params, n_trees, fold, probas[n_trees])
+                self.store.record(self.data_hash, self.model, p_hash, params, n_trees, fold, score,
+                                  metric=self.metric, s_hash=self.s_hash, seconds=seconds)
+        return scores
+
+    def _run(self, config, p_hash, tree_counts, fold, found, deadline=None):
+        start = time.perf_counter()
+        probas = predict_sweep(self.model, config, self.cache, fold, tree_counts, self.plan.threads, deadline)
+        scores = self._record(config, p_hash, fold, probas, time.perf_counter() - start)
+        # The counts a cut-short fit reached are stored, but the fold is not finished
+        return {**found, **scores} if len(scores) == len(tree_counts) else None
+
+    def _enqueue(self, config, p_hash, tree_counts, fold, found):
+        """Future for the scores of a fit run by a queue worker; recorded here once it finishes."""
+        done = Future()
+
+        def finish(job):
+            try:
+                probas, seconds = job.result()
+                scores = self._record(config, p_hash, fold, probas, seconds)
+            except Exception as exc:
+                done.set_exception(exc)
+                return
+            done.set_result({**found, **scores})
+
+        self.queue.submit(self.data_hash, self.model, config, tree_counts, fold,
+                          self.plan.threads).add_done_callback(finish)
+        return done
+
+    def _count_fit(self, n_trees, fold):
+        with self._lock:
+            self.fits += 1
+            self.cost += fold_cost(n_trees, [fold])
+
+    def score(self, config, tree_counts, fold, deadline=None):
+        """Fold scores per tree count, from the store or from a fit in the calling thread."""
+        p_hash = params_hash(self.model, config, BASE_PARAMS[self.model])
+        found = self._lookup(p_hash, tree_counts, fold)
+        missing = [n for n in tree_counts if n not in found]
+        if missing:
+            self._count_fit(max(missing), fold)
+            if self.queue is None:
+                found = self._run(config, p_hash, missing, fold, found, deadline)
+            else:
+                job = self._enqueue(config, p_hash, missing, fold, found)
+                try:
+                    found = job.result(timeout=max(deadline.remaining(), 0) if budgeted(deadline) else None)
+                except ResultTimeout:
+                    found = None
+        if found is not None:
+            with self._lock:
+                self.scored += 1
+        return found
+
+    def submit(self, pool, config, tree_counts, fold, deadline=None):
+        """Future for the fold scores per tree count; already resolved when the store has them all."""
+        p_hash = params_hash(self.model, config, BASE_PARAMS[self.model])
+        found = self._lookup(p_hash, tree_counts, fold)
+        missing = [n for n in tree_counts if n not in found]
+        if not missing:
+            done = Future()
+            done.set_result(found)
+            return done
+        self._count_fit(max(missing), fold)
+        if self.queue is not None:
+            return self._enqueue(config, p_hash, missing, fold, found)
+        return pool.submit(self._run, config, p_hash, missing, fold, found, deadline)
+
+
+def array_hash(X, y):
+    digest = hashlib.sha256(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    model: str
+    best_params: dict
+    best_score: float
+    best_std: float
+    trials: pd.DataFrame    # one row per (configuration, rung), at its best tree count
+    cost: int               # tree-rows spent
+    full_cost: int          # tree-rows to score every configuration tried in full (timed-out trials: folds reached)
+    seconds: float
+    fits: int = 0           # fold fits actually run
+    reused: int = 0         # fold scores taken from the trial store
+    metric: str = 'accuracy'
+    complete: bool = True   # False when the time budget cut the search short of its full-budget scores
+
+    @property
+    def compute_saved(self):
+        return 1 - self.cost / self.full_cost
+
+    def top(self, n=5):
+        """Best configurations at the largest budget reached."""
+        final = self.trials[self.trials['budget'] == self.trials['budget'].max()]
+        return final.sort_values('score', ascending=False).head(n)
+
+
+def successive_halving(model, X, y, n_configs=81, eta=3, min_budget=1/9, resource='trees',
+                       n_splits=5, plan=None, seed=42, space=None, store=None, data_hash=None,
+                       sweep_trees=True, queue=None, metric='accuracy', seeds=None, time_budget=None,
+                       verbose=True):
+    """Search `model`'s space by successive halving; min_budget=1 is plain random search.
+
+    With sweep_trees, `n_configs` configurations are sampled without
+    n_estimators and each is scored at every tree count of the space.
+    With a TrialStore, finished fold scores are reused and new ones persisted
+    immediately; `data_hash` should identify X and y (hashed from the arrays if None).
+    With a WorkQueue, every rung's fits are enqueued at once for the workers.
+    `seeds` (e.g. from warm_start()) take the place of the first sampled configurations.
+    With `time_budget` seconds, fits stop at the deadline (except those of
+    the first configuration), a rung stops waiting for the rest once it is
+    reached, no further rung starts, and the best of the last rung scored is
+    returned.
+    """
+    start = time.perf_counter()
+    deadline = Deadline(time_budget)
+    plan = plan or plan_threads(model)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    space = space or SPACES[model]
+    if sweep_trees:
+        sample_space, tree_counts = sweep_space(space)
+        configs = [{**c, 'n_estimators': tree_counts[-1]}
+                   for c in seed_configs(seeds, sample_space, sample_configs(model, n_configs, seed, sample_space))]
+    else:
+        tree_counts = []
+        configs = seed_configs(seeds, space, sample_configs(model, n_configs, seed, space))
+    configs = configs[:n_configs]
+    folds = time_series_folds(len(X), n_splits)
+    schedule = halving_schedule(len(configs), eta, min_budget)
+
+    settings = {'n_configs': n_configs, 'eta': eta, 'min_budget': min_budget, 'resource': resource,
+                'n_splits': n_splits, 'seed': seed, 'sweep_trees': sweep_trees, 'metric': metric,
+                'seeds': seeds or []}
+    s_hash = space_hash(model, space, settings)
+    evaluator = Evaluator(model, X, y, plan, store, data_hash, s_hash, queue, metric)
+    if store is not None:
+        store.start_search(s_hash, evaluator.data_hash, model, settings)
+
+    alive = list(range(len(configs)))
+    rows, cut = [], False
+    # Both estimators release the GIL while fitting, so threads share X without copies
+    with ThreadPoolExecutor(max_workers=plan.trials) as pool:
+        for rung, (keep, budget) in enumerate(schedule):
+            rung_start = time.perf_counter()
+            if rung and deadline.expired():
+                if verbose:
+                    print(f"  Time budget spent: stopping after rung {rung}/{len(schedule)}")
+                break
+            survivors = alive[:keep]
+            jobs = {}
+            for k, cid in enumerate(survivors):
+                rung_folds, n_trees = rung_plan(configs[cid], budget, resource, folds)
+                # Every swept count up to the rung's budget comes with the same fit
+                counts = sorted({n_trees, *(n for n in tree_counts if n < n_trees)})
+                # The search's first configuration is fitted in full, so there is always a result
+                fit_deadline = None if rung == 0 and k == 0 else deadline
+                jobs[cid] = (rung_folds, [evaluator.submit(pool, configs[cid], counts, fold, fit_deadline)
+                                          for fold in rung_folds])
+            scores = {}
+            for cid, (rung_folds, futures) in jobs.items():
+                if scores and budgeted(deadline):
+                    wait(futures, timeout=max(deadline.remaining(), 0))
+                if scores and deadline.expired() and not all(f.done() for f in futures):
+                    cut = True
+                    # Queued fits run on regardless and land in the trial store for the next search
+                    if queue is None:
+                        for future in futures:
+                            future.cancel()
+                    continue
+                results = [future.result() for future in futures]
+                if any(result is None for result in results):
+                    cut = True
+                    continue
+                n_best, fold_scores = best_tree_count(results)
+                scores[cid] = float(np.mean(fold_scores))
+                params = {**configs[cid], 'n_estimators': n_best} if sweep_trees else configs[cid]
+                rows.append({'config': cid, 'rung': rung, 'budget': budget, 'n_trees': n_best,
+                             'n_folds': len(rung_folds), 'score': scores[cid], 'std': float(np.std(fold_scores)),
+                             'params': params})
+            if not scores:
+                # Every fit of the rung was cut short; the previous rung's ranking stands
+                if verbose:
+                    print(f"  Time budget spent: rung {rung + 1}/{len(schedule)} scored no configuration")
+                break
+            last_rung = rung
+            alive = sorted((cid for cid in survivors if cid in scores), key=lambda cid: -scores[cid])
+            if verbose:
+                print(f"  Rung {rung + 1}/{len(schedule)}: {len(alive):3d} configs × {budget:4.0%} budget "
+                      f"→ best {scores[alive[0]]:.4f}  ({time.perf_counter() - rung_start:.1f}s)")
+
+    if store is not None:
+        store.finish_search(s_hash, evaluator.data_hash)
+    trials = pd.DataFrame(rows)
+    best = trials[(trials['config'] == alive[0]) & (trials['rung'] == last_rung)].iloc[0]
+    # Configurations the time budget kept from being scored at all saved nothing
+    full_cost = sum(candidate_cost(configs[cid], tree_counts, folds) for cid in trials['config'].unique())
+    return SearchResult(model, best['params'], best['score'], best['std'], trials,
+                        evaluator.cost, full_cost, time.perf_counter() - start,
+                        evaluator.fits, evaluator.reused, metric,
+                        last_rung == len(schedule) - 1 and not cut)
+
+
+# ── TPE with per-fold pruning ──────────────────────────────────────────────
+
+class Incumbent:
+    """Fold scores of the best complete trial so far, shared by trial threads."""
+
+    def __init__(self):
+        self.fold_scores = None
+        self._lock = threading.Lock()
+
+    def offer(self, fold_scores):
+        with self._lock:
+            if self.fold_scores is None or np.mean(fold_scores) > np.mean(self.fold_scores):
+                self.fold_scores = list(fold_scores)
+
+    def should_prune(self, fold_scores, margin):
+        with self._lock:
+            if self.fold_scores is None:
+                return False
+            k = len(fold_scores)
+            return np.mean(fold_scores) < np.mean(self.fold_scores[:k]) - margin
+
+
+def run_trial(evaluator, config, folds, incumbent, deadline, prune_after=2, prune_margin=0.02, tree_counts=None):
+    """Score one configuration fold by fold; returns (best tree count, its fold scores, status).
+
+    Without `tree_counts` the configuration is scored at its own n_estimators.
+    Pruning compares the running mean of the best tree count so far.
+    `deadline` (a Deadline) also stops the fold fits; until the evaluator has
+    scored any fold, fits run in full so the search has something to return.
+    """
+    tree_counts = tree_counts or [config['n_estimators']]
+    by_fold = []
+    n_best, fold_scores = tree_counts[-1], []
+    for k, fold in enumerate(folds):
+        if deadline.expired():
+            return n_best, fold_scores, 'timeout'
+        scores = evaluator.score(config, tree_counts, fold, deadline if evaluator.scored else None)
+        if scores is None:
+            return n_best, fold_scores, 'timeout'
+        by_fold.append(scores)
+        n_best, fold_scores = best_tree_count(by_fold)
+        if prune_after and prune_after <= k + 1 < len(folds) and incumbent.should_prune(fold_scores, prune_margin):
+            return n_best, fold_scores, 'pruned'
+    incumbent.offer(fold_scores)
+    return n_best, fold_scores, 'complete'
+
+
+def tpe_search(model, X, y, time_budget=900, max_trials=None, n_splits=5, plan=None, seed=42, space=None,
+               prune_after=2, prune_margin=0.02, n_startup=10, store=None, data_hash=None, sweep_trees=True,
+               queue=None, metric='accuracy', seeds=None, verbose=True):
+    """Search `model`'s space with TPE until `time_budget` seconds (or `max_trials`) are used up.
+
+    prune_after=None scores every fold of every trial. Trials cut off by the
+    deadline keep their finished folds in the store for the next run. With
+    sweep_trees, the sampler never proposes n_estimators; every trial is
+    scored at all of the space's tree counts. With a WorkQueue, `plan.trials`
+    trials are kept in flight and their folds run on the queue's workers.
+    `seeds` are proposed before the sampler, which then skips its random
+    startup and goes straight to model-based proposals.
+    If no trial completes in time, the partial trial with the most folds
+    (best score among those) is returned with complete=False.
+    """
+    start = time.perf_counter()
+    deadline = Deadline(time_budget)
+    plan = plan or plan_threads(model)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    space = space or SPACES[model]
+    sample_space, tree_counts = sweep_space(space) if sweep_trees else (space, None)
+    folds = time_series_folds(len(X), n_splits)
+
+    settings = {'search': 'tpe', 'n_splits': n_splits, 'seed': seed, 'prune_after': prune_after,
+                'prune_margin': prune_margin, 'n_startup': n_startup, 'sweep_trees': sweep_trees,
+                'metric': metric, 'seeds': seeds or []}
+    s_hash = space_hash(model, space, settings)
+    evaluator = Evaluator(model, X, y, plan, store, data_hash, s_hash, queue, metric)
+    if store is not None:
+        store.start_search(s_hash, evaluator.data_hash, model, settings)
+
+    pending = seed_configs(seeds, sample_space)
+    sampler = TPESampler(sample_space, seed=seed, n_startup=len(pending) or n_startup)
+    incumbent = Incumbent()
+    rows, running = [], {}
+
+    def can_start():
+        return not deadline.expired() and (max_trials is None or len(rows) + len(running) < max_trials)
+
+    with ThreadPoolExecutor(max_workers=plan.trials) as pool:
+        while True:
+            while len(running) < plan.trials and can_start():
+                if pending:
+                    config = pending.pop(0)
+                else:
+                    config = dict(sorted(sampler.suggest(exclude=[sampler.key(c) for c, _ in running.values()]).items()))
+                future = pool.submit(run_trial, evaluator, config, folds, incumbent, deadline,
+                                     prune_after, prune_margin, tree_counts)
+                running[future] = (config, len(rows) + len(running))
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                config, trial_id = running.pop(future)
+                n_best, fold_scores, status = future.result()
+                if not fold_scores:
+                    continue
+                score = float(np.mean(fold_scores))
+                # Pruned and timed-out trials still teach the sampler with their partial mean
+                sampler.observe(config, score)
+                rows.append({'config': trial_id, 'rung': 0, 'budget': len(fold_scores) / len(folds),
+                             'n_trees': n_best, 'n_folds': len(fold_scores), 'score': score,
+                             'std': float(np.std(fold_scores)), 'status': status,
+                             'params': {**config, 'n_estimators': n_best}})
+                if verbose:
+                    best = incumbent.fold_scores
+                    print(f"  Trial {len(rows):3d} [{status:8s}] {len(fold_scores)}/{len(folds)} folds "
+                          f"{score:.4f}  best {np.mean(best) if best else float('nan'):.4f}  "
+                          f"({time.perf_counter() - start:6.1f}s)")
+
+    if store is not None:
+        store.finish_search(s_hash, evaluator.data_hash)
+    trials = pd.DataFrame(rows)
+    if trials.empty:
+        raise RuntimeError("No trial scored a single fold within the time budget; raise --time-budget")
+    complete = trials[trials['status'] == 'complete']
+    if complete.empty:
+        # Partial means are only comparable over the same folds
+        best = trials.sort_values(['n_folds', 'score'], ascending=False).iloc[0]
+    else:
+        best = complete.sort_values('score', ascending=False).iloc[0]
+    # Pruning saves a trial's remaining folds; a timeout only leaves them undone, which is no saving
+    full_cost = sum(candidate_cost(row.params, tree_counts, folds if row.status != 'timeout' else folds[:row.n_folds])
+                    for row in trials.itertuples())
+    return SearchResult(model, best['params'], best['score'], best['std'], trials,
+                        evaluator.cost, full_cost, time.perf_counter() - start,
+                        evaluator.fits, evaluator.reused, metric, not complete.empty)
+
+
+def fit_within(model, params, X, y, n_jobs=None, deadline=None):
+    """`model` with `params` fitted on X, y; with a time-budgeted Deadline it stops in time.
+
+    A fit cut short keeps the trees grown so far, and its n_estimators is
+    then the number actually built.
+    """
+    if not budgeted(deadline):
+        return build_model(model, params, n_jobs).fit(X, y)
+    if model == 'random_forest':
+        return grow_forest(params, X, y, deadline, n_jobs=n_jobs)[0]
+    booster = build_model(model, params, n_jobs)
+    booster.set_params(callbacks=[DeadlineCallback(deadline)])
+    booster.fit(X, y)
+    # The callback is not part of the model; the saved parameters describe the booster as built
+    return booster.set_params(callbacks=None, n_estimators=booster.get_booster().num_boosted_rounds())
+
+
+def refit_best(result, X, y, n_jobs=None, deadline=None):
+    """The winning configuration refitted on all rows, as RandomizedSearchCV(refit=True) does."""
+    return fit_within(result.model, result.best_params, X, y, n_jobs, deadline)
+
+
+def print_search_report(result, baseline=None):
+    n_configs = result.trials['config'].nunique()
+    if result.metric == 'accuracy':
+        print(f"\n✓ Best CV Score: {result.best_score:.4f} ({result.best_score*100:.2f}%)  ±{result.best_std:.4f}")
+    else:
+        print(f"\n✓ Best CV {result.metric}: {result.best_score:.4f}  ±{result.best_std:.4f}")
+    print(f"  {n_configs} configurations, {len(result.trials)} evaluations in {result.seconds:.1f}s")
+    if not result.complete:
+        print("  ⚠ Time budget ran out before the search finished; this is the best configuration so far")
+    if 'status' in result.trials:
+        counts = result.trials['status'].value_counts()
+        print(f"  {counts.get('complete', 0)} complete, {counts.get('pruned', 0)} pruned early, "
+              f"{counts.get('timeout', 0)} cut off by the time budget")
+    if result.reused:
+        print(f"  Trial store: {result.reused} fold score(s) reused, {result.fits} fitted")
+    print(f"  Compute: {result.cost / 1e6:.1f}M tree-rows vs {result.full_cost / 1e6:.1f}M to score every "
+          f"configuration in full ({result.compute_saved:.0%} saved)")
+    if baseline is not None:
+        print(f"  Random search ({baseline.trials['config'].nunique()} configs in full): "
+              f"best {baseline.best_score:.4f}, {baseline.cost / 1e6:.1f}M tree-rows, {baseline.seconds:.1f}s "
+              f"→ the search used {result.cost / baseline.cost:.0%} of the compute, "
+              f"{result.seconds / baseline.seconds:.0%} of the time")
+
+
+# ── Thread-plan benchmark ──────────────────────────────────────────────────
+
+def benchmark_plans(model, X, y, plans, n_configs=4, n_trees=100, n_splits=5, seed=42):
+    """Wall time of the same batch of (configuration, fold) fits under each plan.
+
+    Returns [(plan, seconds, fits per minute)]; the batch uses a fixed tree count so
+    every plan does identical work.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    configs = [{**c, 'n_estimators': n_trees} for c in sample_configs(model, n_configs, seed)]
+    folds = time_series_folds(len(X), n_splits)
+    n_fits = len(configs) * len(folds)
+
+    results = []
+    for plan in plans:
+        start = time.perf_counter()
+        # A fresh cache per plan, so every plan pays for its own quantile matrices
+        cache = FoldCache(X, y)
+        with ThreadPoolExecutor(max_workers=plan.trials) as pool:
+            futures = [pool.submit(fit_score, model, params, cache, fold, plan.threads)
+                       for params in configs for fold in folds]
+            for future in futures:
+                future.result()
+        seconds = time.perf_counter() - start
+        results.append((plan, seconds, n_fits / seconds * 60))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuner utilities")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('benchmark', help="compare thread plans against nested -1/-1 parallelism")
+    bench.add_argument('--models', nargs='+', default=list(SPACES), choices=list(SPACES))
+    bench.add_argument('--cores', type=int, default=None, help="core budget (default: all available)")
+    bench.add_argument('--configs', type=int, default=4)
+    bench.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    from dataset import load_dataset
+
+    dataset = load_dataset('data/features.csv')
+    cores = args.cores or available_cores()
+
+    print("\n" + "="*80)
+    print(f"TUNING THREAD PLANS ({cores} cores)")
+    print("="*80)
+
+    for model in args.models:
+        plans = [ThreadPlan(cores, -1), plan_threads(model, cores)]
+        plans += [ThreadPlan(cores // t, t) for t in (1, 2, 4, 8)
+                  if t <= cores and ThreadPlan(cores // t, t) not in plans]
+        print(f"\n{model} ({args.configs} configs × 5 folds, {args.trees} trees):")
+        results = benchmark_plans(model, dataset.X, dataset.y, plans, args.configs, args.trees)
+        nested_rate = results[0][2]
+        for plan, seconds, rate in results:
+            label = 'nested -1/-1' if plan.threads == -1 else ('default' if plan == plans[1] else '')
+            print(f"  {str(plan):42s} {seconds:7.1f}s  {rate:6.1f} fits/min  "
+                  f"{rate / nested_rate:5.2f}x  {label}")
+
+    print("\n" + "="*80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+walk_forward.py
+───────────────
+Gameweek-by-gameweek retraining of the XGBoost model.
+
+Instead of refitting from scratch every week, each step continues boosting
+the previous booster for a few extra rounds on the most recent matches. A
+full (early-stopped) refit is triggered when
+
+  * the features of matches seen since the last refit drift away from the
+    refit's training data (mean population stability index), or
+  * the rolling log-loss on those matches degrades past the validation
+    log-loss measured at the last refit, or
+  * too many incremental steps have been stacked on one refit.
+
+Every booster is saved as a version in a chain (models/walk_forward/), with
+chain.json recording its parent, the rows it was trained through, why it
+was built and how long it took. A rerun appends its versions to the chain
+already in the directory, starting from a new initial refit, so earlier
+boosters and their log are never overwritten. Each gameweek is scored by
+the model that existed *before* it, so the reported accuracy is genuinely
+out-of-sample.
+
+Usage:
+  python src/walk_forward.py                     # walk the 20% test period
+  python src/walk_forward.py --compare-full      # also time a full refit per step
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import log_loss
+
+from dataset import load_dataset
+from train_models import XGB_PARAMS, fit_xgboost
+
+CHAIN_DIR = 'models/walk_forward'
+PSI_BINS = 10
+MIN_DRIFT_ROWS = 100
+
+
+def gameweeks(dates, start):
+    """Row slices of consecutive calendar weeks from row `start` onwards."""
+    weeks = dates[start:].to_period('W').asi8
+    bounds = np.flatnonzero(np.diff(weeks)) + 1
+    edges = [0] + bounds.tolist() + [len(weeks)]
+    return [slice(start + a, start + b) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def population_stability(reference, recent, bins=PSI_BINS):
+    """Mean PSI across features of `recent` rows against `reference` rows."""
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    psi = []
+    for j in range(reference.shape[1]):
+        edges = np.unique(np.quantile(reference[:, j], quantiles))
+        ref_share = np.bincount(np.searchsorted(edges, reference[:, j], side='right'),
+                                minlength=len(edges) + 1) / len(reference)
+        new_share = np.bincount(np.searchsorted(edges, recent[:, j], side='right'),
+                                minlength=len(edges) + 1) / len(recent)
+        ref_share = np.clip(ref_share, 1e-4, None)
+        new_share = np.clip(new_share, 1e-4, None)
+        psi.append(np.sum((new_share - ref_share) * np.log(new_share / ref_share)))
+    return float(np.mean(psi))
+
+
+def continue_boosting(model, X, y, extra_rounds, n_jobs=None):
+    """New XGBClassifier holding `model`'s trees plus `extra_rounds` fitted on X, y."""
+    params = {**XGB_PARAMS, 'n_estimators': extra_rounds, 'n_jobs': n_jobs}
+    updated = xgb.XGBClassifier(**params)
+    updated.fit(X, y, xgb_model=model.get_booster(), verbose=False)
+    return updated
+
+
+class BoosterChain:
+    """Versioned boosters on disk plus a JSON log describing each one.
+
+    Opening a directory that already holds a chain continues it; one with
+    boosters chain.json does not list is refused rather than overwritten.
+    """
+
+    def __init__(self, out_dir=CHAIN_DIR):
+        self.out_dir = out_dir
+        self.versions = []
+        os.makedirs(out_dir, exist_ok=True)
+        chain_path = os.path.join(out_dir, 'chain.json')
+        if os.path.exists(chain_path):
+            with open(chain_path) as f:
+                self.versions = json.load(f)
+        listed = {os.path.basename(v['path']) for v in self.versions}
+        unlisted = sorted(name for name in os.listdir(out_dir) if name.endswith('.ubj') and name not in listed)
+        if unlisted:
+            raise FileExistsError(f"{out_dir} holds boosters chain.json does not list "
+                                  f"({', '.join(unlisted[:3])}{', ...' if len(unlisted) > 3 else ''}); "
+                                  f"use another directory")
+
+    def add(self, model, **info):
+        version = self.versions[-1]['version'] + 1 if self.versions else 1
+        path = os.path.join(self.out_dir, f'booster_v{version:03d}.ubj')
+        model.get_booster().save_model(path)
+        entry = {
+            'version': version,
+            'parent': self.versions[-1]['version'] if info['kind'] == 'incremental' else None,
+            'path': path,
+            'n_trees': model.get_booster().num_boosted_rounds(),
+            **info,
+        }
+        self.versions.append(entry)
+        self.save()
+        return entry
+
+    def save(self):
+        tmp_path = os.path.join(self.out_dir, 'chain.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.versions, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.out_dir, 'chain.json'))
+
+
+def current_ref_loss(chain):
+    """Validation log-loss of the latest full refit."""
+    return next(v['val_logloss'] for v in reversed(chain.versions) if v['kind'] == 'full')
+
+
+def walk_forward(dataset, start_fraction=0.8, extra_rounds=20, window=380,
+                 drift_threshold=0.1, degradation_tolerance=0.05, max_incremental=8,
+                 compare_full=False, max_steps=None, n_jobs=None, out_dir=CHAIN_DIR):
+    """Walk through the gameweeks after `start_fraction` of the data.
+
+    Returns (chain entries added by this walk, per-step records).
+    """
+    start = dataset.split_index(1 - start_fraction)
+    weeks = gameweeks(dataset.dates, start)
+    if max_steps:
+        weeks = weeks[:max_steps]
+    chain = BoosterChain(out_dir)
+    first_new = len(chain.versions)
+
+    def full_refit(end, reason):
+        t0 = time.perf_counter()
+        model, info = fit_xgboost(dataset.frame(slice(0, end)), dataset.target(slice(0, end)), n_jobs=n_jobs)
+        seconds = time.perf_counter() - t0
+        entry = chain.add(model, kind='full', reason=reason, trained_through=end,
+                          seconds=round(seconds, 3), val_logloss=info['val_logloss'])
+        return model, entry, seconds
+
+    model, current, _ = full_refit(start, 'initial')
+    refit_at = start
+    incremental_steps = 0
+    recent_proba = []
+    steps = []
+
+    for week in weeks:
+        # Score the gameweek with the model that existed before it was played
+        X_week = dataset.frame(week)
+        y_week = dataset.y[week]
+        proba = model.predict_proba(X_week)
+        recent_proba.append(proba)
+        record = {
+            'week_start': str(dataset.dates[week.start].date()),
+            'matches': week.stop - week.start,
+            'version': current['version'],
+            'correct': int((proba.argmax(axis=1) == y_week).sum()),
+        }
+
+        # Decide how to absorb the new matches
+        seen = slice(refit_at, week.stop)
+        n_seen = week.stop - refit_at
+        reason = None
+        if n_seen >= MIN_DRIFT_ROWS:
+            drift = population_stability(dataset.X[:refit_at], dataset.X[seen])
+            rolling_loss = log_loss(dataset.y[seen], np.vstack(recent_proba), labels=[0, 1, 2])
+            record.update(drift=round(drift, 4), rolling_logloss=round(rolling_loss, 4))
+            if drift > drift_threshold:
+                reason = f'drift (PSI {drift:.3f})'
+            elif rolling_loss > current_ref_loss(chain) * (1 + degradation_tolerance):
+                reason = f'degradation (log-loss {rolling_loss:.3f})'
+        if reason is None and incremental_steps >= max_incremental:
+            reason = f'{incremental_steps} incremental steps'
+
+        if reason:
+            model, current, seconds = full_refit(week.stop, reason)
+            refit_at = week.stop
+            incremental_steps = 0
+            recent_proba = []
+            record.update(action='full', seconds=seconds, reason=reason)
+        else:
+            rows = slice(max(0, week.stop - window), week.stop)
+            t0 = time.perf_counter()
+            model = continue_boosting(model, dataset.frame(rows), dataset.target(rows),
+                                      extra_rounds, n_jobs=n_jobs)
+            seconds = time.perf_counter() - t0
+            current = chain.add(model, kind='incremental', reason='new gameweek',
+                                trained_through=week.stop, seconds=round(seconds, 3))
+            incremental_steps += 1
+            record.update(action='incremental', seconds=seconds)
+
+        if compare_full:
+            t0 = time.perf_counter()
+            fit_xgboost(dataset.frame(slice(0, week.stop)), dataset.target(slice(0, week.stop)), n_jobs=n_jobs)
+            record['full_fit_seconds'] = time.perf_counter() - t0
+
+        steps.append(record)
+        print(f"  {record['week_start']}  {record['matches']:3d} matches  "
+              f"v{record['version']:03d} {record['correct']:3d} correct  "
+              f"→ {record['action']:11s} {record['seconds']:6.2f}s"
+              + (f"  ({record['reason']})" if record['action'] == 'full' else ''))
+
+    return chain.versions[first_new:], steps
+
+
+def print_latency_report(versions, steps):
+    print("\n" + "="*80)
+    print("WALK-FORWARD SUMMARY")
+    print("="*80)
+
+    n_matches = sum(s['matches'] for s in steps)
+    correct = sum(s['correct'] for s in steps)
+    if n_matches:
+        print(f"  Gameweeks: {len(steps)}  Matches scored: {n_matches}  "
+              f"Out-of-sample accuracy: {correct / n_matches:.2%}")
+    print(f"  Booster versions: {len(versions)} "
+          f"({sum(v['kind'] == 'full' for v in versions)} full, "
+          f"{sum(v['kind'] == 'incremental' for v in versions)} incremental)")
+
+    incremental = [s['seconds'] for s in steps if s['action'] == 'incremental']
+    full = [v['seconds'] for v in versions if v['kind'] == 'full']
+    print("\n  Retrain latency per step:")
+    if incremental:
+        print(f"    Incremental:  median {np.median(incremental):6.2f}s  max {np.max(incremental):6.2f}s")
+    print(f"    Full refit:   median {np.median(full):6.2f}s  max {np.max(full):6.2f}s")
+
+    reference = [s['full_fit_seconds'] for s in steps if 'full_fit_seconds' in s]
+    if reference:
+        walked = sum(s['seconds'] for s in steps)
+        print(f"\n  Full refit every step: {sum(reference):7.1f}s")
+        print(f"  Walk-forward:          {walked:7.1f}s  ({sum(reference) / walked:.1f}x faster)")
+    elif incremental:
+        print(f"  Speedup vs full refit: {np.median(full) / np.median(incremental):.1f}x (median)")
+    print("="*80 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward XGBoost retraining with warm-started boosters")
+    parser.add_argument('--start-fraction', type=float, default=0.8,
+                        help="share of matches used for the initial fit")
+    parser.add_argument('--extra-rounds', type=int, default=20, help="boosting rounds added per gameweek")
+    parser.add_argument('--window', type=int, default=380,
+                        help="most recent matches each incremental step trains on")
+    parser.add_argument('--drift-threshold', type=float, default=0.1, help="mean PSI forcing a full refit")
+    parser.add_argument('--degradation-tolerance', type=float, default=0.05,
+                        help="relative log-loss increase forcing a full refit")
+    parser.add_argument('--max-incremental', type=int, default=8,
+                        help="incremental steps allowed before a scheduled full refit")
+    parser.add_argument('--max-steps', type=int, default=None, help="stop after this many gameweeks")
+    parser.add_argument('--compare-full', action='store_true',
+                        help="also time a from-scratch refit at every step")
+    parser.add_argument('--cores', type=int, default=None, help="XGBoost threads")
+    parser.add_argument('--out', default=CHAIN_DIR, help="directory for the booster chain")
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("WALK-FORWARD RETRAINING")
+    print("="*80)
+
+    dataset = load_dataset('data/features.csv')
+    try:
+        versions, steps = walk_forward(
+            dataset, start_fraction=args.start_fraction, extra_rounds=args.extra_rounds,
+            window=args.window, drift_threshold=args.drift_threshold,
+            degradation_tolerance=args.degradation_tolerance, max_incremental=args.max_incremental,
+            compare_full=args.compare_full, max_steps=args.max_steps, n_jobs=args.cores,
+            out_dir=args.out,
+        )
+    except FileExistsError as e:
+        print(f"\n Error: {e}")
+        return
+    print_latency_report(versions, steps)
+    print(f"✓ {len(versions)} booster version(s) appended to {args.out}/chain.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+work_queue.py
+─────────────
+Tuning fits farmed out to worker processes through one SQLite database.
+
+The coordinator is an ordinary tuner search given a WorkQueue. It publishes
+the training arrays next to the database and enqueues one job per
+(configuration, tree counts, fold) instead of fitting it. Workers, on this
+machine or on any other that mounts the same volume, claim pending jobs,
+predict them with tuner.predict_sweep and write the test-fold probabilities
+back. The coordinator polls for finished jobs and resolves the futures the
+search is waiting on, then scores and records them in its TrialStore as
+usual.
+
+A claim is a lease. A worker heartbeats while it fits, and a running job
+whose heartbeat is older than `lease` seconds (its worker died) goes to
+the next worker that asks. Jobs are keyed by their content, so a restarted
+coordinator finds the jobs, and finished scores, of the run before it.
+
+The database uses SQLite's default rollback journal rather than WAL, which
+does not work across machines. The shared volume must support file locks.
+
+Start workers with:
+    python src/work_queue.py worker --queue data/cache/tuning/queue.sqlite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from dataset import CACHE_DIR
+from trial_store import decode_array, encode_array
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, 'tuning', 'queue.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key     TEXT NOT NULL UNIQUE,
+    data_hash   TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    tree_counts TEXT NOT NULL,
+    train_end   INTEGER NOT NULL,
+    test_start  INTEGER NOT NULL,
+    test_end    INTEGER NOT NULL,
+    threads     INTEGER,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    worker      TEXT,
+    heartbeat   REAL,
+    probas      BLOB,
+    seconds     REAL,
+    error       TEXT,
+    created     TEXT,
+    finished    TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+def _json(obj):
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def _probas(tree_counts, blob):
+    """{tree count: probabilities} from a job's stacked (counts, rows, classes) array."""
+    return dict(zip(json.loads(tree_counts), decode_array(blob)))
+
+
+class WorkQueue:
+    """Thread-safe handle on the job database, used by the coordinator and by workers."""
+
+    def __init__(self, path=DEFAULT_PATH, lease=300, poll=0.2):
+        self.path = path
+        self.lease = lease      # seconds without a heartbeat before a running job is reclaimed
+        self.poll = poll        # seconds between checks for finished or pending jobs
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._waiting = {}      # job id -> futures of the coordinator
+        self._poller = None
+
+    # ── Training data ──────────────────────────────────────────────────────
+
+    def data_path(self, data_hash):
+        return os.path.join(os.path.dirname(self.path) or '.', 'queue-data', f'{data_hash}.npz')
+
+    def publish(self, data_hash, X, y):
+        """Write X and y where workers can load them, once per data hash."""
+        path = self.data_path(data_hash)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp-{os.getpid()}.npz'
+        np.savez(tmp_path, X=X, y=y)
+        os.replace(tmp_path, path)
+
+    def load(self, data_hash):
+        with np.load(self.data_path(data_hash)) as data:
+            return data['X'], data['y']
+
+    # ── Coordinator ────────────────────────────────────────────────────────
+
+    def submit(self, data_hash, model, params, tree_counts, fold, threads=None):
+        """Future for ({tree count: probabilities}, seconds) of one fit, run by whichever worker claims it."""
+        train, test = fold
+        tree_counts = sorted(int(n) for n in tree_counts)
+        key = hashlib.sha256(_json({'data_hash': data_hash, 'model': model, 'params': params,
+                                    'tree_counts': tree_counts, 'fold': [train.stop, test.start, test.stop]})
+                             .encode()).hexdigest()
+        future = Future()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO jobs (job_key, data_hash, model, params, tree_counts, train_end, '
+                'test_start, test_end, threads, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, data_hash, model, _json(params), _json(tree_counts), train.stop, test.start, test.stop,
+                 threads, datetime.now().isoformat()))
+            # A job that failed before is retried
+            self._conn.execute("UPDATE jobs SET status='pending', error=NULL, worker=NULL "
+                               "WHERE job_key=? AND status='failed'", (key,))
+            job_id, status, counts, probas, seconds = self._conn.execute(
+                'SELECT id, status, tree_counts, probas, seconds FROM jobs WHERE job_key=?', (key,)).fetchone()
+            if status == 'done':
+                future.set_result((_probas(counts, probas), seconds))
+                return future
+            self._waiting.setdefault(job_id, []).append(future)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._collect, daemon=True)
+                self._poller.start()
+        return future
+
+    def _collect(self):
+        """Resolve the futures of finished jobs until none are waiting."""
+        while True:
+            time.sleep(self.poll)
+            with self._lock:
+                if not self._waiting:
+                    self._poller = None
+                    return
+                ids = list(self._waiting)
+                rows = []
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    rows += self._conn.execute(
+                        f"SELECT id, status, tree_counts, probas, seconds, error, worker FROM jobs "
+                        f"WHERE status IN ('done', 'failed') AND id IN ({','.join('?' * len(chunk))})",
+                        chunk).fetchall()
+                finished = [(self._waiting.pop(row[0]), row) for row in rows]
+            for futures, (job_id, status, counts, probas, seconds, error, worker) in finished:
+                for future in futures:
+                    if status == 'done':
+                        future.set_result((_probas(counts, probas), seconds))
+                    else:
+                        future.set_exception(RuntimeError(f"Job {job_id} failed on {worker}: {error}"))
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            return dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    # ── Workers ────────────────────────────────────────────────────────────
+
+    def claim(self, worker):
+        """The oldest pending (or abandoned) job, now leased to `worker`, or None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    "SELECT id, data_hash, model, params, tree_counts, train_end, test_start, test_end, threads "
+                    "FROM jobs WHERE status='pending' OR (status='running' AND heartbeat < ?) "
+                    "ORDER BY id LIMIT 1", (now - self.lease,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET status='running', worker=?, heartbeat=? WHERE id=?",
+                                       (worker, now, row[0]))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None
+        job_id, data_hash, model, params, tree_counts, train_end, test_start, test_end, threads = row
+        return {'id': job_id, 'data_hash': data_hash, 'model': model, 'params': json.loads(params),
+                'tree_counts': json.loads(tree_counts), 'fold': (slice(0, train_end), slice(test_start, test_end)),
+                'threads': threads}
+
+    def heartbeat(self, job_id, worker):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat=? WHERE id=? AND worker=? AND status='running'",
+                               (time.time(), job_id, worker))
+
+    @contextmanager
+    def leased(self, job_id, worker):
+        """Heartbeat `job_id` in the background while the block runs."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease / 3):
+                self.heartbeat(job_id, worker)
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, job_id, worker, probas, seconds):
+        """Store {tree count: probabilities} for the job's tree counts."""
+        with self._lock:
+            counts = json.loads(self._conn.execute('SELECT tree_counts FROM jobs WHERE id=?', (job_id,)).fetchone()[0])
+            stacked = encode_array(np.stack([np.asarray(probas[n], dtype=np.float32) for n in counts]))
+            self._conn.execute("UPDATE jobs SET status='done', probas=?, seconds=?, finished=? "
+                               "WHERE id=? AND worker=? AND status='running'",
+                               (stacked, seconds, datetime.now().isoformat(), job_id, worker))
+
+    def fail(self, job_id, worker, error):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status='failed', error=?, finished=? "
+                               "WHERE id=? AND worker=? AND status='running'",
+                               (error, datetime.now().isoformat(), job_id, worker))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_worker(queue, name=None, threads=None, idle_exit=None, max_jobs=None, verbose=True):
+    """Claim and run jobs until the queue has been empty for `idle_exit` seconds (forever if None).
+
+    `threads` overrides the threads per fit the coordinator asked for.
+    Returns the number of jobs run.
+    """
+    from fold_cache import FoldCache
+    from tuner import predict_sweep
+
+    name = name or f'{socket.gethostname()}:{os.getpid()}'
+    caches = {}     # data hash -> FoldCache, so quantile matrices are reused across jobs
+    done = 0
+    idle_since = time.perf_counter()
+    while max_jobs is None or done < max_jobs:
+        job = queue.claim(name)
+        if job is None:
+            if idle_exit is not None and time.perf_counter() - idle_since > idle_exit:
+                break
+            time.sleep(queue.poll)
+            continue
+        if job['data_hash'] not in caches:
+            caches[job['data_hash']] = FoldCache(*queue.load(job['data_hash']))
+        start = time.perf_counter()
+        try:
+            with queue.leased(job['id'], name):
+                probas = predict_sweep(job['model'], job['params'], caches[job['data_hash']], job['fold'],
+                                       job['tree_counts'], threads or job['threads'])
+        except Exception as exc:
+            queue.fail(job['id'], name, f'{type(exc).__name__}: {exc}')
+            if verbose:
+                print(f"  [{name}] job {job['id']} failed: {exc}")
+        else:
+            queue.complete(job['id'], name, probas, time.perf_counter() - start)
+            if verbose:
+                print(f"  [{name}] job {job['id']} {job['model']} {len(probas)} tree count(s) "
+                      f"({time.perf_counter() - start:.1f}s)")
+        done += 1
+        idle_since = time.perf_counter()
+    return done
+
+
+def start_local_workers(path, n_workers, threads=None):
+    """Launch `n_workers` worker processes on this machine; stop them with stop_workers()."""
+    command = [sys.executable, os.path.abspath(__file__), 'worker', '--queue', path, '--quiet']
+    if threads:
+        command += ['--threads', str(threads)]
+    return [subprocess.Popen(command) for _ in range(n_workers)]
+
+
+def stop_workers(processes):
+    for proc in processes:
+        proc.terminate()
+    for proc in processes:
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuning work queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+    worker = sub.add_parser('worker', help="claim and run tuning jobs")
+    worker.add_argument('--queue', default=DEFAULT_PATH, help="job database on a volume shared with the coordinator")
+    worker.add_argument('--threads', type=int, default=None,
+                        help="threads per fit (default: what the coordinator asked for)")
+    worker.add_argument('--idle-exit', type=float, default=None,
+                        help="exit after this many seconds without a job (default: run until stopped)")
+    worker.add_argument('--max-jobs', type=int, default=None)
+    worker.add_argument('--name', default=None, help="worker name in the database (default: host:pid)")
+    worker.add_argument('--quiet', action='store_true')
+    status = sub.add_parser('status', help="count jobs per status")
+    status.add_argument('--queue', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue) as queue:
+        if args.command == 'status':
+            for state, count in sorted(queue.counts().items()):
+                print(f"  {state:8s} {count:6d}")
+            return
+        n = run_worker(queue, args.name, args.threads, args.idle_exit, args.max_jobs, verbose=not args.quiet)
+        print(f"  Worker finished after {n} job(s)")
+
+
+if __name__ == "__main__":
+    main()